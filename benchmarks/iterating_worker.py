@@ -0,0 +1,137 @@
+"""
+    benchmarks.iterating_worker
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Micro-benchmark comparing iterations per second of SyncIteratingWorker loops
+
+    It compares the selector based loop of :class:`consensys_utils.gunicorn.workers.SyncIteratingWorker`
+    (with and without batched iteration, with and without step metrics) with the baseline loop that tried
+    a non blocking ``accept()`` on the first listener before calling ``next()`` on the WSGI object.
+
+    Usage::
+
+        $ python benchmarks/iterating_worker.py [duration]
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import errno
+import os
+import socket
+import sys
+import time
+from unittest import mock
+
+from gunicorn import util
+from gunicorn.config import Config
+from gunicorn.workers.sync import SyncWorker
+
+from consensys_utils.exceptions import PauseIteration
+from consensys_utils.gunicorn.workers import SyncIteratingWorker
+
+
+class BaselineIteratingWorker(SyncIteratingWorker):
+    """Worker running the baseline accept-then-iterate loop (used as reference)
+
+    As the loop preceding the selector based loop, it heart beats with :class:`gunicorn.workers.sync.SyncWorker`
+    and calls ``next()`` on the WSGI object directly (no batching, no metrics, no periodic tasks).
+    """
+
+    def run(self):
+        for s in self.sockets:
+            s.setblocking(0)
+
+        listener = self.sockets[0]
+        while self.alive:
+            SyncWorker.notify(self)
+
+            try:
+                client, address = listener.accept()
+                client.setblocking(False)
+                util.close_on_exec(client)
+                self.handle(listener, client, address)
+                continue
+            except EnvironmentError as e:
+                if e.errno not in (errno.EAGAIN, errno.ECONNABORTED, errno.EWOULDBLOCK):
+                    raise
+
+            try:
+                next(self.wsgi)
+                continue
+            except PauseIteration as e:
+                timeout = e.timeout or self.timeout or 1
+
+            if not self.is_parent_alive():
+                return
+
+            super().wait(timeout)
+
+
+class CountingIterator:
+    """Iterator doing no work that stops after a given duration"""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.count = 0
+        self.stop_at = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.count += 1
+        if self.count % 1024 == 0 and time.monotonic() >= self.stop_at:
+            raise StopIteration
+
+
+def create_worker(worker_class, iterator):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+
+    worker = worker_class(None, None, [listener], None, None, Config(), mock.Mock())
+    worker.PIPE = os.pipe()
+    for p in worker.PIPE:
+        util.set_non_blocking(p)
+    worker.wait_fds = worker.sockets + [worker.PIPE[0]]
+    worker.wsgi = iterator
+
+    return worker
+
+
+def bench(worker_class, duration, batch_size=1, metrics=True):
+    iterator = CountingIterator(duration)
+    worker = create_worker(worker_class, iterator)
+    worker.iteration_batch_size = batch_size
+    worker.record_steps = metrics
+
+    start = time.monotonic()
+    iterator.stop_at = start + duration
+    try:
+        worker.run()
+    except StopIteration:
+        pass
+    elapsed = time.monotonic() - start
+
+    worker.sockets[0].close()
+    for p in worker.PIPE:
+        os.close(p)
+    worker.tmp.close()
+
+    return iterator.count / elapsed
+
+
+def main(duration=2.0):
+    for worker_class, batch_size, metrics in [(BaselineIteratingWorker, 1, False),
+                                              (SyncIteratingWorker, 1, False),
+                                              (SyncIteratingWorker, 1, True),
+                                              (SyncIteratingWorker, 64, False),
+                                              (SyncIteratingWorker, 64, True)]:
+        rate = bench(worker_class, duration, batch_size, metrics)
+        print('{:<25} batch={:<4} metrics={:<5} {:>12,.0f} iterations/s'.format(
+            worker_class.__name__, batch_size, str(metrics), rate))
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,65 @@
+"""
+    benchmarks.logging_formatter
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Micro-benchmark measuring the throughput of log formatters
+
+    It compares :class:`consensys_utils.logging.JSONFormatter` with the line :class:`logging.Formatter` of
+    ``logging.yml`` files and with a naive JSON formatter serializing the record ``__dict__``.
+
+    Usage::
+
+        $ python benchmarks/logging_formatter.py [records]
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import json
+import logging
+import sys
+import time
+
+from consensys_utils.logging import JSONFormatter
+
+
+class NaiveJSONFormatter(logging.Formatter):
+    """JSON formatter serializing every record attribute (used as reference)"""
+
+    def format(self, record):
+        data = dict(record.__dict__)
+        data['message'] = record.getMessage()
+        data['asctime'] = self.formatTime(record)
+        return json.dumps(data, default=str)
+
+
+def bench(formatter, records):
+    logger = logging.getLogger('app')
+    record_list = [
+        logger.makeRecord('app', logging.INFO, __file__, 1, 'Processed block %s (%s transactions)', (i, i % 100),
+                          None, extra={'id': 'abcde1234'})
+        for i in range(records)
+    ]
+
+    start = time.perf_counter()
+    for record in record_list:
+        formatter.format(record)
+    return records / (time.perf_counter() - start)
+
+
+def main(records=50000):
+    records = int(records)
+
+    formatters = [
+        ('line', logging.Formatter('%(asctime)s %(name)-15s %(levelname)-8s %(message)s <ID=%(id)s>')),
+        ('naive-json', NaiveJSONFormatter()),
+        ('json', JSONFormatter(app_name='benchmark')),
+    ]
+
+    for name, formatter in formatters:
+        throughput = max(bench(formatter, records) for _ in range(5))
+        print('{:<12} {:>12,.0f} records/s'.format(name, throughput))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
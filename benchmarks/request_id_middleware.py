@@ -0,0 +1,89 @@
+"""
+    benchmarks.request_id_middleware
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Micro-benchmark measuring the per-request overhead of RequestIDMiddleware
+
+    It compares :class:`consensys_utils.wsgi.RequestIDMiddleware` using every request ID generator (and
+    validating incoming request IDs against the default ``REQUEST_ID_PATTERN``) with the former middleware
+    that generated a UUID4 on every request (even when the request already held a request ID header) and
+    wrapped ``start_response`` in a closure.
+
+    Usage::
+
+        $ python benchmarks/request_id_middleware.py [requests]
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import sys
+import time
+
+from consensys_utils.config.schema.wsgi import RequestIDConfigSchema
+from consensys_utils.wsgi import REQUEST_ID_GENERATORS, RequestIDMiddleware, generate_request_id, \
+    header_to_environ_key
+
+
+class LegacyRequestIDMiddleware:
+    """Former middleware (used as reference)"""
+
+    def __init__(self, wsgi, config):
+        self.wsgi = wsgi
+        self.request_id_header = config['REQUEST_ID_HEADER']
+        self.request_id_environ_key = header_to_environ_key(self.request_id_header)
+
+    def __call__(self, environ, start_response):
+        environ.setdefault(self.request_id_environ_key, generate_request_id())
+
+        def new_start_response(status, response_headers, exc_info=None):
+            response_headers.append((self.request_id_header, environ[self.request_id_environ_key]))
+            return start_response(status, response_headers, exc_info)
+
+        return self.wsgi(environ, new_start_response)
+
+
+def application(environ, start_response):
+    start_response('200 OK', [])
+    return [b'']
+
+
+def start_response(status, response_headers, exc_info=None):
+    pass
+
+
+def bench(middleware, requests, request_id=None):
+    environ_key = middleware.request_id_environ_key
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        environ = {environ_key: request_id} if request_id else {}
+        middleware(environ, start_response)
+    elapsed = time.perf_counter() - start
+
+    # Subtract the time of calling the bare application
+    start = time.perf_counter()
+    for _ in range(requests):
+        environ = {environ_key: request_id} if request_id else {}
+        application(environ, start_response)
+    elapsed -= time.perf_counter() - start
+
+    return elapsed / requests * 1e9
+
+
+def main(requests=50000):
+    requests = int(requests)
+    config = RequestIDConfigSchema().load({})
+
+    middlewares = [('legacy', LegacyRequestIDMiddleware(application, config))]
+    for name in REQUEST_ID_GENERATORS:
+        middlewares.append((name, RequestIDMiddleware(application, dict(config, REQUEST_ID_GENERATOR=name))))
+
+    for name, middleware in middlewares:
+        for request_id in [None, 'abcde1234']:
+            overhead = min(bench(middleware, requests, request_id) for _ in range(5))
+            print('{:<10} header={:<5} {:>8,.0f} ns/request'.format(name, str(bool(request_id)), overhead))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
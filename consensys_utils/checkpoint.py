@@ -0,0 +1,126 @@
+"""
+    consensys_utils.checkpoint
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement stores persisting iterators checkpoints
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+
+class CheckpointStore:
+    """Base class of checkpoint stores
+
+    A store persists JSON serializable checkpoints by key
+    """
+
+    def load(self, key):
+        """Load a checkpoint
+
+        :param key: Checkpoint key
+        :type key: str
+        :return: Checkpoint (``None`` if no checkpoint has been saved)
+        """
+        raise NotImplementedError
+
+    def save(self, key, checkpoint):
+        """Save a checkpoint
+
+        :param key: Checkpoint key
+        :type key: str
+        :param checkpoint: JSON serializable checkpoint
+        """
+        raise NotImplementedError
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Store saving each checkpoint as a JSON file in a directory
+
+    Files are written atomically so a worker killed while saving does not corrupt the previous checkpoint.
+
+    :param path: Directory path
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def load(self, key):
+        try:
+            with open(os.path.join(self.path, '%s.json' % key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, checkpoint):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.%s.' % key)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, os.path.join(self.path, '%s.json' % key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Store saving checkpoints in a SQLite database
+
+    A connection is opened on each operation so the store can be used from any thread.
+
+    :param path: Database file path
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self.connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS checkpoints '
+                               '(key TEXT PRIMARY KEY, checkpoint TEXT NOT NULL, updated_at REAL NOT NULL)')
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, key):
+        connection = self.connect()
+        try:
+            row = connection.execute('SELECT checkpoint FROM checkpoints WHERE key = ?', (key,)).fetchone()
+        finally:
+            connection.close()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key, checkpoint):
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO checkpoints (key, checkpoint, updated_at) VALUES (?, ?, ?)',
+                                   (key, json.dumps(checkpoint), time.time()))
+        finally:
+            connection.close()
+
+
+def create_checkpoint_store(config):
+    """Create a checkpoint store
+
+    :param config: Store configuration
+        (compatible with :meth:`consensys_utils.config.schema.flask.IterationCheckpointConfigSchema`)
+    :type config: dict
+    """
+    store, path = config.get('STORE'), config.get('PATH')
+
+    if store == 'file':
+        return FileCheckpointStore(path)
+
+    elif store == 'sqlite':
+        return SQLiteCheckpointStore(path)
+
+    else:
+        raise RuntimeError("'STORE' configuration must be one of 'file', 'sqlite'")
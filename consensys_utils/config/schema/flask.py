@@ -9,7 +9,7 @@
 """
 
 import cfg_loader
-from marshmallow import fields
+from marshmallow import fields, validate
 
 from .gunicorn import GunicornConfigSchema
 from .logging import LoggingConfigSchema
@@ -134,6 +134,53 @@ class HealthCheckConfigSchema(cfg_loader.ConfigSchema):
     ENDPOINT_URL = fields.Str(missing='/healthcheck')
 
 
+class IterationMetricsConfigSchema(cfg_loader.ConfigSchema):
+    """Iteration metrics configuration schema
+
+    Describes and validates against
+
+    .. list-table::
+        :widths: 30 50 20
+        :header-rows: 1
+
+        * - Key
+          - Comment
+          - Default value
+
+        * - ``ENDPOINT_URL``
+          - Endpoint URL exposing iteration metrics of the worker serving the request
+          - `/iteration-metrics`
+    """
+
+    ENDPOINT_URL = fields.Str(missing='/iteration-metrics')
+
+
+class IterationCheckpointConfigSchema(cfg_loader.ConfigSchema):
+    """Iteration checkpoint configuration schema
+
+    Describes and validates against
+
+    .. list-table::
+        :widths: 30 50 20
+        :header-rows: 1
+
+        * - Key
+          - Comment
+          - Default value
+
+        * - ``STORE``
+          - Checkpoint store (can be either ``file`` or ``sqlite``)
+          - ``file``
+
+        * - ``PATH``
+          - Directory path of ``file`` store or database path of ``sqlite`` store
+          -
+    """
+
+    STORE = fields.Str(missing='file', validate=validate.OneOf(['file', 'sqlite']))
+    PATH = fields.Str(required=True)
+
+
 class SwaggerSpecConfigSchema(cfg_loader.ConfigSchema):
     """Swagger UI Specification configuration schema
 
@@ -224,6 +271,14 @@ class FlaskConfigSchema(cfg_loader.ConfigSchema):
           - Healthcheck configuration in :class:`HealthCheckConfigSchema` format
           -
 
+        * - ``iteration_metrics``
+          - Iteration metrics configuration in :class:`IterationMetricsConfigSchema` format
+          -
+
+        * - ``iteration_checkpoint``
+          - Iteration checkpoint configuration in :class:`IterationCheckpointConfigSchema` format
+          -
+
         * - ``swagger``
           - Swagger configuration in :class:`SwaggerConfigSchema` format
           -
@@ -239,6 +294,10 @@ class FlaskConfigSchema(cfg_loader.ConfigSchema):
     # Flask Extensions
     health = fields.Nested(HealthCheckConfigSchema)
 
+    iteration_metrics = fields.Nested(IterationMetricsConfigSchema)
+
+    iteration_checkpoint = fields.Nested(IterationCheckpointConfigSchema)
+
     swagger = fields.Nested(SwaggerConfigSchema,
                             attribute='SWAGGER')
 
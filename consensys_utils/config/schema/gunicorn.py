@@ -10,7 +10,7 @@
 
 import cfg_loader
 from cfg_loader.fields import Path, UnwrapNested
-from marshmallow import fields
+from marshmallow import fields, validate
 
 
 class DebuggingConfigSchema(cfg_loader.ConfigSchema):
@@ -35,6 +35,7 @@ class LoggingConfigSchema(cfg_loader.ConfigSchema):
     accesslog = fields.Str()
     disable_redirect_access_to_syslog = fields.Bool(missing=False)
     access_log_format = fields.Str(missing='%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"')
+    access_log_structured = fields.Bool(missing=False)
     errorlog = fields.Str(missing='-')
     loglevel = fields.Str(missing='info')
     capture_output = fields.Bool(missing=False)
@@ -144,6 +145,48 @@ class WorkerProcessesConfigSchema(cfg_loader.ConfigSchema):
     keepalive = fields.Int(missing=2)
 
 
+class IterationConfigSchema(cfg_loader.ConfigSchema):
+    """Iteration configuration (applies to iterating workers in :mod:`consensys_utils.gunicorn.workers`)
+
+    Describes and validates against
+
+    .. list-table::
+        :widths: 30 50 20
+        :header-rows: 1
+
+        * - Key
+          - Comment
+          - Default value
+
+        * - ``iteration_batch_size``
+          - Maximum number of iteration steps to run before polling sockets again
+          - 1
+
+        * - ``iteration_time_slice_ms``
+          - Maximum time in milliseconds to spend on a batch of iteration steps (0 means no limit)
+          - 0
+
+        * - ``iteration_concurrency``
+          - Number of iteration steps run concurrently by an asynchronous iterating worker
+          - 1
+
+        * - ``iteration_metrics``
+          - Record latency of iteration steps (c.f. :class:`consensys_utils.metrics.IterationMetrics`), it costs
+            a few micro-seconds per batch of steps
+          - False
+
+        * - ``iteration_checkpoint_interval``
+          - Number of seconds between 2 checkpoints of iteration (0 means only on graceful shutdown)
+          - 60
+    """
+
+    iteration_batch_size = fields.Int(missing=1, validate=validate.Range(min=1))
+    iteration_time_slice_ms = fields.Int(missing=0, validate=validate.Range(min=0))
+    iteration_concurrency = fields.Int(missing=1, validate=validate.Range(min=1))
+    iteration_metrics = fields.Bool(missing=False)
+    iteration_checkpoint_interval = fields.Int(missing=60, validate=validate.Range(min=0))
+
+
 class GunicornConfigSchema(cfg_loader.ConfigSchema):
     """Gunicorn configuration
 
@@ -194,6 +237,10 @@ class GunicornConfigSchema(cfg_loader.ConfigSchema):
         * - ``worker-processes``
           - Worker processes config in format :class:`WorkerProcessesConfigSchema`
           - :class:`WorkerProcessesConfigSchema` default
+
+        * - ``iteration``
+          - Iteration config in format :class:`IterationConfigSchema`
+          - :class:`IterationConfigSchema` default
     """
 
     # Config file
@@ -234,3 +281,7 @@ class GunicornConfigSchema(cfg_loader.ConfigSchema):
     worker_processes = UnwrapNested(WorkerProcessesConfigSchema,
                                     missing=WorkerProcessesConfigSchema().load({}),
                                     data_key='worker-processes')
+
+    # Iteration
+    iteration = UnwrapNested(IterationConfigSchema,
+                             missing=IterationConfigSchema().load({}))
@@ -9,6 +9,7 @@
 """
 
 import cfg_loader
+from marshmallow import fields, validate
 
 
 class LoggingConfigSchema(cfg_loader.ConfigSchema):
@@ -27,7 +28,52 @@ class LoggingConfigSchema(cfg_loader.ConfigSchema):
         * - ``LOGGING_CONFIG_PATH``
           - Valid path to a .yml logging configuration file
           - logging.yml
+
+        * - ``LOGGING_QUEUE``
+          - Handle log records on a listener thread (so slow handlers do not delay the logging thread)
+          - ``False``
+
+        * - ``LOGGING_QUEUE_SIZE``
+          - Maximum number of queued log records per process
+          - ``10000``
+
+        * - ``LOGGING_QUEUE_POLICY``
+          - Policy when the queue is full, either ``drop`` records or ``block`` the logging thread
+          - ``drop``
+
+        * - ``LOGGING_SAMPLING_RATE``
+          - Keep one out of ``LOGGING_SAMPLING_RATE`` records up to ``LOGGING_SAMPLING_LEVEL``
+          - ``1`` (every record is kept)
+
+        * - ``LOGGING_SAMPLING_LEVEL``
+          - Maximum level of sampled records
+          - ``INFO``
+
+        * - ``LOGGING_RATE_LIMIT``
+          - Number of records kept per second and per message template
+          - ``None`` (not limited)
+
+        * - ``LOGGING_RATE_LIMIT_BURST``
+          - Maximum number of records kept at once per message template
+          - ``10``
+
+        * - ``LOGGING_SUMMARY_INTERVAL``
+          - Minimum time between two summaries of suppressed records (in seconds)
+          - ``60``
     """
 
     # Logging file
     LOGGING_CONFIG_PATH = cfg_loader.fields.Path(missing='logging.yml')
+
+    # Logging queue
+    LOGGING_QUEUE = fields.Bool(missing=False)
+    LOGGING_QUEUE_SIZE = fields.Int(missing=10000, validate=validate.Range(min=1))
+    LOGGING_QUEUE_POLICY = fields.Str(missing='drop', validate=validate.OneOf(['drop', 'block']))
+
+    # Sampling and rate limiting
+    LOGGING_SAMPLING_RATE = fields.Int(missing=1, validate=validate.Range(min=1))
+    LOGGING_SAMPLING_LEVEL = fields.Str(missing='INFO', validate=validate.OneOf(['DEBUG', 'INFO', 'WARNING',
+                                                                                 'ERROR', 'CRITICAL']))
+    LOGGING_RATE_LIMIT = fields.Float(missing=None, allow_none=True, validate=validate.Range(min=0))
+    LOGGING_RATE_LIMIT_BURST = fields.Int(missing=10, validate=validate.Range(min=1))
+    LOGGING_SUMMARY_INTERVAL = fields.Float(missing=60, validate=validate.Range(min=0))
@@ -10,7 +10,7 @@
 
 import cfg_loader
 
-from marshmallow import fields
+from marshmallow import fields, validate
 
 
 class Web3ConfigSchema(cfg_loader.ConfigSchema):
@@ -27,13 +27,34 @@ class Web3ConfigSchema(cfg_loader.ConfigSchema):
              - Default value
 
            * - ``ETHEREUM_PROVIDER``
-             - Ethereum provider to use (can be either ``http``, ``ipc``, ``ws`` or ``test``)
+             - Ethereum provider to use (can be either ``http``, ``http-batch``, ``ipc``, ``ws`` or ``test``)
              - ``http``
 
            * - ``ETHEREUM_ENDPOINT_URI``
              - Ethereum node endpoint url
              - ``http://localhost:8545``
 
+           * - ``ETHEREUM_ENDPOINT_URIS``
+             - Ethereum nodes endpoint urls to balance calls across (``http``, ``http-batch`` and ``ws`` providers,
+               replaces ``ETHEREUM_ENDPOINT_URI``, explicit batches are not supported)
+             -
+
+           * - ``ETHEREUM_ARCHIVE_ENDPOINT_URIS``
+             - Ethereum archive nodes endpoint urls (calls of ``ETHEREUM_ARCHIVE_METHODS`` are only routed to them)
+             -
+
+           * - ``ETHEREUM_ARCHIVE_METHODS``
+             - Prefixes of methods to route to archive nodes
+             - ``['debug_', 'trace_']``
+
+           * - ``ETHEREUM_FAILURE_THRESHOLD``
+             - Number of consecutive failures after which a node is ejected
+             - ``3``
+
+           * - ``ETHEREUM_RECOVERY_TIMEOUT``
+             - Time in seconds before trying an ejected node again
+             - ``30``
+
            * - ``ETHEREUM_IPC_PATH``
              - Ethereum ipc path
              -
@@ -41,9 +62,99 @@ class Web3ConfigSchema(cfg_loader.ConfigSchema):
            * - ``ETHEREUM_OPTS``
              - Options to pass when instantiating Ethereum provider
              - ``{}``
+
+           * - ``ETHEREUM_POOL_SIZE``
+             - Maximum number of keep-alive connections to the Ethereum node per worker (``http`` provider only)
+             - ``10``
+
+           * - ``ETHEREUM_MAX_RETRIES``
+             - Maximum number of retries on connection errors (``http`` provider only)
+             - ``0``
+
+           * - ``ETHEREUM_CONNECT_TIMEOUT``
+             - Connection timeout in seconds (``http`` provider only)
+             - ``10``
+
+           * - ``ETHEREUM_READ_TIMEOUT``
+             - Read timeout in seconds
+             - ``10``
+
+           * - ``ETHEREUM_KEEP_ALIVE``
+             - Keep connections to the Ethereum node open between requests (``http`` provider only)
+             - ``True``
+
+           * - ``ETHEREUM_RECONNECT_DELAY``
+             - Pause in seconds before reconnecting a lost connection, doubled on each failed attempt (``ipc`` and
+               ``ws`` providers only)
+             - ``0.1``
+
+           * - ``ETHEREUM_MAX_RECONNECT_DELAY``
+             - Maximum pause in seconds between reconnection attempts (``ipc`` and ``ws`` providers only)
+             - ``10``
+
+           * - ``ETHEREUM_BATCH_WINDOW_MS``
+             - Time window in milliseconds during which requests overlapping a request being sent are coalesced
+               in a JSON-RPC batch (``http-batch`` provider only, ``0`` to only send explicit batches)
+             - ``0``
+
+           * - ``ETHEREUM_BATCH_MAX_SIZE``
+             - Maximum number of requests in a JSON-RPC batch (``http-batch`` provider only)
+             - ``100``
+
+           * - ``ETHEREUM_CACHE_STORE``
+             - Store of the cache of immutable JSON-RPC calls responses (``memory`` or ``sqlite`` to share it
+               across workers), no cache if not set
+             -
+
+           * - ``ETHEREUM_CACHE_PATH``
+             - Database file path of ``sqlite`` cache store
+             -
+
+           * - ``ETHEREUM_CACHE_MAX_SIZE``
+             - Maximum number of cached responses
+             - ``1024``
+
+           * - ``ETHEREUM_CACHE_TTL``
+             - Time to live in seconds of cached responses that could change on chain reorganization
+             - ``3600``
+
+           * - ``ETHEREUM_CACHE_CONFIRMATIONS``
+             - Number of blocks a block must be below the chain head for responses depending on its number (or on
+               a transaction hash) to be cached
+             - ``12``
+
+           * - ``ETHEREUM_REQUEST_ID_HEADER``
+             - HTTP header where to forward the ID of the request being served to the Ethereum node
+               (``http`` provider only)
+             -
+
+           * - ``ETHEREUM_REQUEST_ID_PREFIX``
+             - Prefix JSON-RPC request ``id`` with the ID of the request being served
+             - ``False``
        """
 
     ETHEREUM_PROVIDER = fields.Str(missing='http')
     ETHEREUM_ENDPOINT_URI = fields.Str(missing='http://localhost:8545')
+    ETHEREUM_ENDPOINT_URIS = fields.List(fields.Str())
+    ETHEREUM_ARCHIVE_ENDPOINT_URIS = fields.List(fields.Str())
+    ETHEREUM_ARCHIVE_METHODS = fields.List(fields.Str(), missing=['debug_', 'trace_'])
+    ETHEREUM_FAILURE_THRESHOLD = fields.Int(missing=3, validate=validate.Range(min=1))
+    ETHEREUM_RECOVERY_TIMEOUT = fields.Float(missing=30, validate=validate.Range(min=0))
     ETHEREUM_IPC_PATH = fields.Str()
     ETHEREUM_OPTS = fields.Dict()
+    ETHEREUM_POOL_SIZE = fields.Int(missing=10, validate=validate.Range(min=1))
+    ETHEREUM_MAX_RETRIES = fields.Int(missing=0, validate=validate.Range(min=0))
+    ETHEREUM_CONNECT_TIMEOUT = fields.Float(missing=10, validate=validate.Range(min=0))
+    ETHEREUM_READ_TIMEOUT = fields.Float(missing=10, validate=validate.Range(min=0))
+    ETHEREUM_KEEP_ALIVE = fields.Bool(missing=True)
+    ETHEREUM_RECONNECT_DELAY = fields.Float(missing=0.1, validate=validate.Range(min=0))
+    ETHEREUM_MAX_RECONNECT_DELAY = fields.Float(missing=10, validate=validate.Range(min=0))
+    ETHEREUM_BATCH_WINDOW_MS = fields.Float(missing=0, validate=validate.Range(min=0))
+    ETHEREUM_BATCH_MAX_SIZE = fields.Int(missing=100, validate=validate.Range(min=1))
+    ETHEREUM_CACHE_STORE = fields.Str(validate=validate.OneOf(['memory', 'sqlite']))
+    ETHEREUM_CACHE_PATH = fields.Str()
+    ETHEREUM_CACHE_MAX_SIZE = fields.Int(missing=1024, validate=validate.Range(min=1))
+    ETHEREUM_CACHE_TTL = fields.Float(missing=3600, validate=validate.Range(min=0))
+    ETHEREUM_CACHE_CONFIRMATIONS = fields.Int(missing=12, validate=validate.Range(min=0))
+    ETHEREUM_REQUEST_ID_HEADER = fields.Str()
+    ETHEREUM_REQUEST_ID_PREFIX = fields.Bool(missing=False)
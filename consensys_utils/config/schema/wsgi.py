@@ -9,7 +9,7 @@
 """
 
 import cfg_loader
-from marshmallow import fields
+from marshmallow import fields, validate
 
 
 class RequestIDConfigSchema(cfg_loader.ConfigSchema):
@@ -28,11 +28,28 @@ class RequestIDConfigSchema(cfg_loader.ConfigSchema):
         * - ``REQUEST_ID_HEADER``
           - Required header where to load/inject correlation ID
           - 'X-Request-ID'
+
+        * - ``REQUEST_ID_GENERATOR``
+          - Generator of missing request IDs (one of ``uuid4``, ``hex64``, ``ulid``, ``counter``, ``snowflake``
+            c.f. :meth:`consensys_utils.wsgi.create_request_id_generator`)
+          - 'uuid4'
+
+        * - ``REQUEST_ID_PATTERN``
+          - Regular expression incoming request IDs must fully match (invalid request IDs are replaced
+            by a generated one), empty to accept any request ID
+          - ``'[\\w\\-.:+/=]{1,128}'``
     """
 
     # Request header indicating request ID (used as correlation ID for logs)
     REQUEST_ID_HEADER = fields.Str(missing='X-Request-ID')
 
+    # Generator of request ID for requests having none
+    REQUEST_ID_GENERATOR = fields.Str(missing='uuid4',
+                                      validate=validate.OneOf(['uuid4', 'hex64', 'ulid', 'counter', 'snowflake']))
+
+    # Regular expression validating incoming request IDs
+    REQUEST_ID_PATTERN = fields.Str(missing=r'[\w\-.:+/=]{1,128}')
+
 
 class WSGIConfigSchema(cfg_loader.ConfigSchema):
     """Configuration relative to wsgi middlewares
@@ -8,15 +8,119 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import random
+import time
+
 
 class PauseIteration(Exception):
     """Error indicating to pause iteration
 
     Useful when combined with :meth:`consensys_utils.gunicorn.workers.SyncIteratingWorker`
 
+    Iteration resumes at the earliest of
+
+    - the pause ``deadline`` (or ``timeout``) being reached
+    - ``condition`` returning ``True`` when the worker wakes up (on a request or a call to ``wake()``).
+      When no condition is given, any wakeup resumes iteration
+
     :param timeout: Maximum time to pause before re-starting iteration
     :type timeout: float
+    :param deadline: Absolute time (as returned by :meth:`time.monotonic`) at which to re-start iteration
+        (takes precedence over ``timeout``)
+    :type deadline: float
+    :param condition: Callable returning ``True`` when iteration can resume
+    :type condition: callable
+    :param backoff: Adaptive pause policy computing ``timeout`` when neither ``timeout`` nor ``deadline``
+        is given (c.f. :class:`Backoff`)
+    :type backoff: :class:`Backoff`
     """
 
-    def __init__(self, timeout=None):
+    def __init__(self, timeout=None, deadline=None, condition=None, backoff=None):
+        if backoff is not None and timeout is None and deadline is None:
+            timeout = backoff.next()
+
+        if deadline is None and timeout is not None:
+            deadline = time.monotonic() + timeout
+        elif deadline is not None:
+            timeout = max(deadline - time.monotonic(), 0)
+
         self.timeout = timeout
+        self.deadline = deadline
+        self.condition = condition
+        self.backoff = backoff
+
+
+class Backoff:
+    """Adaptive pause policy
+
+    Consecutive pauses last exponentially longer (up to ``maximum``) and they are randomized by ``jitter``
+    (so that workers polling a same resource do not synchronize). Once iteration progresses the pause
+    duration is reset to ``initial``: iterating workers and
+    :class:`consensys_utils.flask.extensions.iterable.IteratorScheduler` call :meth:`reset` as soon as a step
+    following a pause raised with this policy succeeds.
+
+    This makes polling cost track actual workload: an iterator polling an Ethereum node pauses briefly
+    while blocks keep arriving and backs off when the chain is idle.
+
+    .. doctest::
+
+        >>> backoff = Backoff(initial=0.5, maximum=3, factor=2, jitter=0)
+        >>> [backoff.pause().timeout for _ in range(5)]
+        [0.5, 1.0, 2.0, 3, 3]
+        >>> backoff.reset()
+        >>> backoff.pause().timeout
+        0.5
+
+    Each iterator should use its own policy
+
+    .. code-block:: python
+
+        class Iterator:
+            def __init__(self):
+                self.backoff = Backoff(initial=0.5, maximum=15)
+
+            def __next__(self):
+                block = get_next_block()
+                if block is None:
+                    raise self.backoff.pause()
+                ...
+
+    :param initial: Duration of the first pause (in seconds)
+    :type initial: float
+    :param maximum: Maximum duration of a pause (in seconds)
+    :type maximum: float
+    :param factor: Multiplier applied to pause duration on each consecutive pause
+    :type factor: float
+    :param jitter: Pause durations are randomized within ``[1 - jitter, 1 + jitter]`` times their value
+    :type jitter: float
+    """
+
+    def __init__(self, initial=0.1, maximum=10, factor=2, jitter=0.1):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self):
+        """Compute duration of next pause"""
+
+        timeout = min(self.initial * self.factor ** self.attempts, self.maximum)
+        if timeout < self.maximum:
+            self.attempts += 1
+        if self.jitter:
+            timeout = min(timeout * random.uniform(1 - self.jitter, 1 + self.jitter), self.maximum)
+        return timeout
+
+    def reset(self):
+        """Reset pause duration (to be called when iteration progresses)"""
+
+        self.attempts = 0
+
+    def pause(self, **kwargs):
+        """Create a :class:`PauseIteration` lasting next pause duration
+
+        :param kwargs: Extra arguments for :class:`PauseIteration` (such as a ``condition``)
+        """
+
+        return PauseIteration(backoff=self, **kwargs)
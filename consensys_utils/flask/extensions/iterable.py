@@ -8,6 +8,262 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import asyncio
+import inspect
+import threading
+import time
+
+from flask import current_app, jsonify
+
+from ...checkpoint import create_checkpoint_store
+from ...exceptions import PauseIteration
+from ...metrics import IterationMetrics
+
+
+class IteratorScheduler:
+    """Iterator scheduling steps across multiple named iterators
+
+    At each step it advances one of the iterators that are not paused
+
+    - iterators with highest ``priority`` are always advanced first
+    - iterators sharing the same priority are advanced following a smooth weighted round-robin
+      (an iterator with ``weight=3`` runs 3 times more steps than an iterator with ``weight=1``)
+
+    A :class:`consensys_utils.exceptions.PauseIteration` raised by an iterator only parks this iterator
+    until its deadline or until its condition holds. An iterator raising a pause with no duration is parked
+    following its ``backoff`` policy (c.f. :class:`consensys_utils.exceptions.Backoff`) if it has been
+    registered with one. Backoff policies are reset as soon as the iterator progresses.
+
+    When every iterator is parked, the scheduler raises a :class:`consensys_utils.exceptions.PauseIteration`
+    lasting until the first iterator is due to resume.
+
+    An iterator raising ``StopIteration`` is unregistered and the scheduler raises ``StopIteration``
+    once every iterator has stopped.
+
+    Example:
+
+    .. doctest::
+
+        >>> scheduler = IteratorScheduler()
+        >>> scheduler.add('a', iter('aaaaaa'), weight=2)
+        >>> scheduler.add('b', iter('bbb'))
+        >>> ''.join(scheduler)
+        'abaabaaba'
+
+    :param default_pause: Time an iterator is parked when it raises a
+        :class:`consensys_utils.exceptions.PauseIteration` with no timeout
+    :type default_pause: float
+    """
+
+    def __init__(self, default_pause=1):
+        self.default_pause = default_pause
+        self.entries = []
+
+    def add(self, name, iterator, weight=1, priority=0, backoff=None):
+        """Register an iterator
+
+        :param name: Name of the iterator
+        :type name: str
+        :param iterator: Iterator to schedule
+        :type iterator: iterator
+        :param weight: Relative share of steps among iterators with the same priority
+        :type weight: int
+        :param priority: Iterators with higher priority are advanced first
+        :type priority: int
+        :param backoff: Policy applied when the iterator pauses with no duration
+        :type backoff: :class:`consensys_utils.exceptions.Backoff`
+        """
+
+        self.entries.append(_SchedulerEntry(name, iterator, weight, priority, backoff))
+
+    def resume(self, name=None):
+        """Resume a parked iterator
+
+        :param name: Name of the iterator to resume (if ``None`` all iterators are resumed)
+        :type name: str
+        """
+
+        for entry in self.entries:
+            if name is None or entry.name == name:
+                entry.resume_at = 0
+                entry.condition = None
+
+    def set_partition(self, index, count):
+        """Forward worker partition to every iterator implementing ``set_partition``"""
+
+        for entry in self.entries:
+            if hasattr(entry.iterator, 'set_partition'):
+                entry.iterator.set_partition(index, count)
+
+    def select(self, now):
+        """Select the next iterator to advance (returns ``None`` if every iterator is parked)"""
+
+        ready, priority = [], None
+        for entry in self.entries:
+            if not entry.is_ready(now):
+                continue
+            if priority is None or entry.priority > priority:
+                ready, priority = [entry], entry.priority
+            elif entry.priority == priority:
+                ready.append(entry)
+
+        if not ready:
+            return None
+
+        # Smooth weighted round-robin
+        selected, total = None, 0
+        for entry in ready:
+            entry.current_weight += entry.weight
+            total += entry.weight
+            if selected is None or entry.current_weight > selected.current_weight:
+                selected = entry
+        selected.current_weight -= total
+
+        return selected
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self.entries:
+            now = time.monotonic()
+            entry = self.select(now)
+            if entry is None:
+                raise self.pause()
+
+            try:
+                value = next(entry.iterator)
+            except PauseIteration as e:
+                entry.park(e, now, self.default_pause)
+                continue
+            except StopIteration:
+                self.entries.remove(entry)
+                continue
+
+            if entry.last_backoff is not None:
+                # Iterator has progressed
+                entry.last_backoff.reset()
+                entry.last_backoff = None
+            return value
+
+        raise StopIteration
+
+    def pause(self):
+        """Pause lasting until the first parked iterator is due to resume"""
+
+        deadline = min(entry.resume_at for entry in self.entries)
+        conditions = [entry.condition for entry in self.entries if entry.condition is not None]
+
+        return PauseIteration(
+            deadline=deadline if deadline != float('inf') else None,
+            condition=(lambda: any(condition() for condition in conditions)) if conditions else None,
+        )
+
+
+class _SchedulerEntry:
+    __slots__ = ('name', 'iterator', 'weight', 'priority', 'backoff', 'last_backoff', 'current_weight',
+                 'resume_at', 'condition')
+
+    def __init__(self, name, iterator, weight, priority, backoff=None):
+        self.name = name
+        self.iterator = iterator
+        self.weight = weight
+        self.priority = priority
+        self.backoff = backoff
+        self.last_backoff = None
+        self.current_weight = 0
+        self.resume_at = 0
+        self.condition = None
+
+    def park(self, pause, now, default_pause):
+        self.condition = pause.condition
+        self.last_backoff = pause.backoff
+        if pause.deadline is not None:
+            self.resume_at = pause.deadline
+        elif pause.condition is not None:
+            self.resume_at = float('inf')
+        elif self.backoff is not None:
+            self.last_backoff = self.backoff
+            self.resume_at = now + self.backoff.next()
+        else:
+            self.resume_at = now + default_pause
+
+    def is_ready(self, now):
+        if self.resume_at <= now:
+            return True
+        if self.condition is not None and self.condition():
+            self.resume_at, self.condition = 0, None
+            return True
+        return False
+
+
+class _IterableAppMixin:
+    """Hooks called by iterating workers on an iterable application"""
+
+    iteration_waker = None
+    iteration_partition = 0
+
+    def set_partition(self, index, count):
+        self.iteration_partition = index
+        if hasattr(self.iterator, 'set_partition'):
+            self.iterator.set_partition(index, count)
+
+    def checkpointed_iterators(self):
+        if isinstance(self.iterator, IteratorScheduler):
+            return self.iterators.items()
+        return [('iterator', self.iterator)]
+
+    def checkpoint_iteration(self):
+        store = self.iteration_checkpoint_store
+        if store is not None:
+            for name, iterator in self.checkpointed_iterators():
+                if hasattr(iterator, 'checkpoint'):
+                    store.save('%s-%s' % (name, self.iteration_partition), iterator.checkpoint())
+
+    def restore_iteration(self):
+        store = self.iteration_checkpoint_store
+        if store is not None:
+            for name, iterator in self.checkpointed_iterators():
+                if hasattr(iterator, 'restore'):
+                    checkpoint = store.load('%s-%s' % (name, self.iteration_partition))
+                    if checkpoint is not None:
+                        iterator.restore(checkpoint)
+
+    def set_waker(self, waker):
+        self.iteration_waker = waker
+
+    def wake_iteration(self, name=None):
+        if isinstance(self.iterator, IteratorScheduler):
+            self.iterator.resume(name)
+        if self.iteration_waker is not None:
+            self.iteration_waker()
+
+
+class _SerializedAsyncGenerator:
+    """Advance an asynchronous generator one step at a time
+
+    An asynchronous generator raises ``RuntimeError`` when advanced while a step is in-flight (e.g. by the
+    iteration tasks of :class:`consensys_utils.gunicorn.workers.AsyncIteratingWorker` with
+    ``iteration_concurrency`` greater than 1) so steps wait for the previous one to complete.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.lock = None
+
+    async def __anext__(self):
+        if self.lock is None:
+            # Lock is created on the event loop running the steps
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            return await self.generator.__anext__()
+
+
+def iteration_metrics():
+    """View exposing iteration metrics of the worker serving the request"""
+
+    return jsonify(current_app.iteration_metrics.to_dict())
+
 
 class FlaskIterable:
     """Flask extension to make an application iterable
@@ -50,18 +306,104 @@ class FlaskIterable:
         3
         4
 
-    :param iterator_class: An iterator class (it must implement ``__iter__`` and ``__next__`` methods)
+    The extension also attaches an ``iteration_lock`` (a :class:`threading.RLock`) to the application.
+    Workers iterating on a dedicated thread (such as :class:`consensys_utils.gunicorn.workers.ThreadedIteratingWorker`)
+    hold it while iterating so it should be acquired before mutating the iterator from an HTTP handler.
+
+    Asynchronous iterators (implementing ``__aiter__`` and ``__anext__``) are also supported, in which case
+    the application becomes an asynchronous iterable to be run with
+    :class:`consensys_utils.gunicorn.workers.AsyncIteratingWorker`. Asynchronous generators are advanced one
+    step at a time, so only iterator classes with a re-entrant ``__anext__`` benefit from
+    ``iteration_concurrency``.
+
+    Once iteration is paused (c.f. :class:`consensys_utils.exceptions.PauseIteration`), producers running in
+    the worker process (such as a thread pushing events on a queue) can call ``app.wake_iteration()`` to resume
+    it immediately (it is thread-safe). With multiple iterators, ``app.wake_iteration(name)`` also resumes the
+    named parked iterator. Iterators implementing ``set_waker(waker)`` are given a function doing so
+    (c.f. :class:`consensys_utils.web3.subscription.SubscriptionIterator` waking iteration as soon as the
+    Ethereum node pushes an event).
+
+    The extension attaches an ``iteration_metrics`` (a :class:`consensys_utils.metrics.IterationMetrics`)
+    to the application that iterating workers record into. If ``iteration_metrics`` is set in application
+    configuration (c.f. :class:`consensys_utils.config.schema.flask.IterationMetricsConfigSchema`),
+    metrics are exposed on ``ENDPOINT_URL``.
+
+    Iterators can implement a ``checkpoint()`` method returning a JSON serializable snapshot of their progress
+    and a ``restore(checkpoint)`` method resuming from such a snapshot. If a checkpoint store is provided
+    (either as ``checkpoint_store`` or with ``iteration_checkpoint`` in application configuration
+    c.f. :class:`consensys_utils.config.schema.flask.IterationCheckpointConfigSchema`), iterating workers
+    restore iterators when they start and checkpoint them periodically and on graceful shutdown, so
+    a recycled worker resumes where the previous one stopped. Checkpoints are saved by iterator name and
+    worker partition.
+
+    If the iterator implements ``set_partition(index, count)``, iterating workers call it with the partition
+    assigned to the worker (c.f. :meth:`consensys_utils.gunicorn.workers.assign_partition`) so that
+    iterators can split a keyspace or a block range among workers.
+
+    Multiple named iterators can be registered on a single application with :meth:`add_iterator`.
+    They are then scheduled by an :class:`IteratorScheduler` (set as ``app.iterator``) and
+    every iterator is accessible in ``app.iterators``
+
+    .. doctest::
+
+        >>> app = Flask(__name__)
+        >>> iterable = FlaskIterable()
+        >>> iterable.add_iterator('blocks', iter(range(3)), weight=2)
+        >>> iterable.add_iterator('retries', iter('ab'))
+        >>> iterable.init_app(app)
+
+        >>> sorted(app.iterators)
+        ['blocks', 'retries']
+        >>> list(app)
+        [0, 'a', 1, 2, 'b']
+
+    :param iterator_class: An iterator class (it must implement either ``__iter__`` and ``__next__`` methods
+        or ``__aiter__`` and ``__anext__`` methods)
     :type iterator_class: type
     :param app: Optional Flask application or blueprint object to extend
     :type app: flask.Flask
+    :param checkpoint_store: Optional store to persist iterators checkpoints
+    :type checkpoint_store: :class:`consensys_utils.checkpoint.CheckpointStore`
     """
 
-    def __init__(self, iterator, app=None):
+    def __init__(self, iterator=None, app=None, checkpoint_store=None):
         self.iterator = iterator
+        self.iterators = []
+        self.checkpoint_store = checkpoint_store
 
         if app:  # pragma: no branch
             self.init_app(app)
 
+    def add_iterator(self, name, iterator, weight=1, priority=0, backoff=None):
+        """Register a named iterator
+
+        :param name: Name of the iterator
+        :type name: str
+        :param iterator: An iterator class or object
+        :type iterator: type
+        :param weight: Relative share of steps among iterators with the same priority
+        :type weight: int
+        :param priority: Iterators with higher priority are advanced first
+        :type priority: int
+        :param backoff: Policy applied when the iterator pauses with no duration
+        :type backoff: :class:`consensys_utils.exceptions.Backoff`
+        """
+
+        self.iterators.append((name, iterator, weight, priority, backoff))
+
+    @staticmethod
+    def create_iterator(iterator, app, name=None):
+        if isinstance(iterator, type):
+            iterator = iterator()
+
+        if hasattr(iterator, 'set_config'):
+            iterator.set_config(app.config)
+
+        if hasattr(iterator, 'set_waker'):
+            iterator.set_waker(lambda: app.wake_iteration(name))
+
+        return iterator
+
     def init_app(self, app):
         """Initialize application
 
@@ -69,20 +411,42 @@ class FlaskIterable:
         :type app: flask.Flask
         """
 
-        if isinstance(self.iterator, type):
-            app.iterator = self.iterator()
+        if self.iterators:
+            app.iterator = IteratorScheduler()
+            app.iterators = {}
+            for name, iterator, weight, priority, backoff in self.iterators:
+                app.iterators[name] = self.create_iterator(iterator, app, name)
+                app.iterator.add(name, app.iterators[name], weight=weight, priority=priority, backoff=backoff)
         else:
-            app.iterator = self.iterator
+            app.iterator = self.create_iterator(self.iterator, app)
 
-        if hasattr(app.iterator, 'set_config'):  # pragma: no branch
-            app.iterator.set_config(app.config)
+        app.iteration_lock = threading.RLock()
+
+        app.iteration_checkpoint_store = self.checkpoint_store
+        if app.iteration_checkpoint_store is None and 'iteration_checkpoint' in app.config:
+            app.iteration_checkpoint_store = create_checkpoint_store(app.config['iteration_checkpoint'])
+
+        app.iteration_metrics = IterationMetrics()
+        if 'iteration_metrics' in app.config:
+            app.add_url_rule(app.config['iteration_metrics']['ENDPOINT_URL'], 'iteration_metrics',
+                             iteration_metrics)
 
         # Overide application class to make it iterable
-        class Iterable(app.__class__):
-            def __iter__(self):
-                return app.iterator
+        if hasattr(app.iterator, '__anext__'):
+            iterator = _SerializedAsyncGenerator(app.iterator) if inspect.isasyncgen(app.iterator) else app.iterator
+
+            class Iterable(app.__class__, _IterableAppMixin):
+                def __aiter__(self):
+                    return self
+
+                def __anext__(self):
+                    return iterator.__anext__()
+        else:
+            class Iterable(app.__class__, _IterableAppMixin):
+                def __iter__(self):
+                    return app.iterator
 
-            def __next__(self):
-                return next(app.iterator)
+                def __next__(self):
+                    return next(app.iterator)
 
         app.__class__ = Iterable
@@ -8,9 +8,14 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import functools
+
 import flask_web3
+from flask import has_request_context, request
 
+from ... import logging
 from ...web3 import create_provider
+from ...web3.aio import create_async_provider, event_loop_thread
 
 
 class FlaskWeb3(flask_web3.FlaskWeb3):
@@ -30,8 +35,78 @@ class FlaskWeb3(flask_web3.FlaskWeb3):
         # Create a provider
         self.providers = self.create_provider(app.config.get('web3'))
 
+        # Asynchronous provider is created on first use
+        self.config = app.config.get('web3')
+        self._async_provider = None
+
         # Attached the extension to the app
         app.web3 = self
 
+    def batch(self):
+        """Context manager batching JSON-RPC requests (provider must be ``http-batch``)
+
+        c.f. :meth:`consensys_utils.web3.BatchHTTPProvider.batch`
+
+        Batches are sent to a single node: it raises a :class:`RuntimeError` if calls are balanced across
+        ``ETHEREUM_ENDPOINT_URIS`` or ``ETHEREUM_ARCHIVE_ENDPOINT_URIS`` nodes.
+        """
+
+        provider = self.providers[0]
+        if not hasattr(provider, 'batch'):
+            raise RuntimeError("FlaskWeb3.batch() requires an 'http-batch' provider with a single endpoint "
+                               "('ETHEREUM_ENDPOINT_URIS' and 'ETHEREUM_ARCHIVE_ENDPOINT_URIS' must not be set)")
+        return provider.batch()
+
+    @property
+    def async_provider(self):
+        """Asynchronous provider (c.f. :meth:`consensys_utils.web3.aio.create_async_provider`)
+
+        HTTP requests are sent with the extension provider.
+        """
+
+        if self._async_provider is None:
+            self._async_provider = create_async_provider(self.config, provider=self.providers[0])
+        return self._async_provider
+
+    def gather(self, calls, timeout=None):
+        """Send JSON-RPC requests concurrently and return their results
+
+        Requests are sent from the event loop of :data:`consensys_utils.web3.aio.event_loop_thread` so a view
+        making many calls waits about as long as the slowest call, e.g.
+        ``web3.gather([('eth_blockNumber', []), ('eth_getBalance', [address, 'latest'])])``
+
+        The ID of the request being served is captured on the calling thread, so requests sent from other threads
+        carry it (c.f. :func:`get_request_id`).
+
+        :param calls: JSON-RPC calls as ``(method, params)`` tuples
+        :type calls: list
+        :param timeout: Maximum time to wait for the results (in seconds)
+        :type timeout: float
+        :rtype: list
+        """
+
+        token = logging.set_request_id(get_request_id())
+        try:
+            return event_loop_thread.run(self.async_provider.gather(calls), timeout)
+        finally:
+            logging.reset_request_id(token)
+
+
+def get_request_id():
+    """Return the ID of the Flask request being served (c.f. :meth:`consensys_utils.flask.hooks.set_request_id_hook`)
+
+    Outside of a request context (e.g. on the threads sending the requests of :meth:`FlaskWeb3.gather`) it returns
+    the request ID of the current context (c.f. :func:`consensys_utils.logging.get_request_id`). It returns ``None``
+    if request has no ID.
+    """
+
+    if has_request_context():
+        request_id = getattr(request, 'id', None)
+    else:
+        request_id = logging.get_request_id()
+
+    if request_id != '-':
+        return request_id
+
 
-web3 = FlaskWeb3(create_provider=create_provider)
+web3 = FlaskWeb3(create_provider=functools.partial(create_provider, get_request_id=get_request_id))
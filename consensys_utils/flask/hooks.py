@@ -10,12 +10,17 @@
 
 from flask import request
 
+from .. import logging
+
 
 def set_request_id_hook(app):
     """Set a hook to inject request ID
 
     It basis on application config to get the request header from which to retrieve request ID
 
+    Request ID is also set in the current context until the request is torn down
+    (c.f. :func:`consensys_utils.logging.set_request_id`)
+
     :param app: Flask application
     :type app: :class:`flask.Flask`
     """
@@ -24,6 +29,14 @@ def set_request_id_hook(app):
         def set_request_id():
             """Set request id"""
             request.id = request.headers.get(app.config['wsgi']['request_id']['REQUEST_ID_HEADER']) or '-'
+            logging.set_request_id(request.id)
+
+        @app.teardown_request
+        def reset_request_id(exc):
+            """Reset request id"""
+            # Request context can be torn down after the WSGI call returned (e.g. when it is preserved) so the
+            # request ID is cleared rather than restored to a previous value
+            logging.set_request_id(None)
 
 
 DEFAULT_HOOK_SETTERS = [
@@ -17,17 +17,13 @@ from ..logging import IDFilter, create_logger as _create_logger
 
 
 class RequestIDFilter(IDFilter):
-    """Logging filter that allows to enrich log with Flask request ID"""
+    """Logging filter that allows to enrich log with Flask request ID
 
-    def filter(self, record):
-        """ Enrich log record with request ID"""
-
-        if flask.has_request_context():  # pragma: no branch
-            record.id = flask.request.id
-
-        super().filter(record)
-
-        return True
+    Request ID is read from the current context where it is set once per request by
+    :func:`consensys_utils.flask.hooks.set_request_id_hook` (c.f. :func:`consensys_utils.logging.set_request_id`)
+    so the filter does not look up Flask request context for every record. As with :class:`IDFilter`, an ID given
+    in record ``extra`` takes precedence.
+    """
 
 
 def create_logger(app, logger='app'):
@@ -41,7 +37,7 @@ def create_logger(app, logger='app'):
 
     # In case a config has been provided we use custom logger creation
     if 'logging' in app.config:
-        _create_logger(app.config['logging'])
+        _create_logger(app.config['logging'], app_name=app.config.get('APP_NAME'))
         return logging.getLogger(logger)
 
     # Otherwise classic flask logger creation
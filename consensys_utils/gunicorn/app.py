@@ -12,7 +12,10 @@ from gunicorn.app import base
 
 
 class WSGIApplication(base.Application):
-    """An enhanced gunicorn WSGIApplication including ConsenSys-Utils features"""
+    """An enhanced gunicorn WSGIApplication including ConsenSys-Utils features
+
+    By default it sets :meth:`consensys_utils.gunicorn.workers.assign_partition` as ``pre_fork`` hook
+    """
 
     def __init__(self, loader, *args, **kwargs):
         self.loader = loader
@@ -22,7 +25,9 @@ class WSGIApplication(base.Application):
         # init configuration
         # we import here so we do not load custom settings if not used
         from .config import Config
+        from .workers import assign_partition
         self.cfg = Config(self.usage, prog=self.prog)
+        self.cfg.set('pre_fork', assign_partition)
 
     def load_config(self):
         # Load application config and update current config
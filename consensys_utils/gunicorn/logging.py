@@ -8,11 +8,14 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import logging
+import os
+import re
 import traceback
 
-from gunicorn import glogging
+from gunicorn import glogging, util
 
-from ..logging import create_logger
+from ..logging import QueueHandler, create_logger
 from ..wsgi import header_to_environ_key
 
 
@@ -22,40 +25,188 @@ class Logger(glogging.Logger):
     In particular it overrides the following methods
 
     - `setup` to load logging configuration from a .yml file
+    - `reopen_files` and `close_on_exec` to also apply on file handlers enqueued with ``LOGGING_QUEUE``
+      (records still queued are handled when the master or a worker exits)
     """
 
     def setup(self, cfg):
         """Setup the logger configuration from .yml file"""
         super().setup(cfg)
         if hasattr(cfg, 'logging') and cfg.logging:  # pragma: no branch
-            create_logger(cfg.logging, glogging.CONFIG_DEFAULTS)
+            create_logger(cfg.logging, glogging.CONFIG_DEFAULTS, app_name=cfg.proc_name)
+
+    @staticmethod
+    def enqueued_file_handlers():
+        handlers = {handler.handler for log in glogging.loggers() for handler in log.handlers
+                    if isinstance(handler, QueueHandler)}
+        return [handler for handler in handlers if isinstance(handler, logging.FileHandler)]
+
+    def reopen_files(self):
+        super().reopen_files()
+        for handler in self.enqueued_file_handlers():
+            with handler.lock:
+                if handler.stream:
+                    handler.close()
+                    handler.stream = handler._open()
+
+    def close_on_exec(self):
+        super().close_on_exec()
+        for handler in self.enqueued_file_handlers():
+            with handler.lock:
+                if handler.stream:
+                    util.close_on_exec(handler.stream.fileno())
+
+
+#: Pattern of the atoms of an access log format (e.g. ``%(h)s``, ``%({x-request-id}i)s``)
+ACCESS_LOG_ATOM_PATTERN = re.compile(r'%\(([^)]*)\)')
+
+#: Names of access log atoms in structured access records (headers and environ variables atoms keep their key)
+ACCESS_LOG_ATOM_NAMES = {
+    'h': 'remote_addr',
+    'l': 'ident',
+    'u': 'user',
+    't': 'time',
+    'r': 'request',
+    's': 'status',
+    'm': 'method',
+    'U': 'path',
+    'q': 'query',
+    'H': 'protocol',
+    'b': 'response_length',
+    'B': 'response_bytes',
+    'f': 'referer',
+    'a': 'user_agent',
+    'T': 'request_time',
+    'D': 'request_time_us',
+    'L': 'request_time_s',
+    'p': 'pid',
+}
+
+
+def _get_header(headers, name):
+    if hasattr(headers, 'items'):
+        headers = headers.items()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return '-'
+
+
+def _get_environ(environ, name):
+    # Environ atoms are case insensitive
+    for key in (name, name.upper()):
+        if key in environ:
+            return environ[key]
+    return '-'
+
+
+def _get_status(resp):
+    status = resp.status
+    if isinstance(status, str):
+        status = status.split(None, 1)[0]
+    return status
 
 
 class RequestIDLogger(Logger):
-    """Gunicorn logger that handles Request ID header"""
+    """Gunicorn logger that handles Request ID header
+
+    Access log format is compiled on setup so each access record only computes the atoms its format uses
+    (instead of every request header, response header and environ variable atoms).
+
+    If ``access_log_structured`` is set, access records are logged with an ``access`` attribute holding the atoms
+    used by access log format by name (c.f. :data:`ACCESS_LOG_ATOM_NAMES`) instead of being formatted with
+    access log format (e.g. to be serialized by :class:`consensys_utils.logging.JSONFormatter` with
+    ``fields: [access]``).
+    """
 
     def __init__(self, *args, **kwargs):
-        self.request_id_atom = None
+        self.request_id_environ_key = None
+        self.access_log_format = None
+        self.access_atoms = []
         super().__init__(*args, **kwargs)
 
     def setup(self, cfg):
         super().setup(cfg)
         request_id_header = cfg.wsgi['request_id']['REQUEST_ID_HEADER']
-        request_id_environ_key = header_to_environ_key(request_id_header)
-        self.request_id_atom = '{%s}e' % request_id_environ_key.lower()
+        self.request_id_environ_key = header_to_environ_key(request_id_header)
+        self.compile_access_log_format(cfg.access_log_format)
+
+    def get_atom(self, key):
+        """Return the function computing an access log atom
+
+        :param key: Atom key (e.g. ``h``, ``{x-request-id}i``)
+        :type key: str
+        """
+
+        if key.startswith('{') and key[-2:] in ('}i', '}o', '}e'):
+            name, kind = key[1:-2].lower(), key[-1]
+            if kind == 'i':
+                return lambda resp, req, environ, request_time: _get_header(getattr(req, 'headers', req), name)
+            elif kind == 'o':
+                return lambda resp, req, environ, request_time: _get_header(resp.headers, name)
+            return lambda resp, req, environ, request_time: _get_environ(environ, name)
+
+        return {
+            'h': lambda resp, req, environ, request_time: environ.get('REMOTE_ADDR', '-'),
+            'l': lambda resp, req, environ, request_time: '-',
+            'u': lambda resp, req, environ, request_time: self._get_user(environ) or '-',
+            't': lambda resp, req, environ, request_time: self.now(),
+            'r': lambda resp, req, environ, request_time: '%s %s %s' % (
+                environ['REQUEST_METHOD'], environ['RAW_URI'], environ['SERVER_PROTOCOL']
+            ),
+            's': lambda resp, req, environ, request_time: _get_status(resp),
+            'm': lambda resp, req, environ, request_time: environ.get('REQUEST_METHOD'),
+            'U': lambda resp, req, environ, request_time: environ.get('PATH_INFO'),
+            'q': lambda resp, req, environ, request_time: environ.get('QUERY_STRING'),
+            'H': lambda resp, req, environ, request_time: environ.get('SERVER_PROTOCOL'),
+            'b': lambda resp, req, environ, request_time: (
+                getattr(resp, 'sent', None) is not None and str(resp.sent) or '-'
+            ),
+            'B': lambda resp, req, environ, request_time: getattr(resp, 'sent', None),
+            'f': lambda resp, req, environ, request_time: environ.get('HTTP_REFERER', '-'),
+            'a': lambda resp, req, environ, request_time: environ.get('HTTP_USER_AGENT', '-'),
+            'T': lambda resp, req, environ, request_time: request_time.seconds,
+            'D': lambda resp, req, environ, request_time: (
+                request_time.seconds * 1000000 + request_time.microseconds
+            ),
+            'L': lambda resp, req, environ, request_time: '%d.%06d' % (
+                request_time.seconds, request_time.microseconds
+            ),
+            'p': lambda resp, req, environ, request_time: '<%s>' % os.getpid(),
+        }.get(key, lambda resp, req, environ, request_time: '-')
+
+    def compile_access_log_format(self, access_log_format):
+        """Compile the functions computing the atoms used by an access log format
+
+        :param access_log_format: Access log format (e.g. ``%(h)s "%(r)s" %(s)s``)
+        :type access_log_format: str
+        """
+
+        keys = dict.fromkeys(ACCESS_LOG_ATOM_PATTERN.findall(access_log_format))
+        self.access_atoms = [(key, ACCESS_LOG_ATOM_NAMES.get(key, key), self.get_atom(key)) for key in keys]
+        self.access_log_format = access_log_format
 
     def access(self, resp, req, environ, request_time):
         """ See http://httpd.apache.org/docs/2.0/logs.html#combined
         for format details
         """
 
-        safe_atoms = self.atoms_wrapper_class(self.atoms(resp, req, environ,
-                                                         request_time))
+        if self.cfg.access_log_format != self.access_log_format:
+            # Access log format has changed since setup
+            self.compile_access_log_format(self.cfg.access_log_format)
 
         try:
             # Add an extra id field to be logged for request ID
-            self.access_log.info(self.cfg.access_log_format,
-                                 safe_atoms,
-                                 extra={'id': safe_atoms.get(self.request_id_atom, '-')})
+            request_id = environ.get(self.request_id_environ_key) or '-'
+            if getattr(self.cfg, 'access_log_structured', False):
+                access = {name: get(resp, req, environ, request_time) for _, name, get in self.access_atoms}
+                self.access_log.info('%s %s %s', environ.get('REQUEST_METHOD'), environ.get('RAW_URI'),
+                                     _get_status(resp), extra={'id': request_id, 'access': access})
+            else:
+                atoms = {}
+                for key, _, get in self.access_atoms:
+                    value = get(resp, req, environ, request_time)
+                    atoms[key] = value.replace('"', '\\"') if isinstance(value, str) else value
+                self.access_log.info(self.access_log_format, atoms, extra={'id': request_id})
         except Exception:  # pragma: no cover
             self.error(traceback.format_exc())
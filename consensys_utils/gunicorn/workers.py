@@ -8,25 +8,331 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import asyncio
+import contextlib
 import errno
+import os
+import selectors
 import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import gunicorn.http as http
 import gunicorn.util as util
-from gunicorn.workers.sync import SyncWorker, StopWaiting
+from gunicorn.workers.gthread import ThreadWorker
+from gunicorn.workers.sync import SyncWorker
 
 from ..exceptions import PauseIteration
+from ..metrics import IterationMetrics, StatsdClient
 
 
-class SyncIteratingWorker(SyncWorker):
+def assign_partition(server, worker):
+    """Gunicorn ``pre_fork`` hook assigning a partition to a worker
+
+    The worker receives the lowest partition index not used by its living siblings
+    (when workers are being replaced it receives the least used index). This makes partition assignment
+    deterministic: a worker replacing a dead one inherits its partition.
+
+    It is set by default on :class:`consensys_utils.gunicorn.app.WSGIApplication`. When running with another
+    gunicorn application, it can be set in a gunicorn config file
+
+    .. code-block:: python
+
+        from consensys_utils.gunicorn.workers import assign_partition
+
+        pre_fork = assign_partition
+
+    :param server: Gunicorn arbiter
+    :type server: :class:`gunicorn.arbiter.Arbiter`
+    :param worker: Worker about to be forked
+    :type worker: :class:`gunicorn.workers.base.Worker`
+    """
+
+    count = server.num_workers
+    used = [0] * count
+    for sibling in server.WORKERS.values():
+        index = getattr(sibling, 'partition_index', None)
+        if index is not None and index < count:
+            used[index] += 1
+
+    worker.partition_index = used.index(min(used))
+    worker.partition_count = count
+
+
+class _Pause:
+    """Pause state of an iteration loop"""
+
+    __slots__ = ('deadline', 'condition', 'started')
+
+    def __init__(self, pause, default_timeout):
+        self.started = time.monotonic()
+        self.deadline = pause.deadline
+        self.condition = pause.condition
+        if self.deadline is None and self.condition is None:
+            self.deadline = time.monotonic() + default_timeout
+
+    def timeout(self, max_timeout):
+        """Time to wait before checking the pause again"""
+
+        if self.deadline is None:
+            return max_timeout
+        return min(max(self.deadline - time.monotonic(), 0), max_timeout)
+
+    def is_over(self, woken):
+        """Indicate whether iteration can resume"""
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        if self.condition is not None:
+            return bool(self.condition())
+        return woken
+
+
+class IteratingWorkerMixin:
+    """Mixin implementing iteration on an iterable WSGI application object
+
+    Iteration steps can be batched: a call to :meth:`iterate` runs up to ``iteration_batch_size``
+    steps or ``iteration_time_slice_ms`` milliseconds of iteration (whichever comes first).
+
+    Once the WSGI object is loaded, if it implements ``set_partition(index, count)`` it is called
+    with the partition of the worker so iterators can share a keyspace among workers
+    (c.f. :meth:`assign_partition`).
+
+    Once paused by a :class:`consensys_utils.exceptions.PauseIteration`, iteration resumes when the pause
+    deadline is reached or when the worker is woken up (on an HTTP request or a call to :meth:`wake`) and the
+    pause condition holds. When the pause has been raised with an adaptive policy
+    (c.f. :class:`consensys_utils.exceptions.Backoff`) the policy is reset once iteration progresses
+    (at the granularity of a batch of steps).
+
+    If the WSGI object implements ``set_waker(waker)`` it is given :meth:`wake` so producers running
+    in the worker process can resume iteration as soon as new work arrives.
+
+    The worker records :class:`consensys_utils.metrics.IterationMetrics` (shared with the WSGI object
+    when it has an ``iteration_metrics`` attribute). Recording iteration steps is enabled with
+    the ``iteration_metrics`` setting. If ``statsd_host`` is set, metrics are pushed to statsd
+    every ``metrics_push_interval`` seconds.
+
+    If the WSGI object implements ``restore_iteration()`` and ``checkpoint_iteration()`` (c.f.
+    :class:`consensys_utils.flask.extensions.iterable.FlaskIterable`), iteration is restored once the WSGI object
+    is loaded and it is checkpointed every ``iteration_checkpoint_interval`` seconds and on graceful shutdown.
+    """
+
+    # Partition assigned by :meth:`assign_partition`
+    partition_index = None
+    partition_count = None
+
+    # Interval between 2 pushes of metrics to statsd (in seconds)
+    metrics_push_interval = 10
+
+    # Lock held while iterating (only set when iterating on a dedicated thread)
+    iteration_lock = None
+
+    # Set when iteration failed on a dedicated thread
+    iteration_failed = False
+
+    # Periodic checkpoints run on heart beat (workers iterating on a dedicated thread checkpoint between batches)
+    checkpoint_on_notify = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Iteration settings are unknown when the worker runs with a raw gunicorn configuration
+        self.iteration_batch_size = getattr(self.cfg, 'iteration_batch_size', 1)
+        self.iteration_time_slice = getattr(self.cfg, 'iteration_time_slice_ms', 0) / 1000
+
+        self.iteration_pause = None
+        self.iteration_backoff = None
+        self.woken = False
+
+        self.record_steps = getattr(self.cfg, 'iteration_metrics', False)
+        self.metrics = IterationMetrics()
+        self.statsd = None
+        self.metrics_next_push = 0
+
+        self.checkpoint_interval = getattr(self.cfg, 'iteration_checkpoint_interval', 0)
+        self.checkpoint_next = time.monotonic() + self.checkpoint_interval
+
+    def init_process(self):
+        if self.cfg.statsd_host:
+            self.statsd = StatsdClient(self.cfg.statsd_host, self.cfg.statsd_prefix)
+        super().init_process()
+
+    def load_wsgi(self):
+        super().load_wsgi()
+        # Share metrics with the application so they can be exposed over HTTP
+        self.metrics = getattr(self.wsgi, 'iteration_metrics', None) or self.metrics
+        self.set_partition()
+        if hasattr(self.wsgi, 'restore_iteration'):
+            # Resume iteration from last checkpoint
+            self.wsgi.restore_iteration()
+            self.checkpoint_next = time.monotonic() + self.checkpoint_interval
+        if hasattr(self.wsgi, 'set_waker'):
+            self.wsgi.set_waker(self.wake)
+
+    def notify(self):
+        super().notify()
+        if self.statsd is not None:
+            now = time.monotonic()
+            if now >= self.metrics_next_push:
+                self.statsd.push(self.metrics)
+                self.metrics_next_push = now + self.metrics_push_interval
+        if self.checkpoint_on_notify:
+            self.periodic_checkpoint()
+
+    def periodic_checkpoint(self):
+        """Checkpoint iteration once ``iteration_checkpoint_interval`` seconds have elapsed since last checkpoint"""
+
+        if self.checkpoint_interval:
+            now = time.monotonic()
+            if now >= self.checkpoint_next:
+                self.checkpoint()
+                self.checkpoint_next = now + self.checkpoint_interval
+
+    def checkpoint(self):
+        """Checkpoint iteration of the WSGI object (if it implements ``checkpoint_iteration``)"""
+
+        if hasattr(self.wsgi, 'checkpoint_iteration'):
+            try:
+                # Iteration should not progress while checkpointing
+                with self.iteration_lock or contextlib.nullcontext():
+                    self.wsgi.checkpoint_iteration()
+            except Exception:
+                self.log.exception("Error while checkpointing iteration")
+
+    @contextlib.contextmanager
+    def checkpointing(self):
+        """Context checkpointing iteration when it exits gracefully
+
+        Graceful exits are the worker stopping (on ``SIGTERM``, once ``max_requests`` has been reached or
+        when the arbiter died) and ``SystemExit`` (on ``SIGINT`` and ``SIGQUIT``). Iteration is not checkpointed
+        when it fails.
+        """
+
+        try:
+            yield
+        except SystemExit:
+            self.checkpoint()
+            raise
+        if not self.iteration_failed:
+            self.checkpoint()
+
+    def set_partition(self):
+        """Provide the WSGI object with the partition of the worker
+
+        If no partition has been assigned, it falls back on a partition derived from the worker age
+        """
+
+        if hasattr(self.wsgi, 'set_partition'):
+            count = self.partition_count or self.cfg.workers
+            if self.partition_index is not None:
+                index = self.partition_index
+            else:
+                index = (self.age - 1) % count
+            self.wsgi.set_partition(index, count)
+
+    def wake(self):
+        """Wake up the worker so paused iteration resumes immediately
+
+        It is thread-safe: it writes on the worker wakeup pipe which is polled by the worker loop
+        """
+
+        try:
+            os.write(self.PIPE[1], b'.')
+        except EnvironmentError as e:
+            # Pipe is full meaning a wakeup is already pending
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):  # pragma: no cover
+                raise
+
+    def pause_iteration(self, pause):
+        """Enter stale state
+
+        :param pause: Pause raised by the WSGI object
+        :type pause: :class:`consensys_utils.exceptions.PauseIteration`
+        """
+
+        self.iteration_pause = _Pause(pause, self.timeout or 1)
+        self.iteration_backoff = pause.backoff
+
+    def pause_timeout(self):
+        """Maximum time to wait for events (bounded by the worker heart beat)"""
+
+        if self.iteration_pause is None:
+            return 0
+        return self.iteration_pause.timeout(self.timeout or 1)
+
+    def resume_iteration(self):
+        """Indicate whether iteration can resume (it consumes the pending wakeup)"""
+
+        woken, self.woken = self.woken, False
+        pause = self.iteration_pause
+        if pause is not None:
+            if not pause.is_over(woken):
+                return False
+            self.metrics.record_pause(time.monotonic() - pause.started)
+            self.iteration_pause = None
+        return True
+
+    def iterate(self):
+        """Iterate on WSGI object
+
+        It runs a batch of at most ``iteration_batch_size`` steps that stops
+        once ``iteration_time_slice_ms`` milliseconds have elapsed
+        """
+
+        wsgi, steps = self.wsgi, 0
+        started = time.perf_counter()
+        try:
+            if self.iteration_batch_size == 1:
+                steps = 1
+                next(wsgi)
+            elif self.iteration_time_slice:
+                deadline = started + self.iteration_time_slice
+                for steps in range(1, self.iteration_batch_size + 1):
+                    next(wsgi)
+                    if time.perf_counter() >= deadline:
+                        break
+            else:
+                for steps in range(1, self.iteration_batch_size + 1):
+                    next(wsgi)
+        except PauseIteration:
+            if steps > 1:
+                # Iteration has progressed before pausing again
+                self.reset_backoff()
+            raise
+        finally:
+            if self.record_steps:
+                self.metrics.record_steps(steps, time.perf_counter() - started)
+
+        if self.iteration_backoff is not None:
+            self.reset_backoff()
+
+    def reset_backoff(self):
+        """Reset backoff policy of the last pause once iteration has progressed"""
+
+        if self.iteration_backoff is not None:
+            self.iteration_backoff.reset()
+            self.iteration_backoff = None
+
+
+class SyncIteratingWorker(IteratingWorkerMixin, SyncWorker):
     """A Gunicorn synchronous worker that allows to run an iterable WSGI application.
 
     It allows to run a loop process that iterates over a WSGI application object
     while allowing to process HTTP requests.
 
+    The loop is event-driven: every bound socket and the worker wakeup pipe are registered on
+    a selector (epoll on Linux) that is polled without blocking between iterations, so
+    iterating does not require a failing ``accept()`` call on each step. While iteration is paused
+    the loop blocks on the selector until the pause deadline, so :meth:`wake` resumes iteration
+    without latency.
+
     Since the worker is synchronous it is thread safe to modify
     the WSGI object either when iterating or when handling an HTTP request.
 
+    Iteration steps can be batched (c.f. :class:`IteratingWorkerMixin`): sockets are only
+    polled between batches. Batching lowers per step overhead while still bounding HTTP request latency.
+
     **Remark**
 
     Such a worker should not be considered highly performing as HTTP server but
@@ -42,11 +348,6 @@ class SyncIteratingWorker(SyncWorker):
         util.close_on_exec(client)
         self.handle(listener, client, address)
 
-    def iterate(self):
-        """Iterate on WSGI object"""
-
-        next(self.wsgi)
-
     def handle(self, listener, client, address):  # noqa: C901, pragma: no cover
         """Handle a request
 
@@ -89,18 +390,59 @@ class SyncIteratingWorker(SyncWorker):
         finally:
             util.close(client)
 
-    def run(self):  # noqa: C901
+    def wait(self, timeout):
+        """Wait for events on listening sockets and on the wakeup pipe
+
+        :param timeout: Maximum time to wait (``0`` means polling without blocking)
+        :type timeout: float
+        :return: Listeners that have a connection waiting to be accepted
+        :rtype: list
+        """
+
+        ready = []
+        for key, _ in self.poller.select(timeout):
+            if key.fileobj == self.PIPE[0]:
+                # Drain wakeup pipe (it is written to on signals and by :meth:`wake`)
+                self.read_wakeup()
+                self.woken = True
+            else:
+                ready.append(key.fileobj)
+        return ready
+
+    def read_wakeup(self):
+        """Drain the wakeup pipe"""
+
+        try:
+            while os.read(self.PIPE[0], 4096):
+                continue
+        except EnvironmentError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):  # pragma: no cover
+                raise
+
+    def init_poller(self):
+        """Register every listening socket and the wakeup pipe on a selector"""
+
+        self.poller = selectors.DefaultSelector()
+        for listener in self.sockets:
+            self.poller.register(listener, selectors.EVENT_READ)
+        self.poller.register(self.PIPE[0], selectors.EVENT_READ)
+
+    def run(self):
         """Run the main worker loop
 
         At each step of the loop it
 
-        1. Handles entry socket request if available
-        2. Iterate on the WSGI iterable object
+        1. Polls every listening socket (and the worker wakeup pipe) without blocking
+        2. Handles entry socket requests if any is available
+        3. Otherwise iterates on the WSGI iterable object
 
         If a :meth:`consensys_utils.exceptions.PauseIteration` is caught when iterating
         on the WSGI object then the loop waits by entering a stale state freeing CPU usage.
 
-        Receiving an HTTP request instantaneously gets the loop out of stale state.
+        Receiving an HTTP request or a call to :meth:`wake` instantaneously gets the loop out of stale state
+        (provided the pause condition holds).
+
+        Iteration is checkpointed when the loop stops gracefully.
         """
 
         # self.socket appears to lose its blocking status after
@@ -108,19 +450,38 @@ class SyncIteratingWorker(SyncWorker):
         for s in self.sockets:
             s.setblocking(0)
 
-        listener = self.sockets[0]
+        self.init_poller()
+
+        with self.checkpointing():
+            self.run_loop()
+
+    def run_loop(self):  # noqa: C901
         while self.alive:  # pragma: no branch
             self.notify()
 
-            # Accept a connection. If we get an error telling us
-            # that no connection is waiting we fall back to iteration
-            try:
-                self.accept(listener)
-                # Keep processing client until no one is waiting
+            # Poll listeners (blocking only when iteration has been paused and no wakeup is pending, so
+            # iteration resumes right after requests have been handled)
+            ready = self.wait(0 if self.woken else self.pause_timeout())
+
+            if ready:
+                for listener in ready:
+                    started = time.perf_counter()
+                    try:
+                        self.accept(listener)
+                        self.metrics.record_request(time.perf_counter() - started)
+                    except EnvironmentError as e:
+                        # Connection may have been accepted by another worker
+                        if e.errno not in (errno.EAGAIN, errno.ECONNABORTED, errno.EWOULDBLOCK):  # pragma: no cover
+                            raise
+                # Keep processing clients until no one is waiting
+                self.woken = True
+                continue
+
+            if not self.resume_iteration():
+                # Iteration is still paused
+                if not self.is_parent_alive():
+                    return
                 continue
-            except EnvironmentError as e:
-                if e.errno not in (errno.EAGAIN, errno.ECONNABORTED, errno.EWOULDBLOCK):  # pragma: no cover
-                    raise
 
             # If no client is waiting we fall back on iteration
             try:
@@ -128,21 +489,315 @@ class SyncIteratingWorker(SyncWorker):
                 # Keep iterating until an error is raised
                 continue
             except PauseIteration as e:
-                timeout = e.timeout or self.timeout or 1
+                self.pause_iteration(e)
             except StopIteration:  # pragma: no cover
                 self.log.info("Stop iteration")
                 raise
-            except Exception:
+            except Exception as e:
+                self.metrics.record_error(e)
                 self.log.exception("Error during iteration")
                 raise
 
             if not self.is_parent_alive():
                 return
 
+            # We wait until it is time to iterate again or
+            # we have received a message through the socket
+            self.log.debug("Pausing iteration")
+
+
+class ThreadedIteratingWorker(IteratingWorkerMixin, ThreadWorker):
+    """A Gunicorn threaded worker that runs an iterable WSGI application on a dedicated thread.
+
+    It is built on top of gunicorn ``gthread`` worker: HTTP requests are served by the worker thread pool
+    while the WSGI application object is iterated on a separate thread, so a slow iteration step does not
+    block HTTP requests and a slow HTTP request does not stall iteration.
+
+    Each batch of iteration steps runs while holding the application ``iteration_lock``
+    (c.f. :class:`consensys_utils.flask.extensions.iterable.FlaskIterable`). HTTP handlers mutating
+    the iterator should acquire the same lock
+
+    .. code-block:: python
+
+        @app.route('/set/<int:meter>')
+        def set(meter):
+            with current_app.iteration_lock:
+                current_app.iterator.meter = meter
+            return jsonify({'data': meter})
+
+    If a :meth:`consensys_utils.exceptions.PauseIteration` is caught the iteration thread sleeps until
+    the pause times out or it is woken up by an HTTP request or a call to :meth:`wake`.
+
+    The worker stops heart beating when an iteration step lasts longer than the worker timeout so the
+    arbiter restarts a worker whose iterator hangs (as it would do with :class:`SyncIteratingWorker`).
+
+    Periodic checkpoints run on the iteration thread between batches, so the worker main loop never waits
+    for a batch to complete.
+    """
+
+    checkpoint_on_notify = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.iteration_thread = None
+        self.iteration_lock = None
+        self.iteration_wakeup = None
+        self.iteration_step_started = None
+
+    def init_process(self):
+        self.iteration_wakeup = threading.Event()
+        super().init_process()
+
+    def load_wsgi(self):
+        super().load_wsgi()
+        # Share iteration lock with the application so HTTP handlers can synchronize with iteration
+        self.iteration_lock = getattr(self.wsgi, 'iteration_lock', None) or threading.RLock()
+
+    def notify(self):
+        started = self.iteration_step_started
+        if self.timeout and started is not None and time.monotonic() - started > self.timeout:
+            # Iteration step hangs, we stop heart beating
+            return
+        super().notify()
+
+    def wake(self):
+        """Wake up the iteration thread so paused iteration resumes immediately (thread-safe)"""
+
+        self.iteration_wakeup.set()
+
+    def handle_request(self, req, conn):
+        started = time.perf_counter()
+        try:
+            return super().handle_request(req, conn)
+        finally:
+            self.metrics.record_request(time.perf_counter() - started)
+            # Handling a request gets iteration out of stale state
+            self.iteration_wakeup.set()
+
+    def run_iteration(self):
+        """Iterate on WSGI object until the worker stops"""
+
+        while self.alive:
+            self.periodic_checkpoint()
             try:
-                # We wait until it is time to iterate again or
-                # we have received a message through the socket
-                self.log.debug("Pausing iteration for %s seconds" % timeout)
-                self.wait(timeout)
-            except StopWaiting:  # pragma: no cover
+                self.iteration_step_started = time.monotonic()
+                with self.iteration_lock:
+                    self.iterate()
+                # Keep iterating until an error is raised
+                continue
+            except PauseIteration as e:
+                self.pause_iteration(e)
+            except StopIteration:
+                self.log.info("Stop iteration")
+                self.alive = False
                 return
+            except Exception as e:
+                self.metrics.record_error(e)
+                self.log.exception("Error during iteration")
+                self.iteration_failed = True
+                self.alive = False
+                return
+            finally:
+                self.iteration_step_started = None
+
+            self.log.debug("Pausing iteration")
+            while self.alive:
+                self.woken = self.iteration_wakeup.wait(self.pause_timeout())
+                self.iteration_wakeup.clear()
+                if self.resume_iteration():
+                    break
+                self.periodic_checkpoint()
+
+    def run(self):
+        """Run the main worker loop
+
+        It starts the iteration thread and then serves HTTP requests like a gunicorn ``gthread`` worker
+        """
+
+        self.iteration_thread = threading.Thread(target=self.run_iteration, name='iteration', daemon=True)
+        self.iteration_thread.start()
+
+        with self.checkpointing():
+            try:
+                super().run()
+            finally:
+                self.alive = False
+                self.iteration_wakeup.set()
+                self.iteration_thread.join(self.cfg.graceful_timeout)
+
+
+class AsyncIteratingWorker(SyncIteratingWorker):
+    """A Gunicorn worker running an asynchronous iterable WSGI application on an :mod:`asyncio` event loop.
+
+    The WSGI application object must implement ``__aiter__`` and ``__anext__``
+    (c.f. :class:`consensys_utils.flask.extensions.iterable.FlaskIterable` with an asynchronous iterator).
+
+    The worker runs ``iteration_concurrency`` iteration tasks concurrently, each of them awaiting
+    ``__anext__`` in turn, so I/O bound iterators can have many steps in-flight. Connections are accepted on the
+    same event loop and, once data is available on them, read and handled on a pool of ``threads`` threads so a
+    slow client never blocks iteration tasks nor the worker heart beat.
+
+    A :meth:`consensys_utils.exceptions.PauseIteration` raised by ``__anext__`` is awaited by the
+    iteration task that caught it: it only parks this task (without blocking the event loop) until the
+    pause times out or the worker is woken up by an HTTP request or a call to :meth:`wake`
+    (provided the pause condition holds).
+
+    Iteration stops once every iteration task has received ``StopAsyncIteration``.
+
+    With ``iteration_concurrency`` greater than 1, ``__anext__`` is awaited by several tasks at once so steps only
+    run concurrently with an iterator class whose ``__anext__`` is re-entrant. Asynchronous generators can not be
+    advanced concurrently: :class:`consensys_utils.flask.extensions.iterable.FlaskIterable` advances them one
+    step at a time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.iteration_concurrency = getattr(self.cfg, 'iteration_concurrency', 1)
+        self.loop = None
+        self.executor = None
+        self.iteration_wakeup = None
+
+    def init_process(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        super().init_process()
+
+    def accept(self, listener):
+        try:
+            client, address = listener.accept()
+        except EnvironmentError as e:
+            # Connection may have been accepted by another worker
+            if e.errno not in (errno.EAGAIN, errno.ECONNABORTED, errno.EWOULDBLOCK):  # pragma: no cover
+                raise
+            return
+
+        client.setblocking(False)
+        util.close_on_exec(client)
+
+        # Handle connection once data is available
+        self.loop.add_reader(client, self.handle_ready, listener, client, address)
+
+    def handle_ready(self, listener, client, address):
+        """Handle a connection that has data available on the thread pool"""
+
+        self.loop.remove_reader(client)
+        # Connection is handled on a blocking socket: a request body split across packets or a response larger than
+        # the socket send buffer must not fail with EAGAIN
+        client.settimeout(self.cfg.timeout)
+        future = self.loop.run_in_executor(self.executor, self.handle_connection, listener, client, address)
+        future.add_done_callback(self.handled)
+
+    def handle_connection(self, listener, client, address):
+        started = time.perf_counter()
+        try:
+            self.handle(listener, client, address)
+        finally:
+            self.metrics.record_request(time.perf_counter() - started)
+
+    def handled(self, future):
+        if not future.cancelled() and future.exception() is not None:  # pragma: no cover
+            self.log.error("Error handling request", exc_info=future.exception())
+        # Handling a request gets iteration tasks out of stale state
+        self.wake_tasks()
+
+    def handle_wakeup(self):
+        """Drain the wakeup pipe and wake up paused iteration tasks"""
+
+        self.read_wakeup()
+        self.wake_tasks()
+
+    def wake_tasks(self):
+        self.iteration_wakeup.set()
+        self.iteration_wakeup.clear()
+
+    async def pause(self, pause):
+        """Pause an iteration task
+
+        :param pause: Pause raised by the WSGI object
+        :type pause: :class:`consensys_utils.exceptions.PauseIteration`
+        """
+
+        pause = _Pause(pause, self.timeout or 1)
+        while self.alive:
+            try:
+                await asyncio.wait_for(self.iteration_wakeup.wait(), pause.timeout(self.timeout or 1))
+                woken = True
+            except asyncio.TimeoutError:
+                woken = False
+
+            if pause.is_over(woken):
+                break
+
+        self.metrics.record_pause(time.monotonic() - pause.started)
+
+    async def run_iteration(self):
+        """Iteration task awaiting steps on the WSGI object until the worker stops"""
+
+        wsgi, backoff = self.wsgi, None
+        while self.alive:
+            started = time.perf_counter()
+            try:
+                await wsgi.__anext__()
+                if backoff is not None:
+                    # Iteration has progressed
+                    backoff.reset()
+                    backoff = None
+                # Keep iterating until an error is raised
+                continue
+            except PauseIteration as e:
+                pause, backoff = e, e.backoff
+            except StopAsyncIteration:
+                self.log.info("Stop iteration")
+                return
+            finally:
+                if self.record_steps:
+                    self.metrics.record_steps(1, time.perf_counter() - started)
+
+            self.log.debug("Pausing iteration")
+            await self.pause(pause)
+
+    async def serve(self, tasks):
+        """Heart beat until the worker stops or iteration tasks are done"""
+
+        while self.alive:
+            self.notify()
+
+            if not self.is_parent_alive():
+                return
+
+            done, _ = await asyncio.wait(tasks, timeout=1.0, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    self.metrics.record_error(task.exception())
+                    self.log.error("Error during iteration", exc_info=task.exception())
+                    raise task.exception()
+
+            if len(done) == len(tasks):
+                return
+
+    def run(self):
+        """Run the worker event loop"""
+
+        for s in self.sockets:
+            s.setblocking(0)
+            self.loop.add_reader(s, self.accept, s)
+        self.loop.add_reader(self.PIPE[0], self.handle_wakeup)
+
+        self.executor = ThreadPoolExecutor(self.cfg.threads)
+        self.iteration_wakeup = asyncio.Event()
+        tasks = [self.loop.create_task(self.run_iteration()) for _ in range(self.iteration_concurrency)]
+
+        with self.checkpointing():
+            try:
+                self.loop.run_until_complete(self.serve(tasks))
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+                for s in self.sockets:
+                    self.loop.remove_reader(s)
+                self.loop.remove_reader(self.PIPE[0])
+
+                # Requests being handled complete before the worker exits
+                self.executor.shutdown()
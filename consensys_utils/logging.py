@@ -8,31 +8,568 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import atexit
+import collections
+import copy
+import itertools
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import socket
+import threading
+import time
+import weakref
 from logging.config import dictConfig
 
+try:
+    import contextvars
+except ImportError:  # pragma: no cover
+    contextvars = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+# Python < 3.7 can not register fork hooks
+_AT_FORK = hasattr(os, 'register_at_fork')
+
+# Serialize a string to JSON (C implementation if available)
+encode_string = json.encoder.encode_basestring
+
+
+class _LocalVar(threading.local):
+    """Minimal substitute of :class:`contextvars.ContextVar` holding a value per thread (Python < 3.7)"""
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.value = default
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        token, self.value = self.value, value
+        return token
+
+    def reset(self, token):
+        self.value = token
+
+
+if contextvars is not None:  # pragma: no branch
+    _request_id = contextvars.ContextVar('request_id', default=None)
+else:  # pragma: no cover
+    _request_id = _LocalVar('request_id')
+
+
+def get_request_id():
+    """Return the ID of the request being processed in the current context (``None`` if not set)"""
+
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """Set the ID of the request being processed in the current context
+
+    It is set once per request by :class:`consensys_utils.wsgi.RequestIDMiddleware` and
+    :func:`consensys_utils.flask.hooks.set_request_id_hook` and read by :class:`IDFilter` for every log record.
+    Iterating workers and background threads can set their own ID.
+
+    .. doctest::
+
+        >>> token = set_request_id('abcde')
+        >>> get_request_id()
+        'abcde'
+        >>> reset_request_id(token)
+        >>> get_request_id() is None
+        True
+
+    :param request_id: Request ID
+    :type request_id: str
+    :return: Token to restore the previous ID with :func:`reset_request_id`
+    """
+
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    """Restore the request ID preceding a call to :func:`set_request_id`
+
+    :param token: Token returned by :func:`set_request_id`
+    """
+
+    _request_id.reset(token)
+
 
 class IDFilter(logging.Filter):
-    """Logging filter that add an ID attribute to log record"""
+    """Logging filter that add an ID attribute to log record
+
+    ID is the one given in record ``extra``, else the request ID of the current context
+    (c.f. :func:`set_request_id`), else ``-``.
+    """
 
     def filter(self, record):
         """Add an ID attribute to log record"""
 
-        if not hasattr(record, 'id') or record.id is None:  # pragma: no branch
-            record.id = '-'
+        if getattr(record, 'id', None) is None:
+            record.id = _request_id.get() or '-'
 
         return True
 
 
-def create_logger(config, default_config=None):
+class _SuppressingFilter(logging.Filter):
+    """Base class of filters suppressing records and periodically logging how many records have been suppressed
+
+    Summaries are logged as warnings on the logger of the first record filtered once ``summary_interval`` has
+    elapsed. An instance can be shared by several handlers, it then decides once per record.
+
+    :param name: Only records of this logger and its children are filtered (every record if empty)
+    :type name: str
+    :param summary_interval: Minimum time between two summaries (in seconds)
+    :type summary_interval: float
+    """
+
+    #: Summary message (formatted with number of suppressed records and key of :meth:`key`)
+    summary = "Suppressed %s log records: %s"
+
+    def __init__(self, name='', summary_interval=60):
+        super().__init__(name)
+        self.summary_interval = summary_interval
+        self.lock = threading.Lock()
+        self.suppressed = collections.Counter()
+        self.summary_time = time.monotonic()
+        # Record attribute holding the decision of this filter
+        self.decision_attr = '_keep_%s' % id(self)
+
+    def keep(self, record):
+        """Return whether to keep a record"""
+
+        raise NotImplementedError
+
+    def key(self, record):
+        """Return the key suppressed records are counted by"""
+
+        return record.levelname
+
+    def summarize(self, record):
+        now = time.monotonic()
+        if now < self.summary_time + self.summary_interval:
+            return
+
+        with self.lock:
+            if now < self.summary_time + self.summary_interval:  # pragma: no cover
+                return
+            suppressed, self.suppressed = self.suppressed, collections.Counter()
+            self.summary_time = now
+
+        logger = logging.getLogger(record.name)
+        for key, count in suppressed.items():
+            logger.warning(self.summary, count, key, extra={'suppressed': count})
+
+    def filter(self, record):
+        if not super().filter(record) or hasattr(record, 'suppressed'):
+            # Record is not concerned or is a summary
+            return True
+
+        keep = record.__dict__.get(self.decision_attr)
+        if keep is None:
+            self.summarize(record)
+            keep = self.keep(record)
+            setattr(record, self.decision_attr, keep)
+            if not keep:
+                with self.lock:
+                    self.suppressed[self.key(record)] += 1
+
+        return keep
+
+
+class SamplingFilter(_SuppressingFilter):
+    """Logging filter keeping one out of ``rate`` records up to ``level`` (records of a higher level are all kept)
+
+    .. doctest::
+
+        >>> sampling_filter = SamplingFilter(rate=3)
+        >>> records = [logging.makeLogRecord({'levelno': logging.INFO}) for _ in range(6)]
+        >>> [sampling_filter.filter(record) for record in records]
+        [True, False, False, True, False, False]
+
+    :param rate: Keep one out of ``rate`` records
+    :type rate: int
+    :param level: Maximum level of sampled records
+    :type level: int or str
+    """
+
+    summary = "Sampling suppressed %s log records of level %s"
+
+    def __init__(self, name='', rate=10, level=logging.INFO, summary_interval=60):
+        super().__init__(name, summary_interval)
+        self.rate = rate
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+        self.counter = itertools.count()
+
+    def keep(self, record):
+        return record.levelno > self.level or next(self.counter) % self.rate == 0
+
+
+class RateLimitFilter(_SuppressingFilter):
+    """Logging filter limiting the rate of records per message template with a token bucket
+
+    Records sharing a message template (e.g. ``'Call failed. Error: %s'``) are kept at most ``rate`` per second
+    on average, with bursts of at most ``burst`` records. Buckets of the ``max_templates`` most recent templates
+    are kept.
+
+    .. doctest::
+
+        >>> rate_limit_filter = RateLimitFilter(rate=1, burst=2)
+        >>> records = [logging.makeLogRecord({'msg': 'Call failed. Error: %s', 'args': (i,)}) for i in range(3)]
+        >>> [rate_limit_filter.filter(record) for record in records]
+        [True, True, False]
+
+    :param rate: Number of records kept per second and per message template
+    :type rate: float
+    :param burst: Maximum number of records kept at once per message template
+    :type burst: int
+    :param max_templates: Maximum number of message template buckets
+    :type max_templates: int
+    """
+
+    summary = "Rate limit suppressed %s log records of message %r"
+
+    def __init__(self, name='', rate=10, burst=10, max_templates=1024, summary_interval=60):
+        super().__init__(name, summary_interval)
+        self.rate = rate
+        self.burst = burst
+        self.max_templates = max_templates
+        self.buckets = collections.OrderedDict()
+
+    def key(self, record):
+        return str(record.msg)
+
+    def keep(self, record):
+        key = self.key(record)
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            keep = tokens >= 1
+            self.buckets[key] = (tokens - 1 if keep else tokens, now)
+            if len(self.buckets) > self.max_templates:
+                self.buckets.popitem(last=False)
+        return keep
+
+
+#: Live JSON formatters (reset in forked processes)
+_formatters = weakref.WeakSet()
+
+
+class JSONFormatter(logging.Formatter):
+    """Formatter serializing each record as a line of JSON
+
+    A line holds the record time (ISO 8601 in UTC unless ``datefmt`` is given), level, logger name, message and
+    ID (c.f. :class:`IDFilter`), the record attributes listed in ``fields`` when set, the exception and stack
+    if any, and static fields (application name, process ID and hostname). Static fields are serialized once
+    and the record ``__dict__`` is never serialized.
+
+    .. doctest::
+
+        >>> formatter = JSONFormatter(app_name='my-app', fields=['path'])
+        >>> record = logging.makeLogRecord({'name': 'app', 'levelname': 'INFO', 'msg': 'Hello %s', 'args': ('world',),
+        ...                                 'created': 0, 'msecs': 0, 'id': 'abcde', 'path': '/my/path'})
+        >>> data = json.loads(formatter.format(record))
+        >>> data['time'], data['message'], data['id'], data['path'], data['app']
+        ('1970-01-01T00:00:00.000Z', 'Hello world', 'abcde', '/my/path', 'my-app')
+
+    Values of ``fields`` and static fields are serialized with :mod:`ujson` if installed.
+
+    :param app_name: Application name (when declared with ``'()'`` in the configuration loaded by
+        :meth:`create_logger`, it defaults to the application name given to it, e.g. ``APP_NAME``)
+    :type app_name: str
+    :param fields: Record attributes to serialize
+    :type fields: list
+    :param static_fields: Extra static fields
+    :type static_fields: dict
+    """
+
+    def __init__(self, fmt=None, datefmt=None, style='%', app_name=None, fields=None, static_fields=None):
+        super().__init__(fmt, datefmt, style)
+        self.app_name = app_name
+        self.fields = tuple(fields or [])
+        self.static_fields = static_fields or {}
+        if ujson is not None:  # pragma: no cover
+            self.encode = lambda data: ujson.dumps(data, ensure_ascii=False)
+        else:
+            self.encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str).encode
+        self.second = None
+        self.second_text = None
+        self.static = None
+        self.reset()
+        _formatters.add(self)
+
+    def reset(self):
+        self.pid = os.getpid()
+        static_fields = dict({'app': self.app_name, 'pid': self.pid, 'host': socket.gethostname()},
+                             **self.static_fields)
+        # Serialized static fields to prepend to each record members
+        self.static = self.encode(static_fields)[:-1] + ','
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+
+        # Date is formatted once per second
+        second = int(record.created)
+        if second != self.second:
+            self.second_text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self.second = second
+        return '%s.%03dZ' % (self.second_text, record.msecs)
+
+    def format(self, record):
+        if not _AT_FORK and os.getpid() != self.pid:  # pragma: no cover
+            self.reset()
+
+        # Members are serialized one by one which is much cheaper than serializing a dictionary
+        line = '%s"time":%s,"level":%s,"logger":%s,"message":%s,"id":%s' % (
+            self.static,
+            encode_string(self.formatTime(record, self.datefmt)),
+            encode_string(record.levelname),
+            encode_string(record.name),
+            encode_string(record.getMessage()),
+            encode_string(str(getattr(record, 'id', None) or '-')),
+        )
+
+        for field in self.fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                line += ',%s:%s' % (encode_string(field), self.encode(value))
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += ',"exc_info":%s' % encode_string(record.exc_text)
+        if record.stack_info:
+            line += ',"stack_info":%s' % encode_string(self.formatStack(record.stack_info))
+
+        return line + '}'
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """Queue listener passing each record to the handler it has been enqueued for"""
+
+    def handle(self, item):
+        handler, record = item
+        handler.handle(record)
+
+    def enqueue_sentinel(self):
+        # Queue could be full
+        self.queue.put(self._sentinel)
+
+
+class LoggingQueue:
+    """Bounded queue of log records handled by a listener thread of the current process
+
+    When the queue is full records are either dropped (and counted in ``dropped``) or the logging thread
+    blocks until the listener catches up. Once the queue is stopped, records are handled on the logging thread.
+    Forked processes (e.g. gunicorn workers) start their own listener for the queue of :meth:`enqueue_handlers`.
+
+    :param max_size: Maximum number of queued records
+    :type max_size: int
+    :param block: Block when the queue is full (records are dropped otherwise)
+    :type block: bool
+    """
+
+    def __init__(self, max_size=10000, block=False):
+        self.max_size = max_size
+        self.block = block
+        self.dropped = 0
+        self.pid = None
+        self.queue = None
+        self.listener = None
+        self.start()
+
+    def start(self):
+        """Start the listener thread"""
+
+        self.pid = os.getpid()
+        self.queue = queue.Queue(self.max_size)
+        self.listener = _QueueListener(self.queue)
+        self.listener.start()
+
+    def restart(self):
+        # Listener thread does not survive fork and records queued by the parent process are not ours
+        if self.listener is not None:
+            self.start()
+
+    def put(self, item):
+        if not _AT_FORK and os.getpid() != self.pid:  # pragma: no cover
+            self.restart()
+
+        if self.listener is None:
+            handler, record = item
+            handler.handle(record)
+        elif self.block:
+            self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+
+    def stop(self):
+        """Handle every queued record and stop the listener thread"""
+
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            listener.stop()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Handler passing records to a target handler through a :class:`LoggingQueue`
+
+    Target handler filters are moved to this handler so they run on the logging thread (where they can read
+    the request being served).
+
+    :param logging_queue: Queue to pass records through
+    :type logging_queue: :class:`LoggingQueue`
+    :param handler: Target handler
+    :type handler: :class:`logging.Handler`
+    """
+
+    def __init__(self, logging_queue, handler):
+        super().__init__(logging_queue)
+        self.handler = handler
+        self.setLevel(handler.level)
+        self.filters, handler.filters = handler.filters, []
+
+    def prepare(self, record):
+        # Records are handled in the same process so only the message is merged (arguments could change meanwhile),
+        # on a copy as the record is still passed to the next handlers
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return self.handler, record
+
+    def enqueue(self, item):
+        self.queue.put(item)
+
+
+_logging_queue = None
+
+
+def _after_fork_in_child():
+    # Static fields hold the process ID and the listener thread does not survive fork
+    for formatter in list(_formatters):
+        formatter.reset()
+    if _logging_queue is not None:
+        _logging_queue.restart()
+
+
+if _AT_FORK:  # pragma: no branch
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def enqueue_handlers(max_size=10000, block=False):
+    """Move the handlers declared in logging configuration behind :class:`QueueHandler` so records are
+    handled on a listener thread instead of the logging thread
+
+    Records still queued on exit are handled before the process exits.
+
+    :param max_size: Maximum number of queued records
+    :type max_size: int
+    :param block: Block when the queue is full (records are dropped otherwise)
+    :type block: bool
+    :rtype: :class:`LoggingQueue`
+    """
+    global _logging_queue
+
+    if _logging_queue is None:
+        atexit.register(lambda: _logging_queue.stop())
+    _logging_queue = LoggingQueue(max_size, block)
+
+    wrappers = {}
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    for logger in loggers:
+        for i, handler in enumerate(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                # Handler enqueued by a previous configuration
+                handler.queue = _logging_queue
+            elif handler.name is not None:
+                # Only handlers declared in configuration are named
+                if handler not in wrappers:
+                    wrappers[handler] = QueueHandler(_logging_queue, handler)
+                logger.handlers[i] = wrappers[handler]
+
+    return _logging_queue
+
+
+def throttle_handlers(sampling_rate=1, sampling_level=logging.INFO, rate_limit=None, rate_limit_burst=10,
+                      summary_interval=60):
+    """Add a :class:`SamplingFilter` and a :class:`RateLimitFilter` to the handlers declared in logging configuration
+
+    Filters are shared by handlers so each record is sampled and counted once.
+
+    :param sampling_rate: Keep one out of ``sampling_rate`` records up to ``sampling_level`` (1 keeps every record)
+    :type sampling_rate: int
+    :param sampling_level: Maximum level of sampled records
+    :type sampling_level: int or str
+    :param rate_limit: Number of records kept per second and per message template (not limited if ``None``)
+    :type rate_limit: float
+    :param rate_limit_burst: Maximum number of records kept at once per message template
+    :type rate_limit_burst: int
+    :param summary_interval: Minimum time between two summaries of suppressed records (in seconds)
+    :type summary_interval: float
+    """
+
+    filters = []
+    if sampling_rate > 1:
+        filters.append(SamplingFilter(rate=sampling_rate, level=sampling_level, summary_interval=summary_interval))
+    if rate_limit is not None:
+        filters.append(RateLimitFilter(rate=rate_limit, burst=rate_limit_burst, summary_interval=summary_interval))
+
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    for logger in loggers:
+        for handler in logger.handlers:
+            # Only handlers declared in configuration are named
+            if handler.name is not None and not isinstance(handler, QueueHandler):
+                for _filter in filters:
+                    handler.addFilter(_filter)
+
+
+def _set_app_name(config, app_name):
+    """Set default application name of :class:`JSONFormatter` declared in logging configuration"""
+
+    formatters = {}
+    for name, formatter in (config.get('formatters') or {}).items():
+        if formatter.get('()') in [JSONFormatter, 'consensys_utils.logging.JSONFormatter']:
+            formatter = dict({'app_name': app_name}, **formatter)
+        formatters[name] = formatter
+    config['formatters'] = formatters
+
+
+def create_logger(config, default_config=None, app_name=None):
     """Create logger
 
+    If ``LOGGING_QUEUE`` is set, handlers are moved behind a bounded queue (c.f. :meth:`enqueue_handlers`) of
+    ``LOGGING_QUEUE_SIZE`` records, dropping records when full unless ``LOGGING_QUEUE_POLICY`` is ``block``.
+
+    If ``LOGGING_SAMPLING_RATE`` is greater than 1 or ``LOGGING_RATE_LIMIT`` is set, handlers suppress records
+    (c.f. :meth:`throttle_handlers`) before they are queued.
+
     :param config: Logging configuration
     :type config: dict
     :param default_config: Default logging configuration
     :type default_config: dict
+    :param app_name: Application name logged by :class:`JSONFormatter`
+    :type app_name: str
     """
 
+    if _logging_queue is not None:
+        # Records queued for handlers of the previous configuration are handled before they get closed
+        _logging_queue.stop()
+
     final_config = (default_config or {}).copy()
     final_config.update(config)
 
@@ -42,4 +579,16 @@ def create_logger(config, default_config=None):
         final_config.update(parse_yaml_file(final_config['LOGGING_CONFIG_PATH']))
 
     if final_config:  # pragma: no branch
+        _set_app_name(final_config, app_name)
         dictConfig(final_config)
+
+    if final_config.get('LOGGING_SAMPLING_RATE', 1) > 1 or final_config.get('LOGGING_RATE_LIMIT') is not None:
+        throttle_handlers(final_config.get('LOGGING_SAMPLING_RATE', 1),
+                          final_config.get('LOGGING_SAMPLING_LEVEL', 'INFO'),
+                          final_config.get('LOGGING_RATE_LIMIT'),
+                          final_config.get('LOGGING_RATE_LIMIT_BURST', 10),
+                          final_config.get('LOGGING_SUMMARY_INTERVAL', 60))
+
+    if final_config.get('LOGGING_QUEUE'):
+        enqueue_handlers(final_config.get('LOGGING_QUEUE_SIZE', 10000),
+                         final_config.get('LOGGING_QUEUE_POLICY', 'drop') == 'block')
@@ -0,0 +1,282 @@
+"""
+    consensys_utils.metrics
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement resources to measure iteration
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import collections
+import os
+import re
+import socket
+import threading
+import time
+
+from gunicorn import util
+
+
+class Histogram:
+    """HDR-style histogram of positive integer values
+
+    Values are counted in log-linear buckets: every power of two range is split into ``2 ** precision``
+    linear sub-buckets, so recording is constant time and quantiles are accurate within a relative error
+    of ``2 ** -precision`` whatever the magnitude of the values.
+
+    .. doctest::
+
+        >>> histogram = Histogram()
+        >>> for value in range(1, 1001):
+        ...     histogram.record(value)
+        >>> histogram.count, histogram.min, histogram.max
+        (1000, 1, 1000)
+        >>> histogram.percentile(50)
+        503
+
+    :param precision: Number of bits of precision of the buckets
+    :type precision: int
+    """
+
+    def __init__(self, precision=5):
+        self.precision = precision
+        self.sub_buckets = 1 << precision
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def index(self, value):
+        """Index of the bucket of a value"""
+
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.precision - 1
+        return ((shift + 1) << self.precision) + (value >> shift) - self.sub_buckets
+
+    def highest_value(self, index):
+        """Highest value counted in a bucket"""
+
+        if index < 2 * self.sub_buckets:
+            return index
+        shift = (index >> self.precision) - 1
+        return ((index - (shift << self.precision)) << shift) + (1 << shift) - 1
+
+    def record(self, value, count=1):
+        """Record a value
+
+        :param value: Value to record
+        :type value: int
+        :param count: Number of times the value has been observed
+        :type count: int
+        """
+
+        value = int(value)
+        if value < self.sub_buckets:
+            if value < 0:
+                value = 0
+            index = value
+        else:
+            shift = value.bit_length() - self.precision - 1
+            index = ((shift + 1) << self.precision) + (value >> shift) - self.sub_buckets
+
+        counts = self.counts
+        try:
+            counts[index] += count
+        except IndexError:
+            counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += count
+
+        self.count += count
+        self.total += value * count
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, percentile):
+        """Value under which the given percentage of recorded values fall
+
+        :param percentile: Percentile in ``[0, 100]``
+        :type percentile: float
+        """
+
+        if self.count == 0:
+            return 0
+
+        rank = max(percentile * self.count / 100, 1)
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            cumulated += count
+            if cumulated >= rank:
+                return min(self.highest_value(index), self.max)
+        return self.max  # pragma: no cover
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'min': self.min or 0,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+        }
+
+
+class IterationMetrics:
+    """Metrics of an iterating worker
+
+    It records
+
+    - iteration steps and the latency of each step (in micro-seconds)
+    - HTTP requests handled interleaved with iteration and their latency (in micro-seconds)
+    - pauses and the time spent paused (in micro-seconds)
+    - errors raised by iteration (by exception class name)
+
+    Iteration steps are expected to be recorded by a single thread (the one iterating) so recording them
+    does not require locking, other metrics are safe to record from multiple threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+        self.steps = 0
+        self.requests = 0
+        self.pauses = 0
+        self.errors = collections.Counter()
+
+        self.iteration_time = 0.
+        self.request_time = 0.
+        self.pause_time = 0.
+
+        self.step_latency = Histogram()
+        self.request_latency = Histogram()
+        self.pause_duration = Histogram()
+
+    def record_steps(self, steps, duration):
+        """Record iteration steps
+
+        :param steps: Number of steps
+        :type steps: int
+        :param duration: Time taken by the steps (in seconds)
+        :type duration: float
+        """
+
+        if steps:
+            self.steps += steps
+            self.iteration_time += duration
+            self.step_latency.record(duration * 1e6 / steps, steps)
+
+    def record_request(self, duration):
+        """Record an HTTP request
+
+        :param duration: Time taken to handle the request (in seconds)
+        :type duration: float
+        """
+
+        with self.lock:
+            self.requests += 1
+            self.request_time += duration
+            self.request_latency.record(duration * 1e6)
+
+    def record_pause(self, duration):
+        """Record a pause
+
+        :param duration: Time spent paused (in seconds)
+        :type duration: float
+        """
+
+        with self.lock:
+            self.pauses += 1
+            self.pause_time += duration
+            self.pause_duration.record(duration * 1e6)
+
+    def record_error(self, error):
+        """Record an iteration error
+
+        :param error: Error raised by iteration
+        :type error: Exception
+        """
+
+        with self.lock:
+            self.errors[error.__class__.__name__] += 1
+
+    def to_dict(self):
+        with self.lock:
+            uptime = time.monotonic() - self.started
+            return {
+                'pid': os.getpid(),
+                'uptime': uptime,
+                'steps': self.steps,
+                'steps_per_second': self.steps / uptime if uptime else 0,
+                'requests': self.requests,
+                'pauses': self.pauses,
+                'errors': dict(self.errors),
+                'iteration_time': self.iteration_time,
+                'request_time': self.request_time,
+                'pause_time': self.pause_time,
+                'pause_ratio': self.pause_time / uptime if uptime else 0,
+                'step_latency': self.step_latency.to_dict(),
+                'request_latency': self.request_latency.to_dict(),
+                'pause_duration': self.pause_duration.to_dict(),
+            }
+
+
+class StatsdClient:
+    """Push :class:`IterationMetrics` to a statsd server over UDP
+
+    Counters are pushed as statsd counters (incremented by their variation since the last push) so they
+    aggregate across workers. Latency histograms are summarized by their 50th and 99th percentiles
+    and their maximum, pushed as timers (in milliseconds).
+
+    :param host: Statsd server address (``host:port``)
+    :type host: str
+    :param prefix: Prefix of metric names
+    :type prefix: str
+    """
+
+    COUNTERS = ['steps', 'requests', 'pauses']
+    TIMES = ['iteration_time', 'request_time', 'pause_time']
+    HISTOGRAMS = ['step_latency', 'request_latency', 'pause_duration']
+
+    def __init__(self, host, prefix=''):
+        self.prefix = re.sub(r'^(.+[^.]+)\.*$', '\\g<1>.', prefix or '')
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect(util.parse_address(host, 8125))
+        self.last = collections.Counter()
+
+    def lines(self, metrics):
+        values = metrics.to_dict()
+        current = collections.Counter({name: values[name] for name in self.COUNTERS})
+        current.update({name: int(values[name] * 1000) for name in self.TIMES})
+        current.update({'errors.%s' % name: count for name, count in values['errors'].items()})
+
+        for name, value in sorted(current.items()):
+            if value != self.last[name]:
+                yield '%siteration.%s:%s|c' % (self.prefix, name, value - self.last[name])
+        self.last = current
+
+        for name in self.HISTOGRAMS:
+            for key in ['p50', 'p99', 'max']:
+                yield '%siteration.%s.%s:%s|ms' % (self.prefix, name, key, values[name][key] / 1000)
+
+    def push(self, metrics):
+        """Push metrics
+
+        :param metrics: Metrics to push
+        :type metrics: :class:`IterationMetrics`
+        """
+
+        try:
+            self.sock.send('\n'.join(self.lines(metrics)).encode('ascii'))
+        except OSError:  # pragma: no cover
+            # Statsd is best effort
+            pass
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,470 @@
+"""
+    consensys_utils.web3
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Implement Web3 resources
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import contextlib
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider, IPCProvider, WebsocketProvider
+
+from .balancer import CircuitBreaker, Endpoint, MultiEndpointProvider
+from .cache import create_response_cache
+from .compat import get_request_kwargs, next_rpc_id
+from .connection import PersistentIPCProvider, PersistentWebsocketProvider
+from .utils import encode_rpc_request
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """HTTP provider sending requests on a pool of keep-alive connections
+
+    Every worker process holds its own :class:`requests.Session` (a session is never shared across a fork) with an
+    :class:`requests.adapters.HTTPAdapter` keeping up to ``pool_size`` connections open to the Ethereum node,
+    so TCP/TLS connection setup is not paid on each JSON-RPC call.
+
+    :param endpoint_uri: Ethereum node endpoint url
+    :type endpoint_uri: str
+    :param request_kwargs: Extra keyword arguments to pass to :meth:`requests.Session.post`
+    :type request_kwargs: dict
+    :param pool_size: Maximum number of connections kept open
+    :type pool_size: int
+    :param max_retries: Maximum number of retries on connection errors
+    :type max_retries: int
+    :param connect_timeout: Connection timeout (in seconds)
+    :type connect_timeout: float
+    :param read_timeout: Read timeout (in seconds)
+    :type read_timeout: float
+    :param keep_alive: Keep connections open between requests
+    :type keep_alive: bool
+    """
+
+    def __init__(self, endpoint_uri=None, request_kwargs=None, pool_size=10, max_retries=0, connect_timeout=10,
+                 read_timeout=10, keep_alive=True):
+        super().__init__(endpoint_uri=endpoint_uri, request_kwargs=request_kwargs)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self):
+        """Session of the current process"""
+
+        if self._session_pid != os.getpid():
+            self._session = self.create_session()
+            self._session_pid = os.getpid()
+        return self._session
+
+    def create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=self.max_retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def post(self, request_data):
+        """Post JSON-RPC request data and return the raw response content"""
+
+        kwargs = self.get_request_kwargs()
+        kwargs.setdefault('timeout', self.timeout)
+        raw_response = self.session.post(self.endpoint_uri, data=request_data, **kwargs)
+        raw_response.raise_for_status()
+        return raw_response.content
+
+    def get_request_kwargs(self):
+        return get_request_kwargs(self, HTTPProvider)
+
+    def make_request(self, method, params):
+        self.logger.debug("Making request HTTP. URI: %s, Method: %s", self.endpoint_uri, method)
+        response = self.decode_rpc_response(self.post(self.encode_rpc_request(method, params)))
+        self.logger.debug("Getting response HTTP. URI: %s, Method: %s, Response: %s",
+                          self.endpoint_uri, method, response)
+        return response
+
+
+class RequestIDProviderMixin:
+    """Provider mixin propagating the ID of the request being served to the Ethereum node
+
+    The request ID is returned by ``get_request_id`` (``None`` when not serving any request) and is
+
+    - sent as ``request_id_header`` HTTP header (HTTP providers only)
+    - used as prefix of JSON-RPC request ``id`` (e.g. ``"7b2e...-12"``) if ``request_id_prefix`` is set
+
+    so node side logs and latency can be attributed to the request.
+
+    :param get_request_id: Function returning the current request ID
+    :type get_request_id: callable
+    :param request_id_header: HTTP header where to send request ID
+    :type request_id_header: str
+    :param request_id_prefix: Prefix JSON-RPC request id with request ID
+    :type request_id_prefix: bool
+    """
+
+    def __init__(self, *args, get_request_id=None, request_id_header=None, request_id_prefix=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.get_request_id = get_request_id or (lambda: None)
+        self.request_id_header = request_id_header
+        self.request_id_prefix = request_id_prefix
+
+    def next_rpc_id(self):
+        rpc_id = next_rpc_id(self)
+        request_id = self.get_request_id() if self.request_id_prefix else None
+        return '%s-%s' % (request_id, rpc_id) if request_id else rpc_id
+
+    def encode_rpc_request(self, method, params):
+        return encode_rpc_request(method, params, self.next_rpc_id())
+
+    def get_request_kwargs(self):
+        kwargs = super().get_request_kwargs()
+        request_id = self.get_request_id() if self.request_id_header else None
+        if request_id:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **{self.request_id_header: request_id})
+        return kwargs
+
+
+class BatchRPCRequest:
+    """JSON-RPC request sent in a batch
+
+    Its ``response`` is set once the batch has been sent.
+    """
+
+    __slots__ = ('rpc_id', 'data', 'response', 'error', 'sent')
+
+    def __init__(self, rpc_id, data):
+        self.rpc_id = rpc_id
+        self.data = data
+        self.response = None
+        self.error = None
+        self.sent = threading.Event()
+
+    @property
+    def result(self):
+        """JSON-RPC result
+
+        It raises the error that occurred when sending the batch or a :class:`ValueError` if the node answered
+        a JSON-RPC error (as :class:`web3.Web3` does)
+        """
+
+        if self.error is not None:
+            raise self.error
+        if self.response is None:
+            raise RuntimeError('Batch has not been sent yet')
+        if 'error' in self.response:
+            raise ValueError(self.response['error'])
+        return self.response.get('result')
+
+
+class JSONRPCBatch:
+    """Batch of JSON-RPC requests sent in a single HTTP request (c.f. :meth:`BatchHTTPProvider.batch`)
+
+    :param provider: Provider sending the batch
+    :type provider: :class:`BatchHTTPProvider`
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.requests = []
+
+    def add(self, method, params=None):
+        """Add a request to the batch
+
+        :param method: JSON-RPC method
+        :type method: str
+        :param params: JSON-RPC params
+        :type params: list
+        :rtype: :class:`BatchRPCRequest`
+        """
+
+        request = self.provider.create_batch_request(method, params)
+        self.requests.append(request)
+        return request
+
+
+class BatchHTTPProvider(PooledHTTPProvider):
+    """HTTP provider sending JSON-RPC requests in batches
+
+    Requests can be batched
+
+    - explicitly by adding raw JSON-RPC requests to a batch which is sent on leaving :meth:`batch` context
+
+        >>> provider = BatchHTTPProvider('http://localhost:8545')
+        >>> with provider.batch() as batch:  # doctest: +SKIP
+        ...     balances = [batch.add('eth_getBalance', [address, 'latest']) for address in addresses]
+        >>> [balance.result for balance in balances]  # doctest: +SKIP
+
+    - implicitly when ``batch_window`` is set: a request made while no other request is being sent is sent at
+      once, requests made concurrently by multiple threads (e.g. by a gunicorn ``gthread`` worker) while
+      another request is being sent are coalesced in a batch sent ``batch_window`` seconds after the first
+      of them. A batch is sent early if it reaches ``batch_max_size`` requests.
+
+    Responses are dispatched to requests by JSON-RPC id.
+
+    :param batch_window: Time window in seconds during which concurrent requests are coalesced (``0`` to disable)
+    :type batch_window: float
+    :param batch_max_size: Maximum number of requests in a batch
+    :type batch_max_size: int
+    """
+
+    def __init__(self, *args, batch_window=0, batch_max_size=100, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        self.pending = []
+        self.pending_condition = threading.Condition()
+        # Number of requests and batches being sent
+        self.in_flight = 0
+
+    def next_rpc_id(self):
+        return next_rpc_id(self)
+
+    def create_batch_request(self, method, params):
+        rpc_id = self.next_rpc_id()
+        return BatchRPCRequest(rpc_id, encode_rpc_request(method, params, rpc_id))
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager yielding a :class:`JSONRPCBatch` which is sent when leaving the context"""
+
+        batch = JSONRPCBatch(self)
+        yield batch
+        self.send_batch(batch.requests)
+
+    def send_batch(self, batch_requests):
+        """Send requests in a single HTTP request and dispatch responses
+
+        :param batch_requests: Requests to send
+        :type batch_requests: list of :class:`BatchRPCRequest`
+        """
+
+        if not batch_requests:
+            return
+
+        try:
+            self.logger.debug("Making batch request HTTP. URI: %s, Size: %s", self.endpoint_uri, len(batch_requests))
+            responses = self.decode_rpc_response(self.post(b'[' + b','.join(r.data for r in batch_requests) + b']'))
+            if not isinstance(responses, list):
+                # Node could not parse the batch and answered a single error
+                responses = [responses]
+            responses = {response.get('id'): response for response in responses}
+            for request in batch_requests:
+                request.response = responses.get(request.rpc_id) or {
+                    'jsonrpc': '2.0',
+                    'id': request.rpc_id,
+                    'error': {'code': -32603, 'message': 'Missing response in JSON-RPC batch'},
+                }
+        except Exception as e:
+            for request in batch_requests:
+                request.error = e
+        finally:
+            for request in batch_requests:
+                request.sent.set()
+
+    def make_request(self, method, params):
+        if not self.batch_window:
+            return super().make_request(method, params)
+
+        with self.pending_condition:
+            if not self.in_flight:
+                # No request overlaps so request is sent at once
+                self.in_flight += 1
+                request = None
+            else:
+                request = self.create_batch_request(method, params)
+                self.pending.append(request)
+                if len(self.pending) == 1:
+                    # First request of the batch waits for concurrent requests then sends the batch
+                    self.pending_condition.wait_for(lambda: len(self.pending) >= self.batch_max_size,
+                                                    self.batch_window)
+                    batch_requests, self.pending = self.pending, []
+                    self.in_flight += 1
+                else:
+                    batch_requests = None
+                    if len(self.pending) >= self.batch_max_size:
+                        self.pending_condition.notify_all()
+
+        if request is None:
+            try:
+                return super().make_request(method, params)
+            finally:
+                with self.pending_condition:
+                    self.in_flight -= 1
+
+        if batch_requests is not None:
+            try:
+                self.send_batch(batch_requests)
+            finally:
+                with self.pending_condition:
+                    self.in_flight -= 1
+        else:
+            request.sent.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.response
+
+
+class RequestIDHTTPProvider(RequestIDProviderMixin, PooledHTTPProvider):
+    """HTTP provider propagating request ID (c.f. :class:`RequestIDProviderMixin`)"""
+
+
+class RequestIDBatchHTTPProvider(RequestIDProviderMixin, BatchHTTPProvider):
+    """Batch HTTP provider propagating request ID (c.f. :class:`RequestIDProviderMixin`)"""
+
+
+class RequestIDIPCProvider(RequestIDProviderMixin, IPCProvider):
+    """IPC provider propagating request ID (c.f. :class:`RequestIDProviderMixin`)"""
+
+
+class RequestIDWebsocketProvider(RequestIDProviderMixin, WebsocketProvider):
+    """Websocket provider propagating request ID (c.f. :class:`RequestIDProviderMixin`)"""
+
+
+class RequestIDPersistentIPCProvider(RequestIDProviderMixin, PersistentIPCProvider):
+    """Persistent IPC provider propagating request ID (c.f. :class:`RequestIDProviderMixin`)"""
+
+
+class RequestIDPersistentWebsocketProvider(RequestIDProviderMixin, PersistentWebsocketProvider):
+    """Persistent websocket provider propagating request ID (c.f. :class:`RequestIDProviderMixin`)"""
+
+
+# Provider classes by ``ETHEREUM_PROVIDER`` (without and with request ID propagation)
+PROVIDER_CLASSES = {
+    'http': (PooledHTTPProvider, RequestIDHTTPProvider),
+    'http-batch': (BatchHTTPProvider, RequestIDBatchHTTPProvider),
+    'ipc': (PersistentIPCProvider, RequestIDPersistentIPCProvider),
+    'ws': (PersistentWebsocketProvider, RequestIDPersistentWebsocketProvider),
+}
+
+
+def get_provider_opts(config):
+    """Options to instantiate the provider with, computed from configuration"""
+
+    provider, opts = config.get('ETHEREUM_PROVIDER'), {}
+
+    if provider in ['http', 'http-batch']:
+        opts.update({
+            'pool_size': config.get('ETHEREUM_POOL_SIZE', 10),
+            'max_retries': config.get('ETHEREUM_MAX_RETRIES', 0),
+            'connect_timeout': config.get('ETHEREUM_CONNECT_TIMEOUT', 10),
+            'read_timeout': config.get('ETHEREUM_READ_TIMEOUT', 10),
+            'keep_alive': config.get('ETHEREUM_KEEP_ALIVE', True),
+        })
+
+    if provider == 'http-batch':
+        opts.update({
+            'batch_window': config.get('ETHEREUM_BATCH_WINDOW_MS', 0) / 1000,
+            'batch_max_size': config.get('ETHEREUM_BATCH_MAX_SIZE', 100),
+        })
+
+    if provider in ['ipc', 'ws']:
+        opts.update({
+            'timeout': config.get('ETHEREUM_READ_TIMEOUT', 10),
+            'reconnect_delay': config.get('ETHEREUM_RECONNECT_DELAY', 0.1),
+            'max_reconnect_delay': config.get('ETHEREUM_MAX_RECONNECT_DELAY', 10),
+        })
+
+    if provider == 'ipc':
+        opts['ipc_path'] = config.get('ETHEREUM_IPC_PATH')
+    else:
+        opts['endpoint_uri'] = config.get('ETHEREUM_ENDPOINT_URI')
+
+    opts.update(config.get('ETHEREUM_OPTS') or {})
+    return opts
+
+
+def create_multi_endpoint_provider(config, provider_class, opts):
+    """Create a :class:`consensys_utils.web3.balancer.MultiEndpointProvider` balancing calls across
+    ``ETHEREUM_ENDPOINT_URIS`` and ``ETHEREUM_ARCHIVE_ENDPOINT_URIS`` nodes
+
+    :param config: Provider configuration (compatible with :meth:`consensys_utils.config.schema.web3.Web3ConfigSchema`)
+    :type config: dict
+    :param provider_class: Class of the provider connecting to each node
+    :type provider_class: type
+    :param opts: Options to instantiate providers with
+    :type opts: dict
+    """
+
+    endpoints = []
+    for uris, archive in [(config.get('ETHEREUM_ENDPOINT_URIS') or [], False),
+                          (config.get('ETHEREUM_ARCHIVE_ENDPOINT_URIS') or [], True)]:
+        for uri in uris:
+            breaker = CircuitBreaker(failure_threshold=config.get('ETHEREUM_FAILURE_THRESHOLD', 3),
+                                     recovery_timeout=config.get('ETHEREUM_RECOVERY_TIMEOUT', 30))
+            endpoints.append(Endpoint(provider_class(**dict(opts, endpoint_uri=uri)), archive=archive, breaker=breaker))
+
+    return MultiEndpointProvider(endpoints, archive_methods=config.get('ETHEREUM_ARCHIVE_METHODS'))
+
+
+def create_provider(config, get_request_id=None):
+    """Create a web3.py provider
+
+    HTTP providers (``http`` and ``http-batch``) are :class:`PooledHTTPProvider` configured by
+    ``ETHEREUM_POOL_SIZE``, ``ETHEREUM_MAX_RETRIES``, ``ETHEREUM_CONNECT_TIMEOUT``, ``ETHEREUM_READ_TIMEOUT``
+    and ``ETHEREUM_KEEP_ALIVE``.
+
+    ``http-batch`` provider is a :class:`BatchHTTPProvider` coalescing concurrent requests within
+    ``ETHEREUM_BATCH_WINDOW_MS`` milliseconds in batches of at most ``ETHEREUM_BATCH_MAX_SIZE`` requests.
+
+    If ``ETHEREUM_REQUEST_ID_HEADER`` or ``ETHEREUM_REQUEST_ID_PREFIX`` is set the provider propagates request IDs
+    returned by ``get_request_id`` (c.f. :class:`RequestIDProviderMixin`)
+
+    ``ipc`` and ``ws`` providers are :class:`consensys_utils.web3.connection.PersistentIPCProvider` and
+    :class:`consensys_utils.web3.connection.PersistentWebsocketProvider` multiplexing requests of every thread on
+    a persistent connection per worker, opened again in the background (``ETHEREUM_RECONNECT_DELAY``,
+    ``ETHEREUM_MAX_RECONNECT_DELAY``) when lost.
+
+    If ``ETHEREUM_ENDPOINT_URIS`` or ``ETHEREUM_ARCHIVE_ENDPOINT_URIS`` is set (``http``, ``http-batch`` and ``ws``
+    providers) calls are balanced across the nodes (c.f. :meth:`create_multi_endpoint_provider`).
+
+    If ``ETHEREUM_CACHE_STORE`` is set responses of immutable calls are cached by a
+    :class:`consensys_utils.web3.cache.ResponseCache` set as provider middleware and attached to the provider as
+    ``cache``.
+
+    :param config: Provider configuration (compatible with :meth:`consensys_utils.config.schema.web3.Web3ConfigSchema`)
+    :type config: dict
+    :param get_request_id: Function returning the ID of the request being served
+    :type get_request_id: callable
+    """
+    provider = config.get('ETHEREUM_PROVIDER')
+
+    if provider == 'test':
+        from web3 import EthereumTesterProvider
+        return EthereumTesterProvider()
+
+    elif provider not in PROVIDER_CLASSES:
+        raise RuntimeError("'ETHEREUM_PROVIDER' configuration must be one of 'http', 'http-batch', 'ipc', 'ws', 'test'")
+
+    provider_class, request_id_provider_class = PROVIDER_CLASSES[provider]
+    opts = get_provider_opts(config)
+
+    request_id_opts = {
+        'request_id_header': config.get('ETHEREUM_REQUEST_ID_HEADER'),
+        'request_id_prefix': config.get('ETHEREUM_REQUEST_ID_PREFIX', False),
+    }
+    if any(request_id_opts.values()):
+        provider_class = request_id_provider_class
+        opts = dict(request_id_opts, get_request_id=get_request_id, **opts)
+
+    if provider != 'ipc' and (config.get('ETHEREUM_ENDPOINT_URIS') or config.get('ETHEREUM_ARCHIVE_ENDPOINT_URIS')):
+        provider = create_multi_endpoint_provider(config, provider_class, opts)
+    else:
+        provider = provider_class(**opts)
+
+    cache = create_response_cache(config)
+    if cache is not None:
+        provider.cache = cache
+        provider.middlewares = [cache.middleware] + list(provider.middlewares)
+
+    return provider
@@ -0,0 +1,421 @@
+"""
+    consensys_utils.web3.aio
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement asynchronous providers sending concurrent JSON-RPC calls
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import asyncio
+import codecs
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+try:
+    import contextvars
+except ImportError:  # pragma: no cover
+    contextvars = None
+
+from .utils import encode_rpc_request
+
+
+class EventLoopThread:
+    """Event loop running forever in a daemon thread of the current process
+
+    It allows synchronous code (e.g. Flask views) to run coroutines on a long lived event loop, so connections
+    opened by asynchronous providers persist across calls. A new loop is started in forked processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self._loop = None
+
+    @property
+    def loop(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='consensys-utils-event-loop', daemon=True).start()
+                    self._loop, self.pid = loop, os.getpid()
+        return self._loop
+
+    def run(self, coroutine, timeout=None):
+        """Run a coroutine on the loop and wait for its result
+
+        :param coroutine: Coroutine to run
+        :param timeout: Maximum time to wait for the result (in seconds)
+        :type timeout: float
+        """
+
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+
+#: Event loop thread shared by the providers of the process
+event_loop_thread = EventLoopThread()
+
+
+class AsyncProvider:
+    """Base class of asynchronous providers"""
+
+    async def make_request(self, method, params):
+        """Send a JSON-RPC request and return the JSON-RPC response"""
+
+        raise NotImplementedError
+
+    async def request(self, method, params=None):
+        """Send a JSON-RPC request and return its result
+
+        It raises a :class:`ValueError` if the node answers a JSON-RPC error (as :class:`web3.Web3` does)
+        """
+
+        response = await self.make_request(method, params or [])
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response.get('result')
+
+    async def gather(self, calls):
+        """Send JSON-RPC requests concurrently and return their results
+
+        :param calls: JSON-RPC calls as ``(method, params)`` tuples
+        :type calls: list
+        :rtype: list
+        """
+
+        return await asyncio.gather(*[self.request(method, params) for method, params in calls])
+
+    async def close(self):
+        pass
+
+
+class AsyncHTTPProvider(AsyncProvider):
+    """Asynchronous provider sending HTTP requests concurrently from a pool of threads
+
+    Requests are sent by a synchronous provider (typically a :class:`consensys_utils.web3.PooledHTTPProvider`
+    keeping connections alive) so they benefit from its connection pool, balancing or cache. Requests are sent in a
+    copy of the context of the calling task, so context variables (e.g. the request ID of
+    :func:`consensys_utils.logging.get_request_id`) are visible from the pool threads (Python >= 3.7).
+
+    :param provider: Synchronous provider
+    :type provider: :class:`web3.providers.base.BaseProvider`
+    :param max_workers: Maximum number of concurrent requests (defaults to provider ``pool_size``)
+    :type max_workers: int
+    """
+
+    def __init__(self, provider, max_workers=None):
+        self.provider = provider
+        self.max_workers = max_workers or getattr(provider, 'pool_size', 10)
+        self.pid = None
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self.pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.max_workers)
+            self.pid = os.getpid()
+        return self._executor
+
+    async def make_request(self, method, params):
+        call = self.provider.make_request
+        if contextvars is not None:  # pragma: no branch
+            call = functools.partial(contextvars.copy_context().run, call)
+        return await asyncio.get_event_loop().run_in_executor(self.executor, call, method, params)
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self.pid = None
+
+
+class AsyncConnectionProvider(AsyncProvider):
+    """Base class of asynchronous providers multiplexing requests on a persistent connection
+
+    Requests are sent without waiting for previous responses, a reader task dispatches responses to requests by
+    JSON-RPC id. The connection is opened on first request and opened again on the next request if lost. If a
+    ``backoff`` policy is given, a lost connection is also opened again in the background, waiting for the
+    policy pauses between attempts.
+
+    Notifications of subscriptions opened with :meth:`subscribe` are passed to the subscription callback. The node
+    drops subscriptions when the connection is lost, so they are forgotten and must be opened again.
+
+    Subclasses implement :meth:`open_connection`, :meth:`send` and :meth:`receive`.
+
+    :param timeout: Maximum time to wait for a response (in seconds)
+    :type timeout: float
+    :param backoff: Policy of background reconnection attempts (no background reconnection if not set)
+    :type backoff: :class:`consensys_utils.exceptions.Backoff`
+    """
+
+    logger = logging.getLogger('consensys_utils.web3.AsyncConnectionProvider')
+
+    def __init__(self, timeout=10, backoff=None):
+        self.timeout = timeout
+        self.backoff = backoff
+        self.request_counter = itertools.count()
+        self.pid = None
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.connection = None
+        self.connect_lock = None
+        self.reader = None
+        self.reconnecting = None
+        self.pending = {}
+        self.subscribing = {}
+        self.subscriptions = {}
+
+    async def open_connection(self):
+        """Open a connection to the node"""
+
+        raise NotImplementedError
+
+    async def close_connection(self, connection):
+        pass
+
+    async def send(self, connection, data):
+        """Send an encoded request on the connection"""
+
+        raise NotImplementedError
+
+    async def receive(self, connection):
+        """Receive the next messages from the connection
+
+        :rtype: list
+        """
+
+        raise NotImplementedError
+
+    async def connect(self):
+        if self.pid != os.getpid():
+            # Connections are never shared with a forked process
+            self.reset()
+
+        if self.connect_lock is None:
+            self.connect_lock = asyncio.Lock()
+
+        async with self.connect_lock:
+            if self.connection is None:
+                self.connection = await self.open_connection()
+                self.reader = asyncio.ensure_future(self.read(self.connection))
+
+        return self.connection
+
+    async def read(self, connection):
+        error = None
+        try:
+            while True:
+                for message in await self.receive(connection):
+                    self.dispatch(message)
+        except asyncio.CancelledError:
+            error = ConnectionError('Connection closed')
+        except Exception as e:
+            self.logger.warning("Connection to Ethereum node lost: %r", e)
+            error = e if isinstance(e, ConnectionError) else ConnectionError(str(e) or repr(e))
+            if self.backoff is not None:
+                self.reconnecting = asyncio.ensure_future(self.reconnect())
+        finally:
+            if self.connection is connection:
+                self.connection = None
+                self.subscriptions.clear()
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def reconnect(self):
+        """Open the connection again, waiting for ``backoff`` pauses between attempts"""
+
+        while self.connection is None:
+            await asyncio.sleep(self.backoff.next())
+            try:
+                await self.connect()
+            except Exception as e:
+                self.logger.warning("Reconnection to Ethereum node failed: %r", e)
+        self.backoff.reset()
+
+    def dispatch(self, message):
+        """Dispatch a message received from the node"""
+
+        if message.get('method') == 'eth_subscription':
+            callback = self.subscriptions.get(message['params']['subscription'])
+            if callback is not None:
+                callback(message['params']['result'])
+            return
+
+        future = self.pending.get(message.get('id'))
+        if future is not None and not future.done():
+            # Subscription is registered before any of its notification is dispatched
+            callback = self.subscribing.pop(message.get('id'), None)
+            if callback is not None and 'result' in message:
+                self.subscriptions[message['result']] = callback
+            future.set_result(message)
+
+    async def make_request(self, method, params, rpc_id=None):
+        connection = await self.connect()
+        rpc_id = next(self.request_counter) if rpc_id is None else rpc_id
+        future = asyncio.get_event_loop().create_future()
+        self.pending[rpc_id] = future
+        try:
+            await self.send(connection, encode_rpc_request(method, params, rpc_id))
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.pending.pop(rpc_id, None)
+
+    async def subscribe(self, params, callback):
+        """Open an ``eth_subscribe`` subscription and return its ID
+
+        :param params: Subscription params (e.g. ``['newHeads']`` or ``['logs', {'address': address}]``)
+        :type params: list
+        :param callback: Function called with the result of each notification (on the event loop)
+        :type callback: callable
+        :rtype: str
+        """
+
+        rpc_id = next(self.request_counter)
+        self.subscribing[rpc_id] = callback
+        try:
+            response = await self.make_request('eth_subscribe', params, rpc_id=rpc_id)
+        finally:
+            self.subscribing.pop(rpc_id, None)
+
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']
+
+    async def unsubscribe(self, subscription_id):
+        """Close an ``eth_subscribe`` subscription"""
+
+        if self.subscriptions.pop(subscription_id, None) is not None:
+            await self.request('eth_unsubscribe', [subscription_id])
+
+    async def close(self):
+        connection, self.connection = self.connection, None
+        self.subscriptions.clear()
+        for task in [self.reconnecting, self.reader]:
+            if task is not None:
+                task.cancel()
+        if connection is not None:
+            await self.close_connection(connection)
+
+
+class AsyncWebsocketProvider(AsyncConnectionProvider):
+    """Asynchronous provider multiplexing requests on a persistent websocket connection
+
+    :param endpoint_uri: Ethereum node websocket url
+    :type endpoint_uri: str
+    :param websocket_kwargs: Extra keyword arguments to pass to :func:`websockets.connect`
+    :type websocket_kwargs: dict
+    """
+
+    def __init__(self, endpoint_uri, timeout=10, websocket_kwargs=None, backoff=None):
+        super().__init__(timeout=timeout, backoff=backoff)
+        self.endpoint_uri = endpoint_uri
+        self.websocket_kwargs = websocket_kwargs or {}
+
+    async def open_connection(self):
+        import websockets
+        return await websockets.connect(self.endpoint_uri, **self.websocket_kwargs)
+
+    async def close_connection(self, connection):
+        await connection.close()
+
+    async def send(self, connection, data):
+        await connection.send(data.decode('utf-8'))
+
+    async def receive(self, connection):
+        message = json.loads(await connection.recv())
+        return message if isinstance(message, list) else [message]
+
+
+class AsyncIPCProvider(AsyncConnectionProvider):
+    """Asynchronous provider multiplexing requests on a persistent IPC connection
+
+    :param ipc_path: Ethereum node IPC path (defaults to the node default IPC path, as :class:`web3.IPCProvider`)
+    :type ipc_path: str
+    """
+
+    def __init__(self, ipc_path=None, timeout=10, backoff=None):
+        super().__init__(timeout=timeout, backoff=backoff)
+        if ipc_path is None:
+            from web3.providers.ipc import get_default_ipc_path
+            ipc_path = get_default_ipc_path()
+        self.ipc_path = ipc_path
+        self.decoder = json.JSONDecoder()
+
+    async def open_connection(self):
+        reader, writer = await asyncio.open_unix_connection(self.ipc_path)
+        return {'reader': reader, 'writer': writer, 'buffer': '', 'decoder': codecs.getincrementaldecoder('utf-8')()}
+
+    async def close_connection(self, connection):
+        connection['writer'].close()
+
+    async def send(self, connection, data):
+        connection['writer'].write(data)
+        await connection['writer'].drain()
+
+    def decode(self, connection):
+        """Decode complete JSON messages from the connection buffer (IPC messages are not delimited)"""
+
+        messages = []
+        while True:
+            buffer = connection['buffer'].lstrip()
+            try:
+                message, end = self.decoder.raw_decode(buffer)
+            except ValueError:
+                connection['buffer'] = buffer
+                return messages
+            messages.extend(message if isinstance(message, list) else [message])
+            connection['buffer'] = buffer[end:]
+
+    async def receive(self, connection):
+        while True:
+            messages = self.decode(connection)
+            if messages:
+                return messages
+
+            data = await connection['reader'].read(65536)
+            if not data:
+                raise ConnectionError('IPC connection closed')
+            connection['buffer'] += connection['decoder'].decode(data)
+
+
+def create_async_provider(config, get_request_id=None, provider=None):
+    """Create an asynchronous provider
+
+    - ``ws`` provider creates an :class:`AsyncWebsocketProvider`
+    - ``ipc`` provider creates an :class:`AsyncIPCProvider`
+    - other providers (``http``, ``http-batch``...) create an :class:`AsyncHTTPProvider` sending requests with
+      ``provider`` or a provider created by :meth:`consensys_utils.web3.create_provider` (so requests are pooled,
+      balanced and cached as configured)
+
+    :param config: Provider configuration (compatible with :meth:`consensys_utils.config.schema.web3.Web3ConfigSchema`)
+    :type config: dict
+    :param get_request_id: Function returning the ID of the request being served
+    :type get_request_id: callable
+    :param provider: Synchronous provider to send HTTP requests with
+    :type provider: :class:`web3.providers.base.BaseProvider`
+    """
+    from . import create_provider
+
+    timeout = config.get('ETHEREUM_READ_TIMEOUT', 10)
+
+    if config.get('ETHEREUM_PROVIDER') == 'ws':
+        return AsyncWebsocketProvider(config.get('ETHEREUM_ENDPOINT_URI'), timeout=timeout)
+
+    elif config.get('ETHEREUM_PROVIDER') == 'ipc':
+        return AsyncIPCProvider(config.get('ETHEREUM_IPC_PATH'), timeout=timeout)
+
+    return AsyncHTTPProvider(provider or create_provider(config, get_request_id=get_request_id))
@@ -0,0 +1,250 @@
+"""
+    consensys_utils.web3.balancer
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement a provider balancing JSON-RPC calls across multiple Ethereum nodes
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import logging
+import math
+import threading
+import time
+
+import requests
+from urllib3.exceptions import NewConnectionError
+from web3.providers.base import BaseProvider
+
+from .compat import is_connected
+
+# Prefixes of methods only archive nodes can serve
+ARCHIVE_METHODS = ['debug_', 'trace_']
+
+# Methods that must not be sent twice (they are only retried on another node if they have not been sent)
+NON_IDEMPOTENT_METHODS = [
+    'eth_sendTransaction',
+    'eth_sendRawTransaction',
+    'personal_sendTransaction',
+    'eth_submitWork',
+    'eth_submitHashrate',
+]
+
+
+def is_unsent(error):
+    """Indicate whether a request failed before anything has been sent to the node"""
+
+    if isinstance(error, requests.ConnectionError):
+        # Connection could not be established
+        reason = getattr(error.args[0], 'reason', error.args[0]) if error.args else None
+        return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+    return isinstance(error, (ConnectionRefusedError, FileNotFoundError))
+
+
+class LatencyTracker:
+    """Track the latency of a node as a peak-sensitive exponentially weighted moving average
+
+    The average decays with time (so older samples weigh less) but jumps to any sample higher than the average,
+    so a node getting slow is quickly avoided. As the average also decays when it is read (c.f. :meth:`current`),
+    a node that is not called any more after a slow sample is progressively tried again.
+
+    :param decay: Decay time of samples (in seconds)
+    :type decay: float
+    """
+
+    def __init__(self, decay=10):
+        self.decay = decay
+        self.latency = 0.
+        self.updated_at = time.monotonic()
+
+    def record(self, latency):
+        """Record a latency sample (in seconds)"""
+
+        now = time.monotonic()
+        # Sample is compared to the average decayed since the last sample (c.f. :meth:`current`)
+        weight = math.exp(-(now - self.updated_at) / self.decay)
+        if latency > self.latency * weight:
+            self.latency = latency
+        else:
+            self.latency = self.latency * weight + latency * (1 - weight)
+        self.updated_at = now
+
+    def current(self):
+        """Return the average decayed with the time elapsed since the last sample"""
+
+        return self.latency * math.exp(-(time.monotonic() - self.updated_at) / self.decay)
+
+
+class CircuitBreaker:
+    """Eject a node after consecutive failures
+
+    Once ``failure_threshold`` consecutive calls failed, the breaker opens and the node is ejected. After
+    ``recovery_timeout`` seconds a single trial call is allowed (and then one per ``recovery_timeout``), the breaker
+    closes on the first successful call.
+
+    :param failure_threshold: Number of consecutive failures opening the breaker
+    :type failure_threshold: int
+    :param recovery_timeout: Time before trying an ejected node again (in seconds)
+    :type recovery_timeout: float
+    """
+
+    def __init__(self, failure_threshold=3, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def ready(self):
+        """Indicate whether a call can be made (without consuming the trial call of an open breaker)"""
+
+        return self.opened_at is None or time.monotonic() - self.opened_at >= self.recovery_timeout
+
+    def allow(self):
+        """Indicate whether a call can be made (it consumes the trial call of an open breaker)"""
+
+        if self.opened_at is None:
+            return True
+
+        now = time.monotonic()
+        if now - self.opened_at >= self.recovery_timeout:
+            self.opened_at = now
+            return True
+
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    """Ethereum node a :class:`MultiEndpointProvider` balances calls to
+
+    :param provider: Provider connected to the node
+    :type provider: :class:`web3.providers.base.BaseProvider`
+    :param archive: Indicate whether the node is an archive node
+    :type archive: bool
+    :param breaker: Circuit breaker of the node
+    :type breaker: :class:`CircuitBreaker`
+    """
+
+    def __init__(self, provider, archive=False, breaker=None):
+        self.provider = provider
+        self.archive = archive
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def score(self):
+        """Expected cost of a call (the lower the better)"""
+
+        return self.latency.current() * (self.in_flight + 1)
+
+    def to_dict(self):
+        return {
+            'endpoint_uri': getattr(self.provider, 'endpoint_uri', None),
+            'archive': self.archive,
+            'latency': self.latency.current(),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejected': self.breaker.is_open,
+        }
+
+
+class MultiEndpointProvider(BaseProvider):
+    """Provider balancing JSON-RPC calls across multiple Ethereum nodes
+
+    Each call is routed to the healthy node with the lowest latency weighted by its number of in-flight calls
+    (c.f. :class:`LatencyTracker`). Calls failing on a node (connection errors, HTTP errors...) are retried on the
+    next best node and nodes failing repeatedly are ejected by their :class:`CircuitBreaker`. If every node has been
+    ejected, calls are still tried on them rather than failing immediately.
+
+    Calls to ``NON_IDEMPOTENT_METHODS`` (e.g. ``eth_sendTransaction``) are only retried when they failed before
+    anything has been sent to the node (e.g. connection refused), so a transaction is never sent twice.
+
+    Methods starting with one of ``archive_methods`` prefixes are only routed to archive nodes (if any), other
+    methods are routed to every node.
+
+    :param endpoints: Nodes to balance calls to
+    :type endpoints: list of :class:`Endpoint`
+    :param archive_methods: Prefixes of methods to route to archive nodes
+    :type archive_methods: list
+    """
+
+    logger = logging.getLogger('consensys_utils.web3.MultiEndpointProvider')
+
+    def __init__(self, endpoints, archive_methods=None):
+        self.endpoints = endpoints
+        self.archive_methods = tuple(ARCHIVE_METHODS if archive_methods is None else archive_methods)
+        self.lock = threading.Lock()
+
+    def select(self, method):
+        """Return the endpoints to try for a method, best first"""
+
+        endpoints = self.endpoints
+        if self.archive_methods and method.startswith(self.archive_methods):
+            endpoints = [endpoint for endpoint in endpoints if endpoint.archive] or endpoints
+
+        with self.lock:
+            healthy = [endpoint for endpoint in endpoints if endpoint.breaker.ready()]
+            ejected = [endpoint for endpoint in endpoints if endpoint not in healthy]
+            return sorted(healthy, key=lambda e: e.score) + sorted(ejected, key=lambda e: e.breaker.opened_at)
+
+    def make_request_on(self, endpoint, method, params):
+        with self.lock:
+            # Trial call of an ejected node is only consumed once the node is actually tried
+            endpoint.breaker.allow()
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+
+        start = time.perf_counter()
+        try:
+            response = endpoint.provider.make_request(method, params)
+        except Exception:
+            with self.lock:
+                endpoint.in_flight -= 1
+                endpoint.failures += 1
+                endpoint.breaker.record_failure()
+            raise
+
+        with self.lock:
+            endpoint.in_flight -= 1
+            endpoint.latency.record(time.perf_counter() - start)
+            endpoint.breaker.record_success()
+        return response
+
+    def make_request(self, method, params):
+        error = None
+        for endpoint in self.select(method):
+            try:
+                return self.make_request_on(endpoint, method, params)
+            except Exception as e:
+                self.logger.warning("Request failed on %s. Method: %s, Error: %r", endpoint.provider, method, e)
+                if method in NON_IDEMPOTENT_METHODS and not is_unsent(e):
+                    # Request may have been processed by the node
+                    raise
+                error = e
+        raise error
+
+    def is_connected(self):
+        return any(is_connected(endpoint.provider) for endpoint in self.endpoints)
+
+    isConnected = is_connected
+
+    def to_dict(self):
+        with self.lock:
+            return {'endpoints': [endpoint.to_dict() for endpoint in self.endpoints]}
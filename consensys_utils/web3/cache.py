@@ -0,0 +1,308 @@
+"""
+    consensys_utils.web3.cache
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement a provider middleware caching responses of immutable JSON-RPC calls
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Cacheable JSON-RPC methods: index of their block parameter (``None`` if they have none) and whether their responses
+# never change (responses of other methods could change on chain reorganization so they are only cached once their
+# block is confirmed and they expire after a TTL)
+CACHEABLE_METHODS = {
+    'eth_chainId': (None, True),
+    'net_version': (None, True),
+    'eth_getBlockByHash': (None, True),
+    'eth_getBlockTransactionCountByHash': (None, True),
+    'eth_getTransactionByBlockHashAndIndex': (None, True),
+    'eth_getBlockByNumber': (0, False),
+    'eth_getBlockTransactionCountByNumber': (0, False),
+    'eth_getTransactionByBlockNumberAndIndex': (0, False),
+    'eth_getTransactionByHash': (None, False),
+    'eth_getTransactionReceipt': (None, False),
+    'eth_getBalance': (1, False),
+    'eth_getCode': (1, False),
+    'eth_getTransactionCount': (1, False),
+    'eth_getStorageAt': (2, False),
+    'eth_call': (1, False),
+}
+
+
+def is_fixed_block(block):
+    """Indicate whether a block parameter identifies a fixed block (so not ``latest``, ``pending``...)"""
+
+    if isinstance(block, str):
+        return block.startswith('0x') or block == 'earliest'
+    return isinstance(block, int)
+
+
+def to_block_number(block):
+    """Return the number of a fixed block parameter (c.f. :meth:`is_fixed_block`)"""
+
+    if block == 'earliest':
+        return 0
+    if isinstance(block, int):
+        return block
+    return int(block, 16)
+
+
+class MemoryCacheStore:
+    """Store keeping responses in a bounded LRU dictionary of the current process
+
+    :param max_size: Maximum number of responses kept
+    :type max_size: int
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the response cached for a key (``None`` if missing or expired)"""
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, response = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return response
+
+    def set(self, key, response, ttl=None):
+        """Cache a response
+
+        :param key: Cache key
+        :type key: str
+        :param response: JSON-RPC response
+        :type response: dict
+        :param ttl: Time to live in seconds (``None`` for no expiration)
+        :type ttl: float
+        """
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl if ttl is not None else None, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+class SQLiteCacheStore:
+    """Store keeping responses in a SQLite database shared by gunicorn workers
+
+    When the store is full, oldest cached responses are evicted first.
+
+    :param path: Database file path
+    :type path: str
+    :param max_size: Maximum number of responses kept
+    :type max_size: int
+    """
+
+    def __init__(self, path, max_size=1024):
+        self.path = path
+        self.max_size = max_size
+        self.local = threading.local()
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS responses '
+                                    '(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL)')
+
+    @property
+    def connection(self):
+        """Connection of the current thread (connections are not shared across threads and processes)"""
+
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = sqlite3.connect(self.path, timeout=30)
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def get(self, key):
+        row = self.connection.execute('SELECT response FROM responses WHERE key = ? AND '
+                                      '(expires_at IS NULL OR expires_at > ?)', (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, response, ttl=None):
+        with self.connection as connection:
+            connection.execute('INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)',
+                               (key, json.dumps(response), time.time() + ttl if ttl is not None else None))
+            connection.execute('DELETE FROM responses WHERE rowid IN '
+                               '(SELECT rowid FROM responses ORDER BY rowid DESC LIMIT -1 OFFSET ?)', (self.max_size,))
+
+
+class ResponseCache:
+    """Cache responses of JSON-RPC calls that always return the same answer
+
+    Only calls of :data:`CACHEABLE_METHODS` are cached
+
+    - calls on a block tag other than ``earliest`` (e.g. ``latest``, ``pending``) are never cached
+    - error responses, ``null`` results and pending transactions are never cached
+    - responses depending on a block number or a transaction hash are only cached once their block is at least
+      ``confirmations`` blocks below the chain head, and they expire after ``ttl`` seconds (so a deep chain
+      reorganization is eventually seen), responses depending on a block hash never expire
+
+    Chain head is the last block number returned by ``eth_blockNumber``, it is requested when needed at most once
+    every ``head_refresh_interval`` seconds.
+
+    Its :meth:`middleware` is a web3.py middleware to set on the provider.
+
+    :param store: Store keeping cached responses
+    :type store: :class:`MemoryCacheStore` or :class:`SQLiteCacheStore`
+    :param ttl: Time to live of responses that could change on chain reorganization (in seconds)
+    :type ttl: float
+    :param confirmations: Number of blocks a block must be below the chain head for its responses to be cached
+    :type confirmations: int
+    :param head_refresh_interval: Minimum time between two requests of the chain head (in seconds)
+    :type head_refresh_interval: float
+    """
+
+    def __init__(self, store, ttl=3600, confirmations=12, head_refresh_interval=1):
+        self.store = store
+        self.ttl = ttl
+        self.confirmations = confirmations
+        self.head_refresh_interval = head_refresh_interval
+        self.head = None
+        self.head_updated_at = None
+        self.lock = threading.Lock()
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+
+    def key(self, method, params):
+        """Return the cache key of a call (``None`` if the call is not cacheable)"""
+
+        rule = CACHEABLE_METHODS.get(method)
+        if rule is None:
+            return None
+
+        params = params or []
+        block_index = rule[0]
+        if block_index is not None and (block_index >= len(params) or not is_fixed_block(params[block_index])):
+            return None
+
+        try:
+            return json.dumps([method, params], sort_keys=True, separators=(',', ':'))
+        except TypeError:
+            return None
+
+    @staticmethod
+    def is_cacheable(method, response):
+        """Indicate whether a response can be cached"""
+
+        result = response.get('result')
+        if 'error' in response or result is None:
+            return False
+        if method in ('eth_getTransactionByHash', 'eth_getTransactionReceipt'):
+            # Transaction is still pending
+            return result.get('blockNumber') is not None
+        return True
+
+    @staticmethod
+    def response_block(method, params, response):
+        """Return the number of the block a response depends on (``None`` if it never changes)"""
+
+        block_index, immutable = CACHEABLE_METHODS[method]
+        if immutable:
+            return None
+        if block_index is not None:
+            return to_block_number(params[block_index])
+        return to_block_number(response['result']['blockNumber'])
+
+    def set_head(self, block):
+        """Set the chain head block number"""
+
+        with self.lock:
+            self.head = to_block_number(block)
+            self.head_updated_at = time.monotonic()
+
+    def get_head(self, make_request):
+        """Return the chain head block number, requesting it if it is unknown or outdated"""
+
+        if self.head is None or time.monotonic() - self.head_updated_at >= self.head_refresh_interval:
+            response = make_request('eth_blockNumber', [])
+            if response.get('result') is not None:
+                self.set_head(response['result'])
+        return self.head
+
+    def is_confirmed(self, method, params, response, make_request):
+        """Indicate whether the block a response depends on is confirmed"""
+
+        block = self.response_block(method, params, response)
+        if block is None:
+            return True
+
+        head = self.get_head(make_request)
+        return head is not None and block <= head - self.confirmations
+
+    def middleware(self, make_request, web3):
+        """Web3.py middleware serving cached responses"""
+
+        def cache_middleware(method, params):
+            key = self.key(method, params)
+            if key is None:
+                response = make_request(method, params)
+                if method == 'eth_blockNumber' and response.get('result') is not None:
+                    self.set_head(response['result'])
+                return response
+
+            response = self.store.get(key)
+            if response is not None:
+                with self.lock:
+                    self.hits[method] += 1
+                return response
+
+            with self.lock:
+                self.misses[method] += 1
+
+            response = make_request(method, params)
+            if self.is_cacheable(method, response) and self.is_confirmed(method, params, response, make_request):
+                self.store.set(key, response, None if CACHEABLE_METHODS[method][1] else self.ttl)
+            return response
+
+        return cache_middleware
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'hits': sum(self.hits.values()),
+                'misses': sum(self.misses.values()),
+                'methods': {
+                    method: {'hits': self.hits[method], 'misses': self.misses[method]}
+                    for method in set(self.hits) | set(self.misses)
+                },
+            }
+
+
+def create_response_cache(config):
+    """Create a response cache (``None`` if ``ETHEREUM_CACHE_STORE`` is not set)
+
+    :param config: Cache configuration (compatible with :meth:`consensys_utils.config.schema.web3.Web3ConfigSchema`)
+    :type config: dict
+    """
+    store, max_size = config.get('ETHEREUM_CACHE_STORE'), config.get('ETHEREUM_CACHE_MAX_SIZE', 1024)
+
+    if not store:
+        return None
+
+    elif store == 'memory':
+        store = MemoryCacheStore(max_size)
+
+    elif store == 'sqlite':
+        store = SQLiteCacheStore(config.get('ETHEREUM_CACHE_PATH'), max_size)
+
+    else:
+        raise RuntimeError("'ETHEREUM_CACHE_STORE' configuration must be one of 'memory', 'sqlite'")
+
+    return ResponseCache(store, ttl=config.get('ETHEREUM_CACHE_TTL', 3600),
+                         confirmations=config.get('ETHEREUM_CACHE_CONFIRMATIONS', 12))
@@ -0,0 +1,56 @@
+"""
+    consensys_utils.web3.compat
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Access web3.py provider internals whose names differ across web3.py versions
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import itertools
+
+
+def is_connected(provider):
+    """Indicate whether a provider is connected (``isConnected()`` up to web3.py 5, ``is_connected()`` since)
+
+    :param provider: Provider
+    :type provider: :class:`web3.providers.base.BaseProvider`
+    :rtype: bool
+    """
+
+    check = getattr(provider, 'is_connected', None) or provider.isConnected
+    return check()
+
+
+def next_rpc_id(provider):
+    """Return the next JSON-RPC request id of a provider
+
+    Ids are taken from the ``request_counter`` set by :class:`web3.providers.base.JSONBaseProvider` (it is
+    created if missing)
+
+    :param provider: Provider
+    :type provider: :class:`web3.providers.base.JSONBaseProvider`
+    :rtype: int
+    """
+
+    counter = getattr(provider, 'request_counter', None)
+    if counter is None:
+        counter = provider.request_counter = itertools.count()
+    return next(counter)
+
+
+def get_request_kwargs(provider, provider_class=None):
+    """Return the keyword arguments an HTTP provider passes to :meth:`requests.Session.post`
+
+    :param provider: HTTP provider
+    :type provider: :class:`web3.HTTPProvider`
+    :param provider_class: Class implementing ``get_request_kwargs`` to call (defaults to the provider class)
+    :type provider_class: type
+    :rtype: dict
+    """
+
+    get_kwargs = getattr(provider_class or type(provider), 'get_request_kwargs', None)
+    if get_kwargs is not None:
+        return dict(get_kwargs(provider))
+    return dict(getattr(provider, '_request_kwargs', None) or {})
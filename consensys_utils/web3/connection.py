@@ -0,0 +1,158 @@
+"""
+    consensys_utils.web3.connection
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement providers sharing a persistent connection per worker
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import os
+import threading
+
+from web3.providers.base import JSONBaseProvider
+from web3.providers.ipc import get_default_ipc_path
+
+from ..exceptions import Backoff
+from .aio import AsyncIPCProvider, AsyncWebsocketProvider, event_loop_thread
+
+
+class ConnectionManager:
+    """Keep one persistent connection per Ethereum node in the current process
+
+    Connections are :class:`consensys_utils.web3.aio.AsyncConnectionProvider` driven by
+    :data:`consensys_utils.web3.aio.event_loop_thread`. Forked processes (e.g. gunicorn workers of a preloaded
+    application) open their own connections.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.connections = {}
+
+    def get(self, key, factory):
+        """Return the connection registered for a key, creating it with ``factory`` if missing
+
+        :param key: Connection key (e.g. provider class and node endpoint)
+        :type key: tuple
+        :param factory: Function creating the connection
+        :type factory: callable
+        """
+
+        with self.lock:
+            if self.pid != os.getpid():
+                self.connections, self.pid = {}, os.getpid()
+
+            connection = self.connections.get(key)
+            if connection is None:
+                connection = self.connections[key] = factory()
+            return connection
+
+
+#: Connection manager shared by the persistent providers of the process
+connection_manager = ConnectionManager()
+
+
+class PersistentConnectionProvider(JSONBaseProvider):
+    """Base class of providers sending requests on a persistent connection shared by the threads of the worker
+
+    Requests of every thread are multiplexed on a single connection (responses are matched by JSON-RPC id) so
+    threaded workers do not serialize their calls. A lost connection is opened again in the background, pausing
+    between attempts from ``reconnect_delay`` up to ``max_reconnect_delay`` seconds with exponential backoff.
+
+    Providers connected to the same node share the same connection (c.f. :class:`ConnectionManager`).
+
+    :param timeout: Maximum time to wait for a response (in seconds)
+    :type timeout: float
+    :param reconnect_delay: Pause before the first reconnection attempt (in seconds)
+    :type reconnect_delay: float
+    :param max_reconnect_delay: Maximum pause between reconnection attempts (in seconds)
+    :type max_reconnect_delay: float
+    """
+
+    def __init__(self, timeout=10, reconnect_delay=0.1, max_reconnect_delay=10):
+        super().__init__()
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+    @property
+    def connection_key(self):
+        raise NotImplementedError
+
+    def create_connection(self, backoff):
+        """Create the asynchronous provider holding the connection"""
+
+        raise NotImplementedError
+
+    @property
+    def connection(self):
+        return connection_manager.get(self.connection_key, lambda: self.create_connection(
+            Backoff(initial=self.reconnect_delay, maximum=self.max_reconnect_delay)
+        ))
+
+    @property
+    def request_counter(self):
+        # JSON-RPC ids must be unique among requests of every provider sharing the connection
+        return self.connection.request_counter
+
+    @request_counter.setter
+    def request_counter(self, counter):
+        # Counter set by :class:`web3.providers.base.JSONBaseProvider` is ignored
+        pass
+
+    def next_rpc_id(self):
+        return next(self.request_counter)
+
+    def make_request(self, method, params):
+        request = self.connection.make_request(method, params, rpc_id=self.next_rpc_id())
+        return event_loop_thread.run(request, self.timeout)
+
+
+class PersistentWebsocketProvider(PersistentConnectionProvider):
+    """Provider sending requests on a persistent websocket connection
+
+    :param endpoint_uri: Ethereum node websocket url
+    :type endpoint_uri: str
+    :param websocket_kwargs: Extra keyword arguments to pass to :func:`websockets.connect`
+    :type websocket_kwargs: dict
+    """
+
+    def __init__(self, endpoint_uri, websocket_kwargs=None, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint_uri = endpoint_uri
+        self.websocket_kwargs = websocket_kwargs
+
+    @property
+    def connection_key(self):
+        return 'ws', self.endpoint_uri
+
+    def create_connection(self, backoff):
+        return AsyncWebsocketProvider(self.endpoint_uri, timeout=self.timeout,
+                                      websocket_kwargs=self.websocket_kwargs, backoff=backoff)
+
+    def __str__(self):
+        return "WS connection {0}".format(self.endpoint_uri)
+
+
+class PersistentIPCProvider(PersistentConnectionProvider):
+    """Provider sending requests on a persistent IPC connection
+
+    :param ipc_path: Ethereum node IPC path (defaults to the node default IPC path, as :class:`web3.IPCProvider`)
+    :type ipc_path: str
+    """
+
+    def __init__(self, ipc_path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.ipc_path = ipc_path if ipc_path is not None else get_default_ipc_path()
+
+    @property
+    def connection_key(self):
+        return 'ipc', self.ipc_path
+
+    def create_connection(self, backoff):
+        return AsyncIPCProvider(self.ipc_path, timeout=self.timeout, backoff=backoff)
+
+    def __str__(self):
+        return "IPC connection {0}".format(self.ipc_path)
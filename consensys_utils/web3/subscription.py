@@ -0,0 +1,129 @@
+"""
+    consensys_utils.web3.subscription
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement an iterator over events pushed by an Ethereum node subscription
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import collections
+import logging
+
+from ..exceptions import PauseIteration
+from . import create_provider
+from .aio import event_loop_thread
+from .connection import PersistentConnectionProvider
+
+
+class SubscriptionIterator:
+    """Iterator over the events of an ``eth_subscribe`` subscription (such as ``newHeads`` or ``logs``)
+
+    Events pushed by the node are buffered in a queue of at most ``max_size`` events (oldest events are dropped
+    first when the iterator falls behind, they are counted in ``dropped``). When the queue is empty the iterator
+    raises a :class:`consensys_utils.exceptions.PauseIteration` which is interrupted as soon as an event arrives
+    so the iterating worker processes it immediately, without polling the node.
+
+    Subscription is opened on the first step using a ``ipc`` or ``ws`` provider
+    (c.f. :class:`consensys_utils.web3.connection.PersistentConnectionProvider`), either ``provider`` or
+    a provider created from ``web3`` configuration when the iterator is registered on a
+    :class:`consensys_utils.flask.extensions.iterable.FlaskIterable`. If the connection is lost, the subscription
+    is opened again once the connection is back (events pushed in the meantime are missed).
+
+    .. code-block:: python
+
+        class BlockIterator(SubscriptionIterator):
+            def __next__(self):
+                head = super().__next__()
+                process_block(int(head['number'], 16))
+                return head
+
+        iterable = FlaskIterable(BlockIterator)
+
+    :param subscription: Subscription type (e.g. ``newHeads``, ``logs``)
+    :type subscription: str
+    :param filter_params: Filter of ``logs`` subscription (e.g. ``{'address': address, 'topics': [topic]}``)
+    :type filter_params: dict
+    :param provider: Provider to subscribe with
+    :type provider: :class:`consensys_utils.web3.connection.PersistentConnectionProvider`
+    :param max_size: Maximum number of buffered events
+    :type max_size: int
+    :param max_pause: Maximum time to pause when no event is buffered (in seconds)
+    :type max_pause: float
+    """
+
+    logger = logging.getLogger('consensys_utils.web3.SubscriptionIterator')
+
+    def __init__(self, subscription='newHeads', filter_params=None, provider=None, max_size=1024, max_pause=1):
+        self.subscription = subscription
+        self.filter_params = filter_params
+        self.provider = provider
+        self.events = collections.deque(maxlen=max_size)
+        self.max_pause = max_pause
+        self.subscription_id = None
+        self.dropped = 0
+        self.waker = None
+
+    def set_config(self, config):
+        if self.provider is None:
+            self.provider = create_provider(config['web3'])
+
+    def set_waker(self, waker):
+        """Set the function waking the iterating worker up when an event arrives"""
+
+        self.waker = waker
+
+    @property
+    def connection(self):
+        if not isinstance(self.provider, PersistentConnectionProvider):
+            raise RuntimeError("Subscriptions require an 'ipc' or 'ws' provider")
+        return self.provider.connection
+
+    @property
+    def is_subscribed(self):
+        return self.subscription_id is not None and self.subscription_id in self.connection.subscriptions
+
+    def push(self, event):
+        """Buffer an event pushed by the node (called on the event loop)"""
+
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+            self.logger.warning("Subscription queue is full, dropping event. Subscription: %s", self.subscription)
+
+        self.events.append(event)
+        if self.waker is not None:
+            self.waker()
+
+    def has_events(self):
+        return len(self.events) > 0
+
+    def subscribe(self):
+        """Open the subscription"""
+
+        params = [self.subscription] + ([self.filter_params] if self.filter_params else [])
+        self.subscription_id = event_loop_thread.run(self.connection.subscribe(params, self.push),
+                                                     self.provider.timeout)
+
+    def unsubscribe(self):
+        """Close the subscription"""
+
+        if self.is_subscribed:
+            event_loop_thread.run(self.connection.unsubscribe(self.subscription_id), self.provider.timeout)
+        self.subscription_id = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.is_subscribed:
+            try:
+                self.subscribe()
+            except Exception as e:
+                self.logger.warning("Subscription failed. Subscription: %s, Error: %r", self.subscription, e)
+                raise PauseIteration(timeout=self.max_pause)
+
+        try:
+            return self.events.popleft()
+        except IndexError:
+            raise PauseIteration(timeout=self.max_pause, condition=self.has_events)
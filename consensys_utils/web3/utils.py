@@ -0,0 +1,32 @@
+"""
+    consensys_utils.web3.utils
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implement Web3 utility functions
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see :ref:`license` for more details.
+"""
+
+import json
+
+
+def encode_rpc_request(method, params, rpc_id):
+    """Encode a JSON-RPC request
+
+    :param method: JSON-RPC method
+    :type method: str
+    :param params: JSON-RPC params
+    :type params: list
+    :param rpc_id: JSON-RPC request id
+    :type rpc_id: int or str
+    :rtype: bytes
+    """
+
+    rpc_dict = {
+        'jsonrpc': '2.0',
+        'method': method,
+        'params': params or [],
+        'id': rpc_id,
+    }
+    return json.dumps(rpc_dict).encode('utf-8')
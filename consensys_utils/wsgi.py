@@ -8,7 +8,15 @@
     :license: BSD, see :ref:`license` for more details.
 """
 
+import itertools
+import os
+import random
+import re
+import time
 import uuid
+import weakref
+
+from .logging import _AT_FORK, reset_request_id, set_request_id
 
 __all__ = [
     'RequestIDMiddleware',
@@ -16,36 +24,170 @@ __all__ = [
 
 
 def generate_request_id():
+    """Generate a random UUID4 request ID (36 characters)"""
     return str(uuid.uuid4())
 
 
+def generate_hex64_request_id():
+    """Generate a random 64 bits request ID in hexadecimal (16 characters)"""
+    return os.urandom(8).hex()
+
+
+# Crockford's base32 encoding of every 10 bits value (2 characters) used to encode ULIDs
+_CROCKFORD_BASE32 = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_CROCKFORD_BASE32_PAIRS = [a + b for a in _CROCKFORD_BASE32 for b in _CROCKFORD_BASE32]
+
+
+def generate_ulid():
+    """Generate a ULID request ID (26 characters)
+
+    A ULID is made of a 48 bits timestamp in milliseconds followed by 80 random bits encoded in Crockford's base32
+    (c.f. https://github.com/ulid/spec) so IDs are sortable by generation time
+    """
+    value = int(time.time() * 1000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    # 128 bits are encoded by 26 characters of 5 bits (the first one only holds 3 bits)
+    return ''.join([_CROCKFORD_BASE32_PAIRS[(value >> shift) & 1023] for shift in range(120, -10, -10)])
+
+
+#: Live request ID generators (reset in forked processes)
+_generators = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for generator in list(_generators):
+        generator.reset()
+
+
+if _AT_FORK:  # pragma: no branch
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class CounterRequestIDGenerator:
+    """Generate request IDs made of a random per-process prefix followed by a counter
+
+    It is the cheapest generator. Prefix is renewed in forked processes so that gunicorn workers do not
+    generate the same IDs when the application is preloaded.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.prefix = None
+        self.counter = None
+        self.reset()
+        _generators.add(self)
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.prefix = '%012x-' % random.SystemRandom().getrandbits(48)
+        self.counter = itertools.count(1)
+
+    def __call__(self):
+        if not _AT_FORK and os.getpid() != self.pid:  # pragma: no cover
+            self.reset()
+        return '%s%x' % (self.prefix, next(self.counter))
+
+
+class SnowflakeRequestIDGenerator:
+    """Generate Snowflake-like request IDs (16 characters)
+
+    An ID is made of a 42 bits timestamp in milliseconds, the 22 bits process ID and a 16 bits counter
+    encoded in Crockford's base32, so IDs are sortable by generation time and unique across the workers of a host
+    (as long as a worker generates less than 65536 IDs per millisecond).
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.counter = None
+        self.reset()
+        _generators.add(self)
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.counter = itertools.count()
+
+    def __call__(self):
+        if not _AT_FORK and os.getpid() != self.pid:  # pragma: no cover
+            self.reset()
+        value = int(time.time() * 1000) << 38 | (self.pid & 0x3fffff) << 16 | next(self.counter) & 0xffff
+        return ''.join([_CROCKFORD_BASE32_PAIRS[(value >> shift) & 1023] for shift in range(70, -10, -10)])
+
+
+REQUEST_ID_GENERATORS = {
+    'uuid4': lambda: generate_request_id,
+    'hex64': lambda: generate_hex64_request_id,
+    'ulid': lambda: generate_ulid,
+    'counter': CounterRequestIDGenerator,
+    'snowflake': SnowflakeRequestIDGenerator,
+}
+
+
+def create_request_id_generator(name):
+    """Create a request ID generator
+
+    :param name: Name of the generator (one of ``uuid4``, ``hex64``, ``ulid``, ``counter``, ``snowflake``)
+    :type name: str
+    :rtype: callable
+    """
+    try:
+        return REQUEST_ID_GENERATORS[name]()
+    except KeyError:
+        raise RuntimeError("Request ID generator must be one of %s" % ', '.join(map(repr, REQUEST_ID_GENERATORS)))
+
+
 def header_to_environ_key(header):
     return 'HTTP_{0}'.format(header.upper().replace('-', '_'))
 
 
+class _StartResponse:
+    """start_response callable appending the request ID header"""
+
+    __slots__ = ('start_response', 'header')
+
+    def __init__(self, start_response, header):
+        self.start_response = start_response
+        self.header = header
+
+    def __call__(self, status, response_headers, exc_info=None):
+        response_headers.append(self.header)
+        return self.start_response(status, response_headers, exc_info)
+
+
 class RequestIDMiddleware:
     """Middleware that manages Request ID header
 
+    A request ID is only generated when the request has no request ID header or when the request ID header
+    does not match ``REQUEST_ID_PATTERN`` (so clients can not inject arbitrary content in logs).
+
+    Request ID is set in the current context while the application handles the request
+    (c.f. :func:`consensys_utils.logging.set_request_id`).
+
     :param wsgi: WSGI application to apply middleware on
     :type wsgi: WSGI application
-    :param request_id_header: Name of the request ID header (e.g. "X-Request-ID")
-    :type request_id_header: str
+    :param config: Request ID configuration (compatible with
+        :class:`consensys_utils.config.schema.wsgi.RequestIDConfigSchema`)
+    :type config: dict
     """
 
     def __init__(self, wsgi, config):
         self.wsgi = wsgi
         self.request_id_header = config['REQUEST_ID_HEADER']
         self.request_id_environ_key = header_to_environ_key(self.request_id_header)
+        self.generate_request_id = create_request_id_generator(config.get('REQUEST_ID_GENERATOR', 'uuid4'))
+        pattern = config.get('REQUEST_ID_PATTERN')
+        self.is_valid_request_id = re.compile(pattern).fullmatch if pattern else None
 
     def __call__(self, environ, start_response):
         """Make the wrapped application callable ro respect WSGI specification"""
 
         # Set the Request ID header if not yet set
-        request_id = environ.setdefault(self.request_id_environ_key, generate_request_id())
-
-        # Upgrade start_response to include the request id header
-        def start_response_with_request_id(status, response_headers, exc_info=None):
-            response_headers.append((self.request_id_header, request_id))
-            return start_response(status, response_headers, exc_info)
-
-        return self.wsgi(environ, start_response_with_request_id)
+        request_id = environ.get(self.request_id_environ_key)
+        if request_id is None or (self.is_valid_request_id and not self.is_valid_request_id(request_id)):
+            request_id = environ[self.request_id_environ_key] = self.generate_request_id()
+
+        # Set the Request ID in context for the time the application handles the request
+        token = set_request_id(request_id)
+        try:
+            # Upgrade start_response to include the request id header
+            return self.wsgi(environ, _StartResponse(start_response, (self.request_id_header, request_id)))
+        finally:
+            reset_request_id(token)
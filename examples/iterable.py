@@ -16,8 +16,8 @@ from flask import current_app, jsonify
 from gunicorn.app.base import BaseApplication
 
 from consensys_utils.flask import Flask
+from consensys_utils.exceptions import Backoff
 from consensys_utils.flask.extensions.iterable import FlaskIterable
-from consensys_utils.gunicorn.workers import PauseIteration
 
 logger = logging.getLogger('examples.iterable')
 LOGGING_FILE = os.path.join(os.path.dirname(__file__), 'logging.yml')
@@ -27,6 +27,8 @@ LOGGING_FILE = os.path.join(os.path.dirname(__file__), 'logging.yml')
 class Iterator:
     def __init__(self):
         self.meter = 0
+        # Pauses last from 0.5 to 2 secs depending on how long iterator has been idle
+        self.backoff = Backoff(initial=0.5, maximum=2)
 
     def set_config(self, config):
         self.meter = config['meter']
@@ -38,8 +40,8 @@ class Iterator:
         logger.info('Iterator.__next__ meter=%s' % self.meter)
         self.meter += 1
         if self.meter % 2 == 0:
-            # Indicating the running loop to pause iteration for 2 secs
-            raise PauseIteration(2)
+            # Indicating the running loop to pause iteration
+            raise self.backoff.pause()
 
         if self.meter >= 100:
             raise StopIteration()
@@ -15,6 +15,7 @@ from cfg_loader.exceptions import ValidationError
 
 from consensys_utils.config.schema.gunicorn import GunicornConfigSchema
 from consensys_utils.config.schema.logging import LoggingConfigSchema
+from consensys_utils.config.schema.wsgi import WSGIConfigSchema
 
 
 def test_logging_schema(config_files_dir):
@@ -22,7 +23,14 @@ def test_logging_schema(config_files_dir):
     raw_config = {
         'LOGGING_CONFIG_PATH': os.path.join(config_files_dir, 'logging.yml'),
     }
-    assert schema.load(raw_config) == raw_config
+    assert schema.load(raw_config) == dict(raw_config, LOGGING_QUEUE=False, LOGGING_QUEUE_SIZE=10000,
+                                           LOGGING_QUEUE_POLICY='drop', LOGGING_SAMPLING_RATE=1,
+                                           LOGGING_SAMPLING_LEVEL='INFO', LOGGING_RATE_LIMIT=None,
+                                           LOGGING_RATE_LIMIT_BURST=10, LOGGING_SUMMARY_INTERVAL=60)
+
+    raw_config['LOGGING_QUEUE_POLICY'] = 'wait'
+    with pytest.raises(ValidationError):
+        schema.load(raw_config)
 
 
 def test_logging_schema_invalid(config_files_dir):
@@ -55,3 +63,21 @@ def test_gunicorn_schema():
     assert loaded_config['reload']
     assert loaded_config['worker_class'] == 'tornado'
     assert loaded_config['bind'] == ['127.0.2.1:8080']
+    assert loaded_config['iteration_batch_size'] == 1
+    assert loaded_config['iteration_time_slice_ms'] == 0
+    assert not loaded_config['iteration_metrics']
+
+
+def test_wsgi_schema():
+    schema = WSGIConfigSchema()
+
+    loaded_config = schema.load({'request_id': {}})
+    assert loaded_config['request_id']['REQUEST_ID_HEADER'] == 'X-Request-ID'
+    assert loaded_config['request_id']['REQUEST_ID_GENERATOR'] == 'uuid4'
+    assert loaded_config['request_id']['REQUEST_ID_PATTERN']
+
+    loaded_config = schema.load({'request_id': {'REQUEST_ID_GENERATOR': 'snowflake'}})
+    assert loaded_config['request_id']['REQUEST_ID_GENERATOR'] == 'snowflake'
+
+    with pytest.raises(ValidationError):
+        schema.load({'request_id': {'REQUEST_ID_GENERATOR': 'unknown'}})
@@ -6,7 +6,12 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import json
 import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 import pytest
 
@@ -21,3 +26,86 @@ def test_dir():
 @pytest.fixture(scope='session')
 def files_dir(test_dir):
     yield os.path.join(test_dir, 'files')
+
+
+class JSONRPCRequestHandler(BaseHTTPRequestHandler):
+    """Handle JSON-RPC requests (single or batch) answering the ``result`` registered on the server for the method
+    (request params by default)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def handle_rpc(self, rpc_request):
+        self.server.requests.append(rpc_request)
+        result = self.server.results.get(rpc_request['method'], rpc_request['params'])
+        return {'jsonrpc': '2.0', 'id': rpc_request['id'], 'result': result}
+
+    def do_POST(self):
+        self.server.headers.append(dict(self.headers))
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        time.sleep(self.server.delay)
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.send_header('Content-Length', '5')
+            self.end_headers()
+            self.wfile.write(b'error')
+            return
+
+        if isinstance(payload, list):
+            self.server.batches.append(payload)
+            response = [self.handle_rpc(rpc_request) for rpc_request in payload]
+        else:
+            response = self.handle_rpc(payload)
+
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class JSONRPCServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), JSONRPCRequestHandler)
+        self.connections = 0
+        self.headers = []
+        self.requests = []
+        self.batches = []
+        self.results = {}
+        self.delay = 0
+        self.status = 200
+
+    @property
+    def endpoint_uri(self):
+        return 'http://%s:%s' % self.server_address
+
+
+@pytest.fixture(scope='function')
+def rpc_server_factory():
+    servers = []
+
+    def start_rpc_server():
+        server = JSONRPCServer()
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start_rpc_server
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope='function')
+def rpc_server(rpc_server_factory):
+    yield rpc_server_factory()
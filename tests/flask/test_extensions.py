@@ -8,17 +8,21 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import asyncio
+import os
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
 import pytest
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_web3 import current_web3
 
 from consensys_utils.flask.extensions import initialize_extensions, \
     initialize_health_extension, initialize_web3_extension
-from consensys_utils.flask.extensions.iterable import FlaskIterable
+from consensys_utils.exceptions import PauseIteration, Backoff
+from consensys_utils.flask.extensions.iterable import FlaskIterable, IteratorScheduler
 from consensys_utils.flask.extensions.swagger import Swagger as ConsenSysSwagger, Swagger
+from consensys_utils.flask.extensions.web3 import get_request_id
 
 
 @pytest.fixture(scope='function')
@@ -66,6 +70,83 @@ def test_web3_extension(client, config):
     assert client.get('/test-web3').status_code == 200
 
 
+def test_web3_extension_request_id(client, config):
+    config['web3'] = {
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URI': 'http://localhost:8535',
+        'ETHEREUM_REQUEST_ID_HEADER': 'X-Request-ID',
+    }
+    initialize_web3_extension(client.application)
+
+    assert get_request_id() is None
+
+    @client.application.route('/test-web3-request-id')
+    def test_web3_request_id():
+        request.id = 'abcde1234'
+        return jsonify(current_web3.providers[0].get_request_kwargs()['headers'])
+
+    assert client.get('/test-web3-request-id').json['X-Request-ID'] == 'abcde1234'
+
+    with client.application.test_request_context():
+        request.id = '-'
+        assert get_request_id() is None
+
+
+def test_web3_extension_batch(client, config):
+    config['web3'] = {'ETHEREUM_PROVIDER': 'http-batch', 'ETHEREUM_ENDPOINT_URI': 'http://localhost:8535'}
+    initialize_web3_extension(client.application)
+
+    provider = client.application.web3.providers[0]
+    provider.post = MagicMock(return_value=b'[{"jsonrpc": "2.0", "id": 0, "result": "0x1"}]')
+    with client.application.web3.batch() as batch:
+        block_number = batch.add('eth_blockNumber')
+
+    assert block_number.result == '0x1'
+
+
+def test_web3_extension_batch_multi_endpoint(client, config):
+    config['web3'] = {
+        'ETHEREUM_PROVIDER': 'http-batch',
+        'ETHEREUM_ENDPOINT_URIS': ['http://localhost:8535', 'http://localhost:8536'],
+    }
+    initialize_web3_extension(client.application)
+
+    with pytest.raises(RuntimeError):
+        client.application.web3.batch()
+
+
+def test_web3_extension_gather(client, config, rpc_server):
+    config['web3'] = {'ETHEREUM_PROVIDER': 'http', 'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri}
+    initialize_web3_extension(client.application)
+    rpc_server.results['eth_blockNumber'] = '0x10'
+
+    @client.application.route('/test-web3-gather')
+    def test_web3_gather():
+        return jsonify(current_web3.gather([('eth_blockNumber', []), ('eth_getBalance', ['0x1', 'latest'])],
+                                           timeout=5))
+
+    assert client.get('/test-web3-gather').json == ['0x10', ['0x1', 'latest']]
+    assert client.application.web3.async_provider.provider is client.application.web3.providers[0]
+
+
+def test_web3_extension_gather_request_id(client, config, rpc_server):
+    config['web3'] = {
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+        'ETHEREUM_REQUEST_ID_HEADER': 'X-Request-ID',
+    }
+    initialize_web3_extension(client.application)
+
+    @client.application.route('/test-web3-gather-request-id')
+    def test_web3_gather_request_id():
+        request.id = 'abcde1234'
+        return jsonify(current_web3.gather([('eth_blockNumber', []), ('eth_getBalance', ['0x1', 'latest'])],
+                                           timeout=5))
+
+    assert client.get('/test-web3-gather-request-id').status_code == 200
+    assert [headers['X-Request-ID'] for headers in rpc_server.headers] == ['abcde1234'] * 2
+
+
 def test_iterable_extension(client, config):
     # Test with basic iterator
     iterator = iter(range(3))
@@ -73,6 +154,7 @@ def test_iterable_extension(client, config):
     FlaskIterable(iterator, app=client.application)
 
     assert hasattr(client.application, 'iterator')
+    assert hasattr(client.application, 'iteration_lock')
     assert hasattr(client.application, '__iter__')
     assert hasattr(client.application, '__next__')
 
@@ -117,6 +199,265 @@ def test_iterable_extension(client, config):
     mock_next.assert_any_call(5)
 
 
+def test_async_iterable_extension(client):
+    class AsyncIteratorTest:
+        def __init__(self):
+            self.meter = 0
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if self.meter >= 3:
+                raise StopAsyncIteration
+            self.meter += 1
+            return self.meter
+
+    FlaskIterable(AsyncIteratorTest, app=client.application)
+
+    assert hasattr(client.application, '__aiter__')
+    assert hasattr(client.application, '__anext__')
+    assert not hasattr(client.application, '__next__')
+
+    async def consume():
+        return [meter async for meter in client.application]
+
+    loop = asyncio.new_event_loop()
+    assert loop.run_until_complete(consume()) == [1, 2, 3]
+    loop.close()
+
+
+def test_async_iterable_extension_generator(client):
+    steps = []
+
+    async def generator():
+        for meter in range(4):
+            steps.append(('start', meter))
+            await asyncio.sleep(0.001)
+            steps.append(('end', meter))
+            yield meter
+
+    FlaskIterable(generator(), app=client.application)
+
+    async def consume():
+        return await asyncio.gather(*[client.application.__anext__() for _ in range(4)])
+
+    loop = asyncio.new_event_loop()
+    assert sorted(loop.run_until_complete(consume())) == [0, 1, 2, 3]
+    loop.close()
+
+    # Steps are serialized as asynchronous generators can not be advanced concurrently
+    assert steps == [(event, meter) for meter in range(4) for event in ('start', 'end')]
+
+
+def test_iterable_extension_multiple_iterators(client, config):
+    class PausingIterator:
+        def __init__(self):
+            self.meter = 0
+
+        def set_config(self, config):
+            self.meter = config['meter']
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            self.meter += 1
+            if self.meter % 2 == 0:
+                raise PauseIteration(60)
+            return 'pausing-%s' % self.meter
+
+    config['meter'] = 0
+    iterable = FlaskIterable()
+    iterable.add_iterator('high', iter(['high-1', 'high-2']), priority=1)
+    iterable.add_iterator('low', iter(['low-1', 'low-2', 'low-3']))
+    iterable.add_iterator('pausing', PausingIterator)
+    iterable.init_app(client.application)
+
+    assert isinstance(client.application.iterator, IteratorScheduler)
+    assert sorted(client.application.iterators) == ['high', 'low', 'pausing']
+
+    # Higher priority iterator is exhausted first then other iterators are advanced in turn
+    assert [next(client.application) for _ in range(4)] == ['high-1', 'high-2', 'low-1', 'pausing-1']
+
+    # Paused iterator is parked while others keep going
+    assert [next(client.application) for _ in range(2)] == ['low-2', 'low-3']
+
+    # Once every iterator is parked the scheduler pauses
+    with pytest.raises(PauseIteration) as e:
+        next(client.application)
+    assert 59 < e.value.timeout <= 60
+
+    # Parked iterator can be resumed
+    client.application.iterator.resume('pausing')
+    assert next(client.application) == 'pausing-3'
+
+
+def test_iterable_extension_wake_iteration(client):
+    ready = []
+
+    class WaitingIterator:
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            if not ready:
+                raise PauseIteration(condition=lambda: bool(ready))
+            return ready.pop()
+
+    iterable = FlaskIterable()
+    iterable.add_iterator('waiting', WaitingIterator)
+    iterable.add_iterator('sleeping', iter(['slept']))
+    iterable.init_app(client.application)
+
+    assert next(client.application) == 'slept'
+
+    # Once every iterator is parked the scheduler pauses on parked iterators condition
+    with pytest.raises(PauseIteration) as e:
+        next(client.application)
+    assert e.value.deadline is None
+    assert not e.value.condition()
+
+    # Producer makes condition hold and wakes iteration up
+    waker = MagicMock()
+    client.application.set_waker(waker)
+    ready.append('item')
+    client.application.wake_iteration()
+
+    waker.assert_called_once_with()
+    assert e.value.condition()
+    assert next(client.application) == 'item'
+
+
+def test_iterator_scheduler_backoff():
+    items = []
+
+    class PollingIterator:
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            if not items:
+                # Pause with no duration
+                raise PauseIteration()
+            return items.pop()
+
+    backoff = Backoff(initial=1, maximum=8, jitter=0)
+    scheduler = IteratorScheduler()
+    scheduler.add('polling', PollingIterator(), backoff=backoff)
+
+    # Consecutive pauses follow backoff policy
+    for expected in [1, 2, 4]:
+        with pytest.raises(PauseIteration) as e:
+            next(scheduler)
+        assert expected - 0.1 < e.value.timeout <= expected
+        scheduler.resume('polling')
+
+    # Backoff policy is reset once iterator progresses
+    items.append('item')
+    assert next(scheduler) == 'item'
+    assert backoff.attempts == 0
+
+
+def test_iterable_extension_metrics(client, config):
+    config['iteration_metrics'] = {'ENDPOINT_URL': '/test-iteration-metrics'}
+    FlaskIterable(iter(range(3)), app=client.application)
+
+    client.application.iteration_metrics.record_steps(2, 0.001)
+
+    response = client.get('/test-iteration-metrics')
+    assert response.status_code == 200
+    assert response.json['steps'] == 2
+    assert response.json['step_latency']['count'] == 2
+
+
+class CheckpointedIterator:
+    def __init__(self):
+        self.meter = 0
+
+    def checkpoint(self):
+        return {'meter': self.meter}
+
+    def restore(self, checkpoint):
+        self.meter = checkpoint['meter']
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.meter += 1
+        return self.meter
+
+
+def test_iterable_extension_checkpoint(client, config, tmpdir):
+    config['iteration_checkpoint'] = {'STORE': 'sqlite', 'PATH': os.path.join(str(tmpdir), 'checkpoints.db')}
+    FlaskIterable(CheckpointedIterator, app=client.application)
+    client.application.set_partition(1, 2)
+
+    # Nothing to restore
+    client.application.restore_iteration()
+    assert next(client.application) == 1
+
+    client.application.checkpoint_iteration()
+    assert client.application.iteration_checkpoint_store.load('iterator-1') == {'meter': 1}
+
+    # A new application restores checkpointed progress
+    FlaskIterable(CheckpointedIterator, app=client.application)
+    client.application.set_partition(1, 2)
+    client.application.restore_iteration()
+    assert next(client.application) == 2
+
+
+def test_iterable_extension_checkpoint_multiple_iterators(client):
+    store = MagicMock()
+    store.load.return_value = {'meter': 5}
+
+    iterable = FlaskIterable(checkpoint_store=store)
+    iterable.add_iterator('checkpointed', CheckpointedIterator)
+    iterable.add_iterator('plain', iter([]))
+    iterable.init_app(client.application)
+
+    # Only iterators implementing the protocol are checkpointed
+    client.application.restore_iteration()
+    store.load.assert_called_once_with('checkpointed-0')
+    assert client.application.iterators['checkpointed'].meter == 5
+
+    client.application.checkpoint_iteration()
+    store.save.assert_called_once_with('checkpointed-0', {'meter': 5})
+
+
+def test_iterable_extension_partition(client):
+    class PartitionedIterator:
+        def __init__(self):
+            self.partition = None
+
+        def set_partition(self, index, count):
+            self.partition = (index, count)
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            return self.partition
+
+    # Partition is forwarded to the single iterator
+    FlaskIterable(PartitionedIterator).init_app(client.application)
+    client.application.set_partition(1, 4)
+    assert next(client.application) == (1, 4)
+
+
+def test_iterable_extension_partition_multiple_iterators(client):
+    partitioned = MagicMock()
+    iterable = FlaskIterable()
+    iterable.add_iterator('partitioned', partitioned)
+    iterable.add_iterator('plain', iter([]))
+    iterable.init_app(client.application)
+
+    # Partition is forwarded to iterators implementing set_partition
+    client.application.set_partition(0, 2)
+    partitioned.set_partition.assert_called_once_with(0, 2)
+
+
 def test_custom_swagger_extension(client, config):
     config['SWAGGER'] = {'specs': [{'route': '/test-swagger', 'endpoint': 'test-swagger'}]}
 
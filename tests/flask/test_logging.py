@@ -16,6 +16,7 @@ from flask import current_app, jsonify
 
 from consensys_utils.flask import Flask
 from consensys_utils.flask.hooks import set_request_id_hook
+from consensys_utils.logging import get_request_id
 
 
 @pytest.fixture(scope='session')
@@ -52,3 +53,18 @@ def test_request_id_logging_filter(client, config, caplog, logging_config_file):
         client.get('/')
     assert caplog.records[0].name == 'app'
     assert caplog.records[0].id == '-'
+
+
+def test_request_id_logging_filter_header(client, config, caplog, logging_config_file):
+    config['logging'] = {'LOGGING_CONFIG_PATH': logging_config_file}
+    config['wsgi'] = {'request_id': {'REQUEST_ID_HEADER': 'Test-Request-ID'}}
+
+    set_request_id_hook(client.application)
+    request_id = get_request_id()
+    with caplog.at_level(logging.DEBUG, logger='app'):
+        # Request context is torn down once request is served (not preserved as with ``client``)
+        client.application.test_client().get('/', headers={'Test-Request-ID': 'abcde'})
+    assert caplog.records[0].id == 'abcde'
+
+    # Request ID is reset once request is torn down
+    assert get_request_id() == request_id
@@ -10,11 +10,15 @@
 
 from unittest.mock import MagicMock
 
+import logging
+
 import pytest
 from flask import Flask, request
 
 from consensys_utils.flask.hooks import set_request_id_hook
+from consensys_utils.flask.logging import RequestIDFilter
 from consensys_utils.flask.wsgi import apply_request_id_middleware, apply_middlewares
+from consensys_utils.logging import get_request_id
 
 
 @pytest.fixture(scope='session')
@@ -43,6 +47,38 @@ def test_request_id_middleware(client):
     assert request.id == 'abcde1234'
 
 
+def test_request_id_middleware_and_hook(caplog):
+    app = Flask(__name__)
+    app.config['wsgi'] = {'request_id': {'REQUEST_ID_HEADER': 'test-header'}}
+    apply_request_id_middleware(app)
+    set_request_id_hook(app)
+
+    logger = logging.getLogger('test-request-id')
+
+    @app.route('/')
+    def test():
+        logger.info('Test Message')
+        logger.info('Test Message', extra={'id': 'explicit'})
+        return get_request_id()
+
+    caplog.handler.addFilter(RequestIDFilter())
+    try:
+        # Request context is preserved after the request has been served
+        with app.test_client() as client:
+            with caplog.at_level(logging.INFO, logger='test-request-id'):
+                assert client.get('/', headers=[('test-header', 'abcde1234')]).data == b'abcde1234'
+            assert request.id == 'abcde1234'
+            assert get_request_id() is None
+
+        # Request ID does not leak once preserved context is torn down
+        assert get_request_id() is None
+    finally:
+        caplog.handler.filters.clear()
+
+    # Request ID given in record extra takes precedence
+    assert [record.id for record in caplog.records] == ['abcde1234', 'explicit']
+
+
 def test_apply_middlewares(client):
     apply_middleware_mock = MagicMock()
 
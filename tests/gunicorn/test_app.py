@@ -15,6 +15,7 @@ import pytest
 from gunicorn.workers.gthread import ThreadWorker
 
 from consensys_utils.gunicorn.app import WSGIApplication
+from consensys_utils.gunicorn.workers import assign_partition
 
 
 @pytest.fixture(scope='session')
@@ -44,6 +45,7 @@ def test_wsgi_application(logging_config_file, gunicorn_config_file):
     assert app.cfg.address == [('', 8080)]
     assert app.cfg.wsgi['request_id']['REQUEST_ID_HEADER'] == 'Test-Request-ID'
     assert app.cfg.worker_class == ThreadWorker
+    assert app.cfg.pre_fork is assign_partition
 
     # Test application loading
     app.load()
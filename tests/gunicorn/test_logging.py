@@ -10,12 +10,14 @@
 
 import datetime
 import logging
+import os
 from types import SimpleNamespace
 
 import pytest
 
 from consensys_utils.gunicorn.config import Config
 from consensys_utils.gunicorn.logging import Logger, RequestIDLogger
+from consensys_utils.logging import QueueHandler
 
 
 @pytest.fixture(scope='function')
@@ -44,8 +46,8 @@ def request_id_logger(cfg):
     yield RequestIDLogger(cfg)
 
 
-def test_request_id_logger(request_id_logger, caplog):
-
+@pytest.fixture(scope='function')
+def access_args():
     response = SimpleNamespace(
         status='200', response_length=1024,
         headers=(('Content-Type', 'application/json'),), sent=1024,
@@ -58,11 +60,98 @@ def test_request_id_logger(request_id_logger, caplog):
     }
     request_time = datetime.timedelta(seconds=1)
 
-    # Test atoms
-    safe_atoms = request_id_logger.atoms(response, request, environ, request_time)
-    assert request_id_logger.request_id_atom in safe_atoms and safe_atoms[request_id_logger.request_id_atom] == 'abcde'
+    yield response, request, environ, request_time
+
+
+def test_request_id_logger(request_id_logger, caplog, access_args):
+    response, request, environ, request_time = access_args
+
+    # Access records hold the request ID in their id extra
+    with caplog.at_level(logging.DEBUG, logger='gunicorn.access'):
+        request_id_logger.access(response, request, environ, request_time)
+        del environ['HTTP_TEST_REQUEST_ID']
+        request_id_logger.access(response, request, environ, request_time)
+    assert [record.id for record in caplog.records] == ['abcde', '-']
+
+
+def test_request_id_logger_compiled_format(request_id_logger, caplog, access_args):
+    response, request, environ, request_time = access_args
+    environ['HTTP_USER_AGENT'] = 'my "agent"'
+    request_id_logger.cfg.set('access_log_format', '%(h)s "%(r)s" %(s)s %(b)s "%(a)s" %(D)s %({accept}i)s '
+                                                   '%({content-type}o)s %({test-request-id}i)s %({path_info}e)s '
+                                                   '%(unknown)s')
+    request_id_logger.access_atoms = []
+
+    with caplog.at_level(logging.DEBUG, logger='gunicorn.access'):
+        request_id_logger.access(response, request, environ, request_time)
+
+    # Format is compiled again once changed and only used atoms are computed
+    assert len(request_id_logger.access_atoms) == 11
+    assert caplog.records[0].getMessage() == ('- "GET /my/path?foo=bar HTTP/1.1" 200 1024 "my \\"agent\\"" 1000000 '
+                                              'application/json application/json - /my/path -')
+    assert caplog.records[0].id == 'abcde'
+
+    # Compiled format matches Gunicorn formatting
+    safe_atoms = request_id_logger.atoms_wrapper_class(request_id_logger.atoms(response, request, environ,
+                                                                               request_time))
+    assert caplog.records[0].getMessage() == request_id_logger.cfg.access_log_format % safe_atoms
+
+
+def test_request_id_logger_structured(request_id_logger, caplog, access_args):
+    response, request, environ, request_time = access_args
+    request_id_logger.cfg.set('access_log_format', '%(h)s "%(r)s" %(s)s %(D)s %({accept}i)s')
+    request_id_logger.cfg.set('access_log_structured', True)
 
-    # Test logger id
     with caplog.at_level(logging.DEBUG, logger='gunicorn.access'):
         request_id_logger.access(response, request, environ, request_time)
+
+    assert caplog.records[0].getMessage() == 'GET /my/path?foo=bar 200'
     assert caplog.records[0].id == 'abcde'
+    assert caplog.records[0].access == {
+        'remote_addr': '-',
+        'request': 'GET /my/path?foo=bar HTTP/1.1',
+        'status': '200',
+        'request_time_us': 1000000,
+        '{accept}i': 'application/json',
+    }
+
+
+def test_logger_queue(tmpdir):
+    log_path = str(tmpdir.join('access.log'))
+    logging_config_file = tmpdir.join('logging.yml')
+    logging_config_file.write('\n'.join([
+        'version: 1',
+        'handlers:',
+        '  file:',
+        '    class: logging.FileHandler',
+        '    filename: %s' % log_path,
+        'loggers:',
+        '  gunicorn.access:',
+        '    level: INFO',
+        '    handlers: [file]',
+    ]))
+
+    cfg = Config()
+    cfg.set('logging', {'LOGGING_CONFIG_PATH': str(logging_config_file), 'LOGGING_QUEUE': True})
+    logger = Logger(cfg)
+
+    try:
+        handler = logger.access_log.handlers[0]
+        assert isinstance(handler, QueueHandler)
+        assert logger.enqueued_file_handlers() == [handler.handler]
+
+        logger.access_log.info('Before rotation')
+        handler.queue.stop()
+        os.rename(log_path, log_path + '.1')
+
+        # Enqueued file handlers are reopened
+        logger.reopen_files()
+        logger.close_on_exec()
+        logger.access_log.info('After rotation')
+        with open(log_path + '.1') as f:
+            assert f.read() == 'Before rotation\n'
+        with open(log_path) as f:
+            assert f.read() == 'After rotation\n'
+    finally:
+        handler.handler.close()
+        logging.getLogger('gunicorn.access').handlers = []
@@ -8,17 +8,26 @@
     :license: BSD, see LICENSE for more details.
 """
 
-import errno
+import asyncio
+import os
+import socket
+import threading
+import time
 import unittest.mock as mock
 
 import pytest
+from gunicorn import util
 from gunicorn.config import Config
 
-from consensys_utils.gunicorn.workers import SyncIteratingWorker, PauseIteration
+from consensys_utils.exceptions import Backoff
+from consensys_utils.gunicorn.config import Config as ConsenSysConfig
+from consensys_utils.gunicorn.workers import SyncIteratingWorker, ThreadedIteratingWorker, AsyncIteratingWorker, \
+    PauseIteration, assign_partition
 
 
 class IteratorTest:
     MAX_ITERATION = 10
+    PAUSE = 0.01
 
     def __init__(self):
         self.meter = 0
@@ -32,72 +41,155 @@ class IteratorTest:
             raise StopIteration
         self.mock_next(self.meter)
         if self.meter % 2 == 1:
-            # Indicating the running loop to pause iteration for 2 secs
+            # Indicating the running loop to pause iteration
             self.meter += 1
-            raise PauseIteration(2)
+            raise PauseIteration(self.PAUSE)
         self.meter += 1
 
 
+def create_listener():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+    return listener
+
+
 @pytest.fixture(scope='function')
 def iterator():
     yield IteratorTest()
 
 
 @pytest.fixture(scope='function')
-def worker(iterator):
-    # Mock socket listener
-    mock_listener = mock.Mock()
-    sockets = [mock_listener]
+def sockets():
+    _sockets = [create_listener(), create_listener()]
+
+    yield _sockets
+
+    for s in _sockets:
+        s.close()
 
+
+@pytest.fixture(scope='function')
+def worker(iterator, sockets):
     # Declare worker
     mock_log = mock.Mock()
     worker = SyncIteratingWorker(None, None, sockets, None, None, Config(), mock_log)
+    worker.PIPE = os.pipe()
+    for p in worker.PIPE:
+        util.set_non_blocking(p)
     worker.wsgi = iterator
     worker.alive = True
 
     yield worker
 
+    for p in worker.PIPE:
+        os.close(p)
+
 
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.accept')
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
-@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.wait')
-def test_sync_iterating_worker(wait, is_parent_alive, accept, notify, worker):
-    # Define a iterator for test purpose
-
-    # Mock SyncIteratingWorker.accept to simulate an IO Error when accepting a connexion
-    error = OSError()
-    error.errno = errno.EAGAIN
-    accept.side_effect = [True] + IteratorTest.MAX_ITERATION * [error]
-
+def test_sync_iterating_worker(is_parent_alive, accept, notify, worker):
     # Mock SyncIteratingWorker.is_parent_alive to simulate a parent alive at all time
     is_parent_alive.return_value = True
 
-    with pytest.raises(StopIteration):
-        worker.run()
+    # Iteration steps are only recorded once enabled
+    assert not worker.record_steps
+    worker.record_steps = True
+
+    with mock.patch.object(worker, 'wait', wraps=worker.wait) as wait:
+        with pytest.raises(StopIteration):
+            worker.run()
 
     # Ensure iterator has been called the expected number of times
     assert len(worker.wsgi.mock_next.call_args_list) == 10
     for i in range(10):
         worker.wsgi.mock_next.assert_any_call(i)
 
-    assert len(wait.call_args_list) == 5
-    assert len(is_parent_alive.call_args_list) == 5
-    assert len(notify.call_args_list) == 12
+    # Ensure metrics have been recorded
+    assert worker.metrics.steps == 11
+    assert worker.metrics.pauses == 5
+    assert worker.metrics.pause_time >= 5 * IteratorTest.PAUSE
+
+    # Ensure worker has blocked on its selector until pause deadline only when iteration was paused (selector may
+    # return before the deadline, worker then checks its parent and polls again until iteration resumes)
+    early_wakeups = len(wait.call_args_list) - worker.metrics.steps
+    assert early_wakeups >= 0
+    assert all(0 <= c[0][0] <= IteratorTest.PAUSE for c in wait.call_args_list)
+    assert len(is_parent_alive.call_args_list) == worker.metrics.pauses + early_wakeups
+    assert len(notify.call_args_list) == len(wait.call_args_list)
+    assert len(accept.call_args_list) == 0
 
 
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.accept')
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
-@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.wait')
-def test_sync_iterating_worker_parent_dead(wait, is_parent_alive, accept, notify, worker):
-    # Define a iterator for test purpose
+def test_sync_iterating_worker_accept_all_listeners(is_parent_alive, accept, notify, worker, sockets):
+    is_parent_alive.return_value = True
+
+    # Simulate clients connecting on each bound socket
+    clients = [socket.create_connection(s.getsockname()) for s in sockets]
+
+    # Accept pending connections
+    accept.side_effect = lambda listener: listener.accept()[0].close()
+
+    with pytest.raises(StopIteration):
+        worker.run()
+
+    assert worker.metrics.requests == 2
+
+    # Ensure a connection has been accepted on every listener
+    assert sorted([c[0][0].getsockname() for c in accept.call_args_list]) == \
+        sorted([s.getsockname() for s in sockets])
+    assert len(worker.wsgi.mock_next.call_args_list) == 10
+
+    for client in clients:
+        client.close()
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.accept')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_request_resumes_iteration(is_parent_alive, accept, notify, worker, sockets):
+    is_parent_alive.return_value = True
+    accept.side_effect = lambda listener: listener.accept()[0].close()
+
+    # Pause for longer than the heart beat so iteration can only be resumed by the request
+    worker.wsgi.PAUSE = 60
+    worker.wsgi.MAX_ITERATION = 2
+    client = threading.Timer(0.05, lambda: socket.create_connection(sockets[0].getsockname()).close())
+    client.start()
+
+    start = time.monotonic()
+    with pytest.raises(StopIteration):
+        worker.run()
+    client.join()
+
+    # Ensure iteration has resumed right after the request has been handled
+    assert len(accept.call_args_list) == 1
+    assert time.monotonic() - start < 0.5
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_wakeup(is_parent_alive, notify, worker):
+    is_parent_alive.return_value = True
 
-    # Mock SyncIteratingWorker.accept to simulate an IO Error when accepting a connexion
-    error = OSError()
-    error.errno = errno.EAGAIN
-    accept.side_effect = error
+    # Write on the wakeup pipe (as it happens on signal reception)
+    os.write(worker.PIPE[1], b'.')
 
+    with pytest.raises(StopIteration):
+        worker.run()
+
+    # Ensure wakeup pipe has been drained
+    with pytest.raises(BlockingIOError):
+        os.read(worker.PIPE[0], 1)
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.accept')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_parent_dead(is_parent_alive, accept, notify, worker):
     # Mock SyncIteratingWorker.is_parent_alive to simulate a dead parent
     is_parent_alive.return_value = False
 
@@ -108,7 +200,6 @@ def test_sync_iterating_worker_parent_dead(wait, is_parent_alive, accept, notify
     worker.wsgi.mock_next.assert_any_call(0)
     worker.wsgi.mock_next.assert_any_call(1)
 
-    assert len(wait.call_args_list) == 0
     assert len(is_parent_alive.call_args_list) == 1
     assert len(notify.call_args_list) == 2
 
@@ -116,15 +207,7 @@ def test_sync_iterating_worker_parent_dead(wait, is_parent_alive, accept, notify
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.accept')
 @mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
-@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.wait')
-def test_sync_iterating_worker_iteration_raise(wait, is_parent_alive, accept, notify, worker):
-    # Define a iterator for test purpose
-
-    # Mock SyncIteratingWorker.accept to simulate an IO Error when accepting a connexion
-    error = OSError()
-    error.errno = errno.EAGAIN
-    accept.side_effect = error
-
+def test_sync_iterating_worker_iteration_raise(is_parent_alive, accept, notify, worker):
     # Mock SyncIteratingWorker.is_parent_alive to simulate a parent alive at all time
     is_parent_alive.return_value = True
 
@@ -136,5 +219,567 @@ def test_sync_iterating_worker_iteration_raise(wait, is_parent_alive, accept, no
 
     # Ensure iterator has been called the expected number of times
     assert len(worker.wsgi.mock_next.call_args_list) == 1
-    assert len(wait.call_args_list) == 0
     assert len(notify.call_args_list) == 1
+    assert worker.metrics.errors == {'Exception': 1}
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_wake(is_parent_alive, notify, worker):
+    is_parent_alive.return_value = True
+
+    # Pause for long so iteration can only be resumed by a wakeup
+    worker.wsgi.PAUSE = 60
+    worker.wsgi.MAX_ITERATION = 4
+
+    waker = threading.Thread(target=lambda: [time.sleep(0.05), worker.wake(), time.sleep(0.05), worker.wake()])
+    waker.start()
+
+    start = time.monotonic()
+    with pytest.raises(StopIteration):
+        worker.run()
+    waker.join()
+
+    assert len(worker.wsgi.mock_next.call_args_list) == 4
+    assert time.monotonic() - start < 5
+
+
+class StepsIterator:
+    """Iterator raising the given exceptions in turn"""
+
+    def __init__(self, *steps):
+        self.steps = iter(steps)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        step = next(self.steps)
+        if step is not None:
+            raise step
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_pause_condition(is_parent_alive, notify, worker):
+    is_parent_alive.return_value = True
+
+    ready = threading.Event()
+    worker.wsgi = StepsIterator(PauseIteration(condition=ready.is_set), None)
+
+    # Wakeups do not resume iteration while condition does not hold
+    worker.wake()
+    timer = threading.Timer(0.05, lambda: [ready.set(), worker.wake()])
+    timer.start()
+
+    with pytest.raises(StopIteration):
+        worker.run()
+    timer.join()
+
+    assert ready.is_set()
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_pause_deadline(is_parent_alive, notify, worker):
+    is_parent_alive.return_value = True
+
+    deadline = time.monotonic() + 0.05
+    worker.wsgi = StepsIterator(None, PauseIteration(deadline=deadline), None)
+
+    with pytest.raises(StopIteration):
+        worker.run()
+
+    # Ensure iteration has resumed once deadline has been reached
+    assert time.monotonic() >= deadline
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_backoff(is_parent_alive, notify, worker):
+    is_parent_alive.return_value = True
+
+    backoff = Backoff(initial=0.001, maximum=0.01, jitter=0)
+    timeouts = []
+
+    def pause():
+        pause = backoff.pause()
+        timeouts.append(pause.timeout)
+        return pause
+
+    # Iterator pauses 3 times in a row, progresses and then pauses again
+    worker.wsgi = StepsIterator(pause(), pause(), pause(), None, None)
+    with pytest.raises(StopIteration):
+        worker.run()
+
+    # Ensure backoff policy has been reset once iteration progressed
+    assert timeouts == [0.001, 0.002, 0.004]
+    assert backoff.attempts == 0
+
+
+@pytest.fixture(scope='function')
+def batching_worker(sockets):
+    cfg = ConsenSysConfig()
+    cfg.set('iteration_batch_size', 4)
+    cfg.set('iteration_metrics', True)
+
+    worker = SyncIteratingWorker(None, None, sockets, None, None, cfg, mock.Mock())
+    worker.PIPE = os.pipe()
+    for p in worker.PIPE:
+        util.set_non_blocking(p)
+    worker.alive = True
+
+    yield worker
+
+    for p in worker.PIPE:
+        os.close(p)
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+def test_sync_iterating_worker_batch(notify, batching_worker):
+    mock_next = mock.Mock()
+    batching_worker.wsgi = (mock_next(i) for i in range(10))
+
+    with pytest.raises(StopIteration):
+        batching_worker.run()
+
+    # Ensure iteration has been run by batches of 4 steps
+    assert len(mock_next.call_args_list) == 10
+    assert len(notify.call_args_list) == 3
+    assert batching_worker.metrics.steps == 11
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+def test_sync_iterating_worker_time_slice(notify, batching_worker):
+    batching_worker.iteration_time_slice = 0.001
+
+    mock_next = mock.Mock(side_effect=lambda i: time.sleep(0.002))
+    batching_worker.wsgi = (mock_next(i) for i in range(3))
+
+    with pytest.raises(StopIteration):
+        batching_worker.run()
+
+    # Ensure every batch has been interrupted after a single step
+    assert len(mock_next.call_args_list) == 3
+    assert len(notify.call_args_list) == 4
+
+
+@pytest.fixture(scope='function')
+def threaded_worker(iterator, sockets):
+    worker = ThreadedIteratingWorker(None, None, sockets, None, None, Config(), mock.Mock())
+    worker.iteration_wakeup = threading.Event()
+    worker.iteration_lock = threading.RLock()
+    worker.wsgi = iterator
+    worker.alive = True
+
+    yield worker
+
+
+def test_threaded_iterating_worker_load_wsgi(threaded_worker):
+    app = mock.Mock(iteration_lock=threading.RLock())
+    threaded_worker.app = mock.Mock(wsgi=lambda: app)
+
+    threaded_worker.age = 1
+    threaded_worker.load_wsgi()
+    assert threaded_worker.iteration_lock is app.iteration_lock
+
+    # Ensure partition and waker have been provided to WSGI object and iteration has been restored
+    app.set_partition.assert_called_once_with(0, 1)
+    app.set_waker.assert_called_once_with(threaded_worker.wake)
+    app.restore_iteration.assert_called_once_with()
+
+
+def test_threaded_iterating_worker_run_iteration(threaded_worker):
+    threaded_worker.run_iteration()
+
+    # Ensure iterator has been called the expected number of times
+    assert len(threaded_worker.wsgi.mock_next.call_args_list) == 10
+    for i in range(10):
+        threaded_worker.wsgi.mock_next.assert_any_call(i)
+
+    # Ensure worker stops once iteration is over
+    assert not threaded_worker.alive
+    assert threaded_worker.iteration_step_started is None
+
+
+def test_threaded_iterating_worker_iteration_raise(threaded_worker):
+    threaded_worker.wsgi.mock_next.side_effect = Exception()
+
+    threaded_worker.run_iteration()
+
+    assert len(threaded_worker.wsgi.mock_next.call_args_list) == 1
+    assert not threaded_worker.alive
+    threaded_worker.log.exception.assert_called_once()
+
+
+def test_threaded_iterating_worker_lock(threaded_worker):
+    # Pause for long so iteration thread can only be woken up by a request
+    threaded_worker.wsgi.PAUSE = 60
+    thread = threading.Thread(target=threaded_worker.run_iteration)
+
+    # Ensure iteration does not proceed while lock is held
+    with threaded_worker.iteration_lock:
+        thread.start()
+        time.sleep(0.05)
+        assert len(threaded_worker.wsgi.mock_next.call_args_list) == 0
+
+    # Iteration is paused after 2 steps
+    time.sleep(0.05)
+    assert len(threaded_worker.wsgi.mock_next.call_args_list) == 2
+
+    # Ensure handling a request gets iteration out of stale state
+    with mock.patch('gunicorn.workers.gthread.ThreadWorker.handle_request') as handle_request:
+        threaded_worker.handle_request(None, None)
+    handle_request.assert_called_once()
+
+    time.sleep(0.05)
+    assert len(threaded_worker.wsgi.mock_next.call_args_list) == 4
+
+    threaded_worker.alive = False
+    threaded_worker.iteration_wakeup.set()
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_threaded_iterating_worker_wake(threaded_worker):
+    threaded_worker.wsgi.PAUSE = 60
+    threaded_worker.wsgi.MAX_ITERATION = 4
+
+    thread = threading.Thread(target=threaded_worker.run_iteration)
+    thread.start()
+
+    # Wake up paused iteration thread until iteration is over
+    for _ in range(100):
+        threaded_worker.wake()
+        thread.join(0.01)
+        if not thread.is_alive():
+            break
+
+    assert not thread.is_alive()
+    assert len(threaded_worker.wsgi.mock_next.call_args_list) == 4
+
+
+def test_threaded_iterating_worker_notify(threaded_worker):
+    threaded_worker.timeout = 1
+    threaded_worker.tmp = mock.Mock()
+
+    threaded_worker.notify()
+    assert len(threaded_worker.tmp.notify.call_args_list) == 1
+
+    # Simulate an iteration step hanging for longer than timeout
+    threaded_worker.iteration_step_started = time.monotonic() - 2
+    threaded_worker.notify()
+    assert len(threaded_worker.tmp.notify.call_args_list) == 1
+
+
+class AsyncIteratorTest:
+    MAX_ITERATION = 20
+    PAUSE = 0.01
+
+    def __init__(self):
+        self.meter = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.mock_next = mock.Mock()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.meter >= self.MAX_ITERATION:
+            raise StopAsyncIteration
+        meter = self.meter
+        self.meter += 1
+        self.mock_next(meter)
+
+        # Simulate an I/O bound step
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.005)
+        self.in_flight -= 1
+
+        if meter % 5 == 4:
+            raise PauseIteration(self.PAUSE)
+
+
+@pytest.fixture(scope='function')
+def async_worker(sockets):
+    cfg = ConsenSysConfig()
+    cfg.set('iteration_concurrency', 4)
+
+    worker = AsyncIteratingWorker(None, os.getppid(), sockets, None, None, cfg, mock.Mock())
+    worker.PIPE = os.pipe()
+    for p in worker.PIPE:
+        util.set_non_blocking(p)
+    worker.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(worker.loop)
+    worker.wsgi = AsyncIteratorTest()
+    worker.alive = True
+
+    yield worker
+
+    worker.loop.close()
+    for p in worker.PIPE:
+        os.close(p)
+
+
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.notify')
+def test_async_iterating_worker(notify, async_worker):
+    async_worker.run()
+
+    # Ensure every step has been run with concurrent steps in-flight
+    assert len(async_worker.wsgi.mock_next.call_args_list) == AsyncIteratorTest.MAX_ITERATION
+    assert async_worker.wsgi.max_in_flight == 4
+    notify.assert_called()
+
+
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.notify')
+def test_async_iterating_worker_iteration_raise(notify, async_worker):
+    next_error = Exception()
+    async_worker.wsgi.mock_next.side_effect = next_error
+
+    with pytest.raises(Exception) as e:
+        async_worker.run()
+    assert e.value == next_error
+
+
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.handle')
+def test_async_iterating_worker_handle(handle, notify, async_worker, sockets):
+    # Pause for long so iteration can only be woken up by a request
+    async_worker.wsgi.PAUSE = 60
+    handle.side_effect = lambda listener, client, address: client.close()
+
+    clients = []
+
+    def send_request():
+        client = socket.create_connection(sockets[1].getsockname())
+        client.sendall(b'GET / HTTP/1.1\r\n\r\n')
+        clients.append(client)
+
+    # Send a request once iteration has been paused
+    async_worker.loop.call_later(0.1, send_request)
+    async_worker.run()
+
+    # Ensure request has been handled on the listener it was received on
+    # (and that it has woken up paused iteration tasks for the worker to stop)
+    handle.assert_called_once()
+    assert handle.call_args[0][0] == sockets[1]
+    assert len(async_worker.wsgi.mock_next.call_args_list) == AsyncIteratorTest.MAX_ITERATION
+
+    clients[0].close()
+
+
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.notify')
+def test_async_iterating_worker_slow_client(notify, async_worker, sockets):
+    steps = []
+    async_worker.wsgi.mock_next.side_effect = lambda meter: steps.append(time.monotonic())
+
+    def send_partial_request():
+        # Client sends half a request and stalls
+        client = socket.create_connection(sockets[0].getsockname())
+        client.sendall(b'GET / HTTP/1.1\r\n')
+        time.sleep(1)
+        client.close()
+
+    thread = threading.Thread(target=send_partial_request)
+    thread.start()
+    start = time.monotonic()
+    async_worker.run()
+    thread.join(5)
+
+    # Iteration tasks have not waited for the request to be read
+    assert len(steps) == AsyncIteratorTest.MAX_ITERATION
+    assert steps[-1] - start < 0.5
+
+
+class AsyncWSGITest(AsyncIteratorTest):
+    """Asynchronous iterable WSGI application responding with a large body"""
+
+    BODY = b'x' * 8 * 1024 * 1024
+
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [('Content-Length', str(len(self.BODY)))])
+        return [self.BODY]
+
+
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.notify')
+def test_async_iterating_worker_large_response(notify, async_worker, sockets):
+    async_worker.wsgi = AsyncWSGITest()
+    async_worker.wsgi.PAUSE = 60
+    responses = []
+
+    def send_request():
+        client = socket.create_connection(sockets[0].getsockname())
+        # Request is split across packets and response is read once socket buffers are full
+        client.sendall(b'GET / HTTP/1.1\r\n')
+        time.sleep(0.05)
+        client.sendall(b'Host: localhost\r\n\r\n')
+        time.sleep(0.1)
+        response = b''
+        chunk = client.recv(65536)
+        while chunk:
+            response += chunk
+            chunk = client.recv(65536)
+        responses.append(response)
+        client.close()
+
+    thread = threading.Thread(target=send_request)
+    async_worker.loop.call_later(0.1, thread.start)
+    async_worker.run()
+    thread.join(5)
+
+    assert responses[0].startswith(b'HTTP/1.1 200 OK')
+    assert responses[0].endswith(AsyncWSGITest.BODY)
+
+
+@mock.patch('consensys_utils.gunicorn.workers.AsyncIteratingWorker.notify')
+def test_async_iterating_worker_wake(notify, async_worker):
+    async_worker.wsgi.PAUSE = 60
+
+    # Wake up worker from another thread once iteration has been paused
+    timer = threading.Timer(0.1, async_worker.wake)
+    timer.start()
+
+    start = time.monotonic()
+    async_worker.run()
+    timer.join()
+
+    assert len(async_worker.wsgi.mock_next.call_args_list) == AsyncIteratorTest.MAX_ITERATION
+    assert time.monotonic() - start < 5
+
+
+def test_assign_partition():
+    server = mock.Mock(num_workers=3, WORKERS={})
+
+    # Workers receive the lowest free partition
+    for pid in range(3):
+        worker = mock.Mock()
+        assign_partition(server, worker)
+        assert (worker.partition_index, worker.partition_count) == (pid, 3)
+        server.WORKERS[pid] = worker
+
+    # A worker replacing a dead one inherits its partition
+    del server.WORKERS[1]
+    worker = mock.Mock()
+    assign_partition(server, worker)
+    assert worker.partition_index == 1
+    server.WORKERS[3] = worker
+
+    # When every partition is used, workers receive the least used partition
+    for pid, expected in zip(range(4, 7), [0, 1, 2]):
+        worker = mock.Mock()
+        assign_partition(server, worker)
+        assert worker.partition_index == expected
+        server.WORKERS[pid] = worker
+
+
+def test_iterating_worker_set_partition(worker):
+    worker.wsgi = mock.Mock()
+
+    # Without assigned partition, partition is derived from worker age
+    worker.cfg.set('workers', 4)
+    worker.age = 6
+    worker.set_partition()
+    worker.wsgi.set_partition.assert_called_once_with(1, 4)
+
+    # Assigned partition takes precedence
+    worker.partition_index, worker.partition_count = 2, 3
+    worker.set_partition()
+    worker.wsgi.set_partition.assert_called_with(2, 3)
+
+
+def test_iterating_worker_push_metrics(worker):
+    worker.statsd = mock.Mock()
+    worker.tmp = mock.Mock()
+
+    # Metrics are pushed on first heart beat and then every push interval
+    worker.notify()
+    worker.notify()
+    worker.statsd.push.assert_called_once_with(worker.metrics)
+
+
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.notify')
+@mock.patch('consensys_utils.gunicorn.workers.SyncIteratingWorker.is_parent_alive')
+def test_sync_iterating_worker_checkpoint_on_exit(is_parent_alive, notify, worker):
+    is_parent_alive.return_value = True
+    worker.wsgi = mock.MagicMock(__next__=mock.Mock(return_value=None))
+
+    # Worker stops gracefully (e.g. on SIGTERM)
+    notify.side_effect = lambda: setattr(worker, 'alive', len(notify.call_args_list) < 3)
+    worker.run()
+    worker.wsgi.checkpoint_iteration.assert_called_once_with()
+
+    # Worker exits (e.g. on SIGQUIT)
+    worker.alive = True
+    notify.side_effect = SystemExit
+    with pytest.raises(SystemExit):
+        worker.run()
+    assert len(worker.wsgi.checkpoint_iteration.call_args_list) == 2
+
+    # Iteration fails
+    worker.wsgi.__next__.side_effect = Exception()
+    notify.side_effect = None
+    with pytest.raises(Exception):
+        worker.run()
+    assert len(worker.wsgi.checkpoint_iteration.call_args_list) == 2
+
+
+def test_iterating_worker_periodic_checkpoint(worker):
+    worker.wsgi = mock.Mock()
+    worker.tmp = mock.Mock()
+    worker.checkpoint_interval = 60
+
+    worker.notify()
+    assert not worker.wsgi.checkpoint_iteration.called
+
+    # Checkpoint once interval has elapsed
+    worker.checkpoint_next = time.monotonic()
+    worker.notify()
+    worker.notify()
+    worker.wsgi.checkpoint_iteration.assert_called_once_with()
+
+    # Checkpoint errors are logged but do not stop worker
+    worker.wsgi.checkpoint_iteration.side_effect = Exception()
+    worker.checkpoint()
+    worker.log.exception.assert_called_once()
+
+
+def test_threaded_iterating_worker_periodic_checkpoint(threaded_worker):
+    threaded_worker.wsgi = mock.MagicMock(__next__=mock.Mock(side_effect=[None, StopIteration()]))
+    threaded_worker.tmp = mock.Mock()
+    threaded_worker.checkpoint_interval = 60
+    threaded_worker.checkpoint_next = time.monotonic()
+
+    # Heart beat never waits for iteration lock held by iteration thread
+    acquired, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with threaded_worker.iteration_lock:
+            acquired.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    acquired.wait(5)
+    try:
+        threaded_worker.notify()
+    finally:
+        release.set()
+        thread.join()
+    assert not threaded_worker.wsgi.checkpoint_iteration.called
+
+    # Iteration thread checkpoints between batches
+    threaded_worker.run_iteration()
+    threaded_worker.wsgi.checkpoint_iteration.assert_called_once_with()
+
+
+def test_threaded_iterating_worker_checkpoint(threaded_worker):
+    threaded_worker.wsgi = mock.MagicMock(__next__=mock.Mock(side_effect=Exception()))
+
+    # Iteration thread fails so worker stops without checkpointing iteration
+    with mock.patch('gunicorn.workers.gthread.ThreadWorker.run', lambda self: threaded_worker.iteration_thread.join()):
+        threaded_worker.run()
+
+    assert threaded_worker.iteration_failed
+    assert not threaded_worker.wsgi.checkpoint_iteration.called
@@ -0,0 +1,56 @@
+"""
+    tests.test_checkpoint
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test checkpoint stores
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+
+import pytest
+
+from consensys_utils.checkpoint import FileCheckpointStore, SQLiteCheckpointStore, create_checkpoint_store
+
+
+@pytest.mark.parametrize('store_class, path', [
+    (FileCheckpointStore, 'checkpoints'),
+    (SQLiteCheckpointStore, 'checkpoints.db'),
+])
+def test_checkpoint_store(tmpdir, store_class, path):
+    store = store_class(os.path.join(str(tmpdir), path))
+
+    assert store.load('iterator-0') is None
+
+    store.save('iterator-0', {'block': 10})
+    store.save('iterator-1', {'block': 20})
+    store.save('iterator-0', {'block': 11})
+
+    assert store.load('iterator-0') == {'block': 11}
+    assert store.load('iterator-1') == {'block': 20}
+
+    # Checkpoints persist across store instances
+    assert store_class(os.path.join(str(tmpdir), path)).load('iterator-0') == {'block': 11}
+
+
+def test_file_checkpoint_store_save_error(tmpdir):
+    store = FileCheckpointStore(str(tmpdir))
+    store.save('iterator-0', {'block': 10})
+
+    # Failing to serialize a checkpoint does not corrupt previous checkpoint
+    with pytest.raises(TypeError):
+        store.save('iterator-0', {'block': object()})
+
+    assert store.load('iterator-0') == {'block': 10}
+    assert os.listdir(str(tmpdir)) == ['iterator-0.json']
+
+
+def test_create_checkpoint_store(tmpdir):
+    assert isinstance(create_checkpoint_store({'STORE': 'file', 'PATH': str(tmpdir)}), FileCheckpointStore)
+    assert isinstance(create_checkpoint_store({'STORE': 'sqlite', 'PATH': os.path.join(str(tmpdir), 'db')}),
+                      SQLiteCheckpointStore)
+
+    with pytest.raises(RuntimeError):
+        create_checkpoint_store({'STORE': 'unknown'})
@@ -0,0 +1,50 @@
+"""
+    tests.test_exceptions
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test ConsenSys-Utils exceptions
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import time
+
+from consensys_utils.exceptions import PauseIteration, Backoff
+
+
+def test_pause_iteration():
+    # Timeout is converted into an absolute deadline
+    before = time.monotonic()
+    pause = PauseIteration(10)
+    assert pause.timeout == 10
+    assert before + 10 <= pause.deadline <= time.monotonic() + 10
+
+    # Deadline takes precedence over timeout
+    pause = PauseIteration(10, deadline=time.monotonic() + 1)
+    assert 0 < pause.timeout <= 1
+
+    # Past deadline
+    assert PauseIteration(deadline=time.monotonic() - 1).timeout == 0
+
+    # Condition only
+    pause = PauseIteration(condition=bool)
+    assert pause.timeout is None and pause.deadline is None
+    assert pause.condition is bool
+
+
+def test_backoff():
+    backoff = Backoff(initial=1, maximum=10, factor=3, jitter=0.2)
+
+    # Pause durations grow exponentially (with jitter) up to maximum
+    for expected in [1, 3, 9, 10, 10]:
+        pause = backoff.pause(condition=bool)
+        assert expected * 0.8 <= pause.timeout <= min(expected * 1.2, 10)
+        assert pause.backoff is backoff
+        assert pause.condition is bool
+
+    backoff.reset()
+    assert 0.8 <= backoff.next() <= 1.2
+
+    # Explicit timeout takes precedence over backoff
+    assert PauseIteration(5, backoff=backoff).timeout == 5
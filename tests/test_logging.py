@@ -8,11 +8,18 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import json
 import logging
+import os
+import socket
+import sys
+import threading
+import time
 
 import pytest
 
-from consensys_utils.logging import create_logger
+from consensys_utils.logging import JSONFormatter, LoggingQueue, QueueHandler, RateLimitFilter, SamplingFilter, \
+    create_logger, reset_request_id, set_request_id
 
 config = {
     'version': 1,
@@ -60,3 +67,228 @@ def test_id_filter(caplog, logger):
         logger.debug('Test Message', extra={'id': 'test-id'})
     assert caplog.records[0].id == '-'
     assert caplog.records[1].id == 'test-id'
+
+
+def test_id_filter_request_id(caplog, logger):
+    token = set_request_id('abcde')
+    try:
+        with caplog.at_level(logging.DEBUG, logger='test'):
+            logger.debug('Test Message')
+            logger.debug('Test Message', extra={'id': 'test-id'})
+
+            # Request ID is not shared with other threads
+            thread = threading.Thread(target=logger.debug, args=('Test Message',))
+            thread.start()
+            thread.join()
+    finally:
+        reset_request_id(token)
+
+    assert [record.id for record in caplog.records] == ['abcde', 'test-id', '-']
+
+
+class RecordingHandler(logging.Handler):
+    """Handler recording handled records and the thread handling them"""
+
+    def __init__(self, delay=0):
+        super().__init__()
+        self.delay = delay
+        self.records = []
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.records.append((record, threading.current_thread()))
+
+
+def test_create_logger_queue():
+    handler = RecordingHandler(delay=0.05)
+    queue_config = dict(config, LOGGING_QUEUE=True, LOGGING_QUEUE_SIZE=2)
+    queue_config['handlers'] = {'test': {'()': lambda: handler, 'level': 'DEBUG', 'filters': ['id']}}
+
+    try:
+        create_logger(queue_config)
+        logger = logging.getLogger('test')
+        assert isinstance(logger.handlers[0], QueueHandler)
+        assert logger.handlers[0].handler is handler
+
+        # Records are filtered on the logging thread and handled on the listener thread
+        start = time.perf_counter()
+        for i in range(4):
+            logger.debug('Message %s', i)
+        assert time.perf_counter() - start < 0.05
+
+        logging_queue = logger.handlers[0].queue
+        logging_queue.stop()
+        assert 2 <= len(handler.records) < 4
+        assert logging_queue.dropped == 4 - len(handler.records)
+        assert [record.getMessage() for record, _ in handler.records][:2] == ['Message 0', 'Message 1']
+        assert handler.records[0][0].id == '-'
+        assert handler.records[0][1] is not threading.current_thread()
+
+        # Once the queue is stopped records are handled on the logging thread
+        logger.debug('Message')
+        assert handler.records[-1][1] is threading.current_thread()
+
+        # Block policy never drops records
+        create_logger(dict(queue_config, LOGGING_QUEUE_POLICY='block'))
+        handler.records.clear()
+        for i in range(4):
+            logger.debug('Message %s', i)
+        logger.handlers[0].queue.stop()
+        assert len(handler.records) == 4
+    finally:
+        create_logger(config)
+
+
+def test_queue_handler_copies_record():
+    handler, other_handler = RecordingHandler(), RecordingHandler()
+    logger = logging.getLogger('test-queue-handler')
+    logger.handlers = [QueueHandler(LoggingQueue(), handler), other_handler]
+    logger.propagate = False
+
+    logger.warning('Message %s', 'arg')
+    logger.handlers[0].queue.stop()
+
+    assert handler.records[0][0].msg == 'Message arg'
+    assert (other_handler.records[0][0].msg, other_handler.records[0][0].args) == ('Message %s', ('arg',))
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='requires os.register_at_fork')
+def test_create_logger_fork():
+    handler = RecordingHandler()
+    queue_config = dict(config, LOGGING_QUEUE=True)
+    queue_config['handlers'] = {'test': {'()': lambda: handler, 'level': 'DEBUG'}}
+
+    try:
+        create_logger(queue_config)
+        formatter = JSONFormatter()
+        logging_queue = logging.getLogger('test').handlers[0].queue
+
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            # Child process has a formatter serializing its own process ID and its own listener thread
+            status = 1
+            try:
+                record = logging.makeLogRecord({'name': 'test', 'levelname': 'INFO'})
+                if json.loads(formatter.format(record))['pid'] == logging_queue.pid == os.getpid() and \
+                        logging_queue.listener._thread.is_alive():
+                    status = 0
+            finally:
+                os._exit(status)
+        assert os.waitpid(pid, 0)[1] == 0
+        assert formatter.pid == logging_queue.pid == os.getpid()
+    finally:
+        create_logger(config)
+
+
+def test_json_formatter():
+    formatter = JSONFormatter(app_name='test-app', fields=['path'], static_fields={'env': 'test'})
+    logger = logging.getLogger('test-json')
+
+    record = logger.makeRecord('test-json', logging.INFO, __file__, 1, 'Message "%s"', ('é',), None,
+                               extra={'id': 'abcde', 'path': '/my/path'})
+    data = json.loads(formatter.format(record))
+    assert data['message'] == 'Message "é"'
+    assert data['level'] == 'INFO'
+    assert data['logger'] == 'test-json'
+    assert data['id'] == 'abcde'
+    assert data['path'] == '/my/path'
+    assert data['time'].endswith('Z')
+    assert (data['app'], data['pid'], data['host'], data['env']) == ('test-app', os.getpid(), socket.gethostname(),
+                                                                     'test')
+
+    try:
+        raise ValueError('Error')
+    except ValueError:
+        record = logger.makeRecord('test-json', logging.ERROR, __file__, 1, 'Failed', (), sys.exc_info())
+    data = json.loads(formatter.format(record))
+    assert data['id'] == '-'
+    assert 'path' not in data
+    assert data['exc_info'].endswith('ValueError: Error')
+
+    formatter = JSONFormatter(datefmt='%Y')
+    assert json.loads(formatter.format(record))['time'] == time.strftime('%Y')
+
+
+def test_create_logger_json_formatter():
+    json_config = dict(config, formatters={'json': {'()': 'consensys_utils.logging.JSONFormatter'}})
+    json_config['handlers'] = {'test': dict(config['handlers']['test'], formatter='json')}
+
+    try:
+        create_logger(json_config, app_name='test-app')
+        formatter = logging.getLogger('test').handlers[0].formatter
+        assert isinstance(formatter, JSONFormatter)
+        assert formatter.app_name == 'test-app'
+        assert 'app_name' not in json_config['formatters']['json']
+    finally:
+        create_logger(config)
+
+
+def test_sampling_filter(caplog, logger):
+    sampling_filter = SamplingFilter(rate=3, summary_interval=0.05)
+    logger.handlers[0].addFilter(sampling_filter)
+    caplog.handler.addFilter(sampling_filter)
+
+    try:
+        with caplog.at_level(logging.DEBUG, logger='test'):
+            for i in range(6):
+                logger.info('Message %s', i)
+            logger.error('Error')
+            time.sleep(0.05)
+            logger.info('Message 6')
+    finally:
+        logger.handlers[0].removeFilter(sampling_filter)
+        caplog.handler.removeFilter(sampling_filter)
+
+    # Records are sampled once though filter is shared by handlers
+    assert [record.getMessage() for record in caplog.records] == [
+        'Message 0', 'Message 3', 'Error', 'Sampling suppressed 4 log records of level INFO', 'Message 6',
+    ]
+    assert caplog.records[3].levelno == logging.WARNING
+    assert caplog.records[3].suppressed == 4
+
+
+def test_rate_limit_filter(caplog, logger):
+    rate_limit_filter = RateLimitFilter(rate=20, burst=2, max_templates=2, summary_interval=0.05)
+    caplog.handler.addFilter(rate_limit_filter)
+
+    try:
+        with caplog.at_level(logging.DEBUG, logger='test'):
+            for i in range(4):
+                logger.error('Call failed. Error: %s', i)
+            logger.error('Other error')
+            time.sleep(0.06)
+            logger.error('Call failed. Error: %s', 4)
+    finally:
+        caplog.handler.removeFilter(rate_limit_filter)
+
+    # Records are limited per message template
+    assert [record.getMessage() for record in caplog.records] == [
+        'Call failed. Error: 0', 'Call failed. Error: 1', 'Other error',
+        "Rate limit suppressed 2 log records of message 'Call failed. Error: %s'", 'Call failed. Error: 4',
+    ]
+
+    # Least recently used buckets are dropped
+    rate_limit_filter.filter(logging.makeLogRecord({'msg': 'Third error'}))
+    assert list(rate_limit_filter.buckets) == ['Call failed. Error: %s', 'Third error']
+
+
+def test_create_logger_throttle():
+    handler = RecordingHandler()
+    throttle_config = dict(config, LOGGING_SAMPLING_RATE=2, LOGGING_RATE_LIMIT=0, LOGGING_RATE_LIMIT_BURST=1,
+                           LOGGING_QUEUE=True)
+    throttle_config['handlers'] = {'test': {'()': lambda: handler, 'level': 'DEBUG', 'filters': ['id']}}
+
+    try:
+        create_logger(throttle_config)
+        logger = logging.getLogger('test')
+        for i in range(4):
+            logger.debug('Message %s', i)
+        logger.error('Error')
+        logger.error('Error')
+        logger.handlers[0].queue.stop()
+
+        # Records are suppressed before they are queued
+        assert [record.getMessage() for record, _ in handler.records] == ['Message 0', 'Error']
+        assert [type(_filter) for _filter in logger.handlers[0].filters][1:] == [SamplingFilter, RateLimitFilter]
+    finally:
+        create_logger(config)
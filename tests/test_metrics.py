@@ -0,0 +1,92 @@
+"""
+    tests.test_metrics
+    ~~~~~~~~~~~~~~~~~~
+
+    Test iteration metrics
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import socket
+
+import pytest
+
+from consensys_utils.metrics import Histogram, IterationMetrics, StatsdClient
+
+
+def test_histogram():
+    histogram = Histogram(precision=5)
+    assert histogram.percentile(99) == 0
+
+    for value in [0, 1, 31, 32, 33, 1000, 10 ** 6, 10 ** 9]:
+        histogram.record(value)
+        # Value is counted in a bucket whose highest value is within the precision of the histogram
+        index = histogram.index(value)
+        assert value <= histogram.highest_value(index) <= value * (1 + 2 ** -5)
+
+    histogram.record(-1)
+    assert histogram.min == 0
+    assert histogram.max == 10 ** 9
+    assert histogram.count == 9
+
+
+def test_histogram_percentile():
+    histogram = Histogram()
+    histogram.record(63, count=99)
+    histogram.record(10000)
+
+    assert histogram.percentile(50) == 63
+    assert histogram.percentile(99) == 63
+    assert 10000 <= histogram.percentile(100) < 10000 * (1 + 2 ** -5)
+    assert histogram.to_dict()['mean'] == pytest.approx(162.37)
+
+
+def test_iteration_metrics():
+    metrics = IterationMetrics()
+    metrics.record_steps(0, 0.001)
+    metrics.record_steps(4, 0.004)
+    metrics.record_request(0.002)
+    metrics.record_pause(0.5)
+    metrics.record_error(ValueError())
+    metrics.record_error(ValueError())
+
+    values = metrics.to_dict()
+    assert values['steps'] == 4
+    assert values['iteration_time'] == pytest.approx(0.004)
+    assert values['step_latency']['count'] == 4
+    assert 1000 <= values['step_latency']['p50'] < 1000 * (1 + 2 ** -5)
+    assert values['requests'] == 1
+    assert values['pauses'] == 1
+    assert values['pause_time'] == 0.5
+    assert values['errors'] == {'ValueError': 2}
+    assert values['pause_ratio'] > 0
+
+
+def test_statsd_client():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(1)
+
+    client = StatsdClient('127.0.0.1:%s' % server.getsockname()[1], prefix='test')
+
+    metrics = IterationMetrics()
+    metrics.record_steps(3, 0.003)
+    metrics.record_error(ValueError())
+
+    client.push(metrics)
+    lines = server.recv(65536).decode().split('\n')
+    assert 'test.iteration.steps:3|c' in lines
+    assert 'test.iteration.errors.ValueError:1|c' in lines
+    assert 'test.iteration.iteration_time:3|c' in lines
+    assert 'test.iteration.step_latency.p99:1.0|ms' in lines
+
+    # Counters are pushed by their variation since last push
+    metrics.record_steps(2, 0.002)
+    client.push(metrics)
+    lines = server.recv(65536).decode().split('\n')
+    assert 'test.iteration.steps:2|c' in lines
+    assert not [line for line in lines if line.startswith('test.iteration.errors')]
+
+    client.close()
+    server.close()
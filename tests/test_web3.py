@@ -8,10 +8,16 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
 import pytest
-from web3 import HTTPProvider, WebsocketProvider, EthereumTesterProvider, IPCProvider
+from web3 import HTTPProvider, EthereumTesterProvider
 
-from consensys_utils.web3 import create_provider
+from consensys_utils.web3 import BatchHTTPProvider, PooledHTTPProvider, create_provider
+from consensys_utils.web3.connection import PersistentIPCProvider, PersistentWebsocketProvider
 
 
 def test_create_provider():
@@ -22,10 +28,199 @@ def test_create_provider():
     assert isinstance(http_provider, HTTPProvider)
 
     ws_provider = create_provider({'ETHEREUM_PROVIDER': 'ws', 'ETHEREUM_ENDPOINT_URI': 'ws:localhost:8545'})
-    assert isinstance(ws_provider, WebsocketProvider)
+    assert isinstance(ws_provider, PersistentWebsocketProvider)
 
     ipc_provider = create_provider({'ETHEREUM_PROVIDER': 'ipc', 'ETHEREUM_IPC_PATH': '/path/to/ipc'})
-    assert isinstance(ipc_provider, IPCProvider)
+    assert isinstance(ipc_provider, PersistentIPCProvider)
 
     with pytest.raises(Exception):
         create_provider({'ETHEREUM_PROVIDER': 'unknown'})
+
+
+def test_create_provider_request_id():
+    get_request_id = MagicMock(return_value='abcde1234')
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URI': 'http://localhost:8545',
+        'ETHEREUM_OPTS': {'request_kwargs': {'timeout': 5}},
+        'ETHEREUM_REQUEST_ID_HEADER': 'X-Request-ID',
+        'ETHEREUM_REQUEST_ID_PREFIX': True,
+    }, get_request_id=get_request_id)
+    assert isinstance(provider, HTTPProvider)
+
+    # Request ID is forwarded in headers and JSON-RPC id
+    kwargs = provider.get_request_kwargs()
+    assert kwargs['timeout'] == 5
+    assert kwargs['headers']['X-Request-ID'] == 'abcde1234'
+    assert 'Content-Type' in kwargs['headers']
+    assert json.loads(provider.encode_rpc_request('eth_blockNumber', []).decode())['id'] == 'abcde1234-0'
+
+    # Nothing is forwarded when not serving a request
+    get_request_id.return_value = None
+    assert 'X-Request-ID' not in provider.get_request_kwargs()['headers']
+    assert json.loads(provider.encode_rpc_request('eth_blockNumber', []).decode())['id'] == 1
+
+    ipc_provider = create_provider({
+        'ETHEREUM_PROVIDER': 'ipc',
+        'ETHEREUM_IPC_PATH': '/path/to/ipc',
+        'ETHEREUM_REQUEST_ID_PREFIX': True,
+    }, get_request_id=lambda: 'abcde1234')
+    assert isinstance(ipc_provider, PersistentIPCProvider)
+    assert json.loads(ipc_provider.encode_rpc_request('eth_blockNumber', []).decode())['id'] == 'abcde1234-0'
+
+    ws_provider = create_provider({
+        'ETHEREUM_PROVIDER': 'ws',
+        'ETHEREUM_ENDPOINT_URI': 'ws:localhost:8545',
+        'ETHEREUM_REQUEST_ID_HEADER': 'X-Request-ID',
+    })
+    assert isinstance(ws_provider, PersistentWebsocketProvider)
+    assert json.loads(ws_provider.encode_rpc_request('eth_blockNumber', []).decode())['id'] == 0
+
+
+def test_pooled_http_provider(rpc_server):
+    rpc_server.results['eth_blockNumber'] = '0x10'
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+        'ETHEREUM_POOL_SIZE': 2,
+        'ETHEREUM_CONNECT_TIMEOUT': 1,
+        'ETHEREUM_READ_TIMEOUT': 5,
+    })
+    assert isinstance(provider, PooledHTTPProvider)
+    assert provider.timeout == (1, 5)
+
+    # Connection is kept alive between requests
+    for _ in range(3):
+        assert provider.make_request('eth_blockNumber', [])['result'] == '0x10'
+    assert rpc_server.connections == 1
+    assert provider.session.get_adapter(rpc_server.endpoint_uri)._pool_maxsize == 2
+
+    # A new session is created in a forked process
+    session = provider.session
+    provider._session_pid = -1
+    assert provider.session is not session
+    session.close()
+
+    # Connection is closed after each request when keep-alive is disabled
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+        'ETHEREUM_KEEP_ALIVE': False,
+    })
+    for _ in range(2):
+        provider.make_request('eth_blockNumber', [])
+    assert rpc_server.connections == 3
+    assert rpc_server.headers[-1]['Connection'] == 'close'
+    provider.session.close()
+
+
+def test_batch_http_provider(rpc_server):
+    rpc_server.results['eth_blockNumber'] = '0x10'
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http-batch',
+        'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+        'ETHEREUM_REQUEST_ID_PREFIX': True,
+    }, get_request_id=lambda: 'abcde1234')
+    assert isinstance(provider, BatchHTTPProvider)
+
+    # Requests are not batched outside of an explicit batch
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x10'
+    assert rpc_server.batches == []
+
+    # Explicit batch is sent in a single HTTP request
+    with provider.batch() as batch:
+        balances = [batch.add('eth_getBalance', ['0x%040x' % i, 'latest']) for i in range(3)]
+        block_number = batch.add('eth_blockNumber')
+        with pytest.raises(RuntimeError):
+            block_number.result
+
+    assert len(rpc_server.batches) == 1
+    assert [balance.result for balance in balances] == [['0x%040x' % i, 'latest'] for i in range(3)]
+    assert block_number.result == '0x10'
+    assert [request['id'] for request in rpc_server.batches[0]] == ['abcde1234-%s' % i for i in range(1, 5)]
+    assert len(rpc_server.headers) == 2
+
+    # Empty batch is not sent
+    with provider.batch():
+        pass
+    assert len(rpc_server.headers) == 2
+
+    provider.session.close()
+
+
+def test_batch_http_provider_errors():
+    provider = BatchHTTPProvider('http://localhost:8545')
+
+    provider.post = MagicMock(return_value=json.dumps([
+        {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32601, 'message': 'Method not found'}},
+    ]).encode())
+    with provider.batch() as batch:
+        unknown = batch.add('eth_unknown')
+        missing = batch.add('eth_blockNumber')
+
+    with pytest.raises(ValueError):
+        unknown.result
+    with pytest.raises(ValueError):
+        missing.result
+
+    provider.post.side_effect = ConnectionError()
+    with provider.batch() as batch:
+        request = batch.add('eth_blockNumber')
+    with pytest.raises(ConnectionError):
+        request.result
+
+
+def test_batch_http_provider_window(rpc_server):
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http-batch',
+        'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+        'ETHEREUM_BATCH_WINDOW_MS': 5000,
+        'ETHEREUM_BATCH_MAX_SIZE': 4,
+    })
+
+    # Request made while no other request is being sent is sent at once
+    start = time.monotonic()
+    assert provider.make_request('eth_blockNumber', [])['result'] == []
+    assert time.monotonic() - start < 1
+    assert len(rpc_server.requests) == 1 and len(rpc_server.batches) == 0
+
+    # Requests overlapping a request being sent are coalesced (batch is sent as soon as it reaches its maximum size)
+    rpc_server.delay = 0.1
+    responses = {}
+
+    def make_request(i):
+        responses[i] = provider.make_request('eth_getBalance', ['0x%040x' % i, 'latest'])
+
+    threads = [threading.Thread(target=make_request, args=(i,)) for i in range(5)]
+    start = time.monotonic()
+    threads[0].start()
+    while not len(rpc_server.headers) == 2:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - start < 5
+    assert len(rpc_server.batches) == 1 and len(rpc_server.batches[0]) == 4
+    assert {i: response['result'] for i, response in responses.items()} == \
+        {i: ['0x%040x' % i, 'latest'] for i in range(5)}
+
+    # Batch waits for the window to be over (simulating a request being sent)
+    rpc_server.delay = 0
+    provider.batch_window = 0.01
+    provider.in_flight = 1
+    assert provider.make_request('eth_blockNumber', [])['result'] == []
+    assert len(rpc_server.batches) == 2
+
+    provider.post = MagicMock(side_effect=ConnectionError())
+    with pytest.raises(ConnectionError):
+        provider.make_request('eth_blockNumber', [])
+    assert provider.in_flight == 1
+
+    provider.in_flight = 0
+    with pytest.raises(ConnectionError):
+        provider.make_request('eth_blockNumber', [])
+    assert provider.in_flight == 0
+
+    provider.session.close()
@@ -0,0 +1,128 @@
+"""
+    tests.test_wsgi
+    ~~~~~~~~~~~~~~~
+
+    Test WSGI resources
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import gc
+import os
+import re
+import time
+import weakref
+from unittest.mock import MagicMock
+
+import pytest
+
+from consensys_utils.logging import get_request_id
+from consensys_utils.wsgi import RequestIDMiddleware, create_request_id_generator
+
+
+def decode_crockford_base32(value):
+    return int(''.join(format('0123456789ABCDEFGHJKMNPQRSTVWXYZ'.index(c), '05b') for c in value), 2)
+
+
+def test_request_id_generators():
+    generate = create_request_id_generator('uuid4')
+    assert re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[0-9a-f]{4}-[0-9a-f]{12}$', generate())
+
+    generate = create_request_id_generator('hex64')
+    assert re.match(r'^[0-9a-f]{16}$', generate())
+    assert generate() != generate()
+
+    generate = create_request_id_generator('ulid')
+    first = generate()
+    time.sleep(0.002)
+    second = generate()
+    assert re.match(r'^[0-7][0-9A-HJKMNP-TV-Z]{25}$', first)
+    assert first < second
+
+    generate = create_request_id_generator('counter')
+    first, second = generate(), generate()
+    assert re.match(r'^[0-9a-f]{12}-1$', first)
+    assert second == first[:-1] + '2'
+    generate.reset()
+    assert generate()[:-1] != first[:-1]
+
+    generate = create_request_id_generator('snowflake')
+    first = generate()
+    second = generate()
+    time.sleep(0.005)
+    third = generate()
+    assert re.match(r'^[0-9A-HJKMNP-TV-Z]{16}$', first)
+    assert first < second < third
+    first, second, third = map(decode_crockford_base32, (first, second, third))
+    assert first >> 38 <= second >> 38 <= (third >> 38) - 4
+    assert first >> 16 & 0x3fffff == os.getpid() & 0x3fffff
+    assert second & 0xffff == (first & 0xffff) + 1
+
+    with pytest.raises(RuntimeError):
+        create_request_id_generator('unknown')
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='requires os.register_at_fork')
+def test_request_id_generators_fork():
+    generate = create_request_id_generator('counter')
+    first = generate()
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        # Child process generates IDs with its own prefix
+        status = 1
+        try:
+            prefix, counter = generate().rsplit('-', 1)
+            if prefix != first[:-2] and counter == '1':
+                status = 0
+        finally:
+            os._exit(status)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    # Generators are not kept alive by fork hooks
+    reference = weakref.ref(generate)
+    del generate
+    gc.collect()
+    assert reference() is None
+
+
+def test_request_id_middleware():
+    wsgi = MagicMock()
+    start_response = MagicMock()
+    middleware = RequestIDMiddleware(wsgi, {
+        'REQUEST_ID_HEADER': 'X-Request-ID',
+        'REQUEST_ID_GENERATOR': 'counter',
+        'REQUEST_ID_PATTERN': r'[\w\-]{1,16}',
+    })
+    middleware.generate_request_id = MagicMock(return_value='generated')
+
+    # Request ID is set in context while the application handles the request
+    wsgi.side_effect = lambda environ, start_response: [get_request_id()]
+    assert middleware({}, start_response) == ['generated']
+    assert get_request_id() is None
+    wsgi.side_effect = None
+
+    # Request ID is generated if missing
+    environ = {}
+    middleware(environ, start_response)
+    assert environ == {'HTTP_X_REQUEST_ID': 'generated'}
+    wsgi.call_args[0][1]('200 OK', [])
+    start_response.assert_called_once_with('200 OK', [('X-Request-ID', 'generated')], None)
+
+    # Request ID is not generated if provided
+    middleware.generate_request_id.reset_mock()
+    start_response.reset_mock()
+    environ = {'HTTP_X_REQUEST_ID': 'abcde1234'}
+    middleware(environ, start_response)
+    middleware.generate_request_id.assert_not_called()
+    wsgi.call_args[0][1]('200 OK', [])
+    start_response.assert_called_once_with('200 OK', [('X-Request-ID', 'abcde1234')], None)
+
+    # Request ID is generated if provided request ID is invalid
+    for invalid_request_id in ['', 'abcde1234\nfake log', 'a' * 17]:
+        middleware.generate_request_id.reset_mock()
+        environ = {'HTTP_X_REQUEST_ID': invalid_request_id}
+        middleware(environ, start_response)
+        middleware.generate_request_id.assert_called_once_with()
+        assert environ == {'HTTP_X_REQUEST_ID': 'generated'}
@@ -0,0 +1,150 @@
+"""
+    tests.web3.test_aio
+    ~~~~~~~~~~~~~~~~~~~
+
+    Test asynchronous providers
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import asyncio
+import json
+import os
+import time
+from unittest import mock
+
+import pytest
+import websockets
+
+from consensys_utils.web3 import PooledHTTPProvider
+from consensys_utils.web3.aio import AsyncHTTPProvider, AsyncIPCProvider, AsyncWebsocketProvider, \
+    create_async_provider, event_loop_thread
+
+
+@pytest.fixture(scope='function')
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_event_loop_thread():
+    async def get_pid():
+        await asyncio.sleep(0)
+        return os.getpid()
+
+    assert event_loop_thread.run(get_pid(), timeout=1) == os.getpid()
+    assert event_loop_thread.loop is event_loop_thread.loop
+
+
+def test_async_http_provider(rpc_server, loop):
+    rpc_server.delay = 0.1
+    rpc_server.results['eth_blockNumber'] = '0x10'
+    provider = AsyncHTTPProvider(PooledHTTPProvider(rpc_server.endpoint_uri, pool_size=10))
+
+    # Requests are sent concurrently
+    start = time.perf_counter()
+    results = loop.run_until_complete(provider.gather([('eth_blockNumber', [])] + [('eth_getBalance', [i])
+                                                                                   for i in range(9)]))
+    assert time.perf_counter() - start < 0.5
+    assert results == ['0x10'] + [[i] for i in range(9)]
+    assert len(rpc_server.requests) == 10
+
+    loop.run_until_complete(provider.close())
+
+
+def test_async_websocket_provider(loop):
+    async def handler(websocket, path):
+        # Answer requests by pairs in reverse order
+        while True:
+            requests = [json.loads(await websocket.recv()) for _ in range(2)]
+            for request in reversed(requests):
+                if request['method'] == 'eth_fail':
+                    response = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -1, 'message': 'failed'}}
+                else:
+                    response = {'jsonrpc': '2.0', 'id': request['id'], 'result': request['params']}
+                await websocket.send(json.dumps(response))
+
+    server = loop.run_until_complete(websockets.serve(handler, '127.0.0.1', 0, loop=loop))
+    endpoint_uri = 'ws://127.0.0.1:%s' % server.sockets[0].getsockname()[1]
+    provider = create_async_provider({'ETHEREUM_PROVIDER': 'ws', 'ETHEREUM_ENDPOINT_URI': endpoint_uri})
+    assert isinstance(provider, AsyncWebsocketProvider)
+
+    async def run():
+        assert await provider.gather([('eth_getBalance', [1]), ('eth_getBalance', [2])]) == [[1], [2]]
+        connection = provider.connection
+
+        # Connection is reused and errors are raised
+        with pytest.raises(ValueError):
+            await provider.gather([('eth_getBalance', [3]), ('eth_fail', [])])
+        assert provider.connection is connection
+
+        await provider.close()
+
+    try:
+        loop.run_until_complete(run())
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+
+
+def test_async_ipc_provider(loop, tmpdir):
+    ipc_path = str(tmpdir.join('geth.ipc'))
+    connections = []
+
+    async def handler(reader, writer):
+        connections.append(writer)
+        decoder, buffer = json.JSONDecoder(), ''
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            buffer += data.decode()
+            while buffer:
+                try:
+                    request, end = decoder.raw_decode(buffer)
+                except ValueError:
+                    break
+                buffer = buffer[end:]
+                response = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': 'é' * 3}).encode()
+                # Responses are split across writes (in the middle of a multi-bytes character)
+                for i in range(0, len(response), 7):
+                    writer.write(response[i:i + 7])
+                    await writer.drain()
+                    await asyncio.sleep(0.001)
+        writer.close()
+
+    server = loop.run_until_complete(asyncio.start_unix_server(handler, ipc_path, loop=loop))
+
+    # Node default IPC path is used when no path is configured
+    with mock.patch('web3.providers.ipc.get_default_ipc_path', return_value=ipc_path):
+        provider = create_async_provider({'ETHEREUM_PROVIDER': 'ipc'})
+    assert isinstance(provider, AsyncIPCProvider)
+    assert provider.ipc_path == ipc_path
+
+    async def run():
+        assert await provider.gather([('eth_blockNumber', [])] * 5) == ['ééé'] * 5
+
+        # Connection is opened again after being lost
+        connections[0].close()
+        await asyncio.sleep(0.05)
+        assert provider.connection is None
+        assert await provider.request('eth_blockNumber') == 'ééé'
+        assert len(connections) == 2
+
+        await provider.close()
+
+    try:
+        loop.run_until_complete(run())
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+
+
+def test_create_async_provider(rpc_server):
+    provider = create_async_provider({'ETHEREUM_PROVIDER': 'http', 'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+                                      'ETHEREUM_POOL_SIZE': 4})
+    assert isinstance(provider, AsyncHTTPProvider)
+    assert isinstance(provider.provider, PooledHTTPProvider)
+    assert provider.max_workers == 4
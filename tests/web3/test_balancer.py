@@ -0,0 +1,191 @@
+"""
+    tests.web3.test_balancer
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test multi-endpoint provider
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from consensys_utils.web3 import create_provider
+from consensys_utils.web3.balancer import CircuitBreaker, Endpoint, LatencyTracker, MultiEndpointProvider
+
+
+def test_latency_tracker():
+    tracker = LatencyTracker(decay=0.01)
+
+    # Average jumps to higher samples
+    tracker.record(0.5)
+    assert tracker.latency == 0.5
+
+    # Average decays towards lower samples
+    time.sleep(0.01)
+    tracker.record(0.1)
+    assert 0.1 < tracker.latency < 0.5
+
+    # Average decays when read
+    time.sleep(0.01)
+    assert tracker.current() < tracker.latency
+
+    # Samples are compared to the decayed average
+    tracker = LatencyTracker(decay=10)
+    tracker.latency, tracker.updated_at = 1., time.monotonic() - 10
+    tracker.record(0.5)
+    assert tracker.latency == 0.5
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    # Breaker opens after consecutive failures
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    # A single trial is allowed after recovery timeout
+    assert not breaker.ready()
+    time.sleep(0.05)
+    assert breaker.ready() and breaker.ready()
+    assert breaker.allow()
+    assert not breaker.ready()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_multi_endpoint_provider(rpc_server_factory):
+    servers = [rpc_server_factory() for _ in range(3)]
+    for i, server in enumerate(servers):
+        server.results['web3_clientVersion'] = 'node-%s' % i
+    servers[0].delay = 0.1
+
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URIS': [server.endpoint_uri for server in servers[:2]],
+        'ETHEREUM_ARCHIVE_ENDPOINT_URIS': [servers[2].endpoint_uri],
+        'ETHEREUM_FAILURE_THRESHOLD': 1,
+        'ETHEREUM_RECOVERY_TIMEOUT': 60,
+    })
+    assert isinstance(provider, MultiEndpointProvider)
+    assert [endpoint.archive for endpoint in provider.endpoints] == [False, False, True]
+
+    # Calls are routed to lowest latency nodes
+    for _ in range(10):
+        provider.make_request('web3_clientVersion', [])
+    assert len(servers[0].requests) == 1
+    assert len(servers[1].requests) + len(servers[2].requests) == 9
+
+    # Archive methods are routed to archive nodes
+    assert provider.make_request('debug_traceTransaction', ['0x1'])['result'] == ['0x1']
+    assert servers[2].requests[-1]['method'] == 'debug_traceTransaction'
+
+    # Failing nodes are ejected and calls fail over to other nodes
+    provider.endpoints[0].latency.latency = 10
+    servers[1].status = 500
+    servers[2].status = 500
+    assert provider.make_request('web3_clientVersion', [])['result'] == 'node-0'
+    assert [endpoint.breaker.is_open for endpoint in provider.endpoints] == [False, True, True]
+
+    requests_count = len(servers[1].requests)
+    provider.make_request('web3_clientVersion', [])
+    assert len(servers[1].requests) == requests_count
+
+    # Ejected nodes are still tried when every node has been ejected
+    servers[0].status = 500
+    with pytest.raises(requests.HTTPError):
+        provider.make_request('web3_clientVersion', [])
+    servers[1].status = 200
+    assert provider.make_request('web3_clientVersion', [])['result'] == 'node-1'
+
+    assert provider.to_dict()['endpoints'][1]['requests'] == len(servers[1].headers)
+    assert provider.isConnected()
+
+    for endpoint in provider.endpoints:
+        endpoint.provider.session.close()
+
+
+def test_multi_endpoint_provider_least_loaded():
+    endpoints = [Endpoint(MagicMock()) for _ in range(2)]
+    for endpoint in endpoints:
+        endpoint.latency.record(0.01)
+    endpoints[0].in_flight = 2
+
+    provider = MultiEndpointProvider(endpoints)
+    assert provider.select('eth_blockNumber') == [endpoints[1], endpoints[0]]
+
+    # Archive methods are routed to every node if there is no archive node
+    assert len(provider.select('trace_block')) == 2
+
+
+def test_multi_endpoint_provider_slow_sample_decays():
+    endpoints = [Endpoint(MagicMock()) for _ in range(2)]
+    for endpoint in endpoints:
+        endpoint.latency = LatencyTracker(decay=0.05)
+    provider = MultiEndpointProvider(endpoints)
+
+    # Node is avoided after a slow sample
+    endpoints[0].latency.record(0.01)
+    endpoints[1].latency.record(0.2)
+    assert provider.select('eth_blockNumber')[0] is endpoints[0]
+
+    # Node is tried again once its latency has decayed
+    time.sleep(0.2)
+    endpoints[0].latency.record(0.01)
+    assert provider.select('eth_blockNumber')[0] is endpoints[1]
+
+
+def test_multi_endpoint_provider_trial_call():
+    endpoints = [Endpoint(MagicMock(), breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=0))
+                 for _ in range(2)]
+    endpoints[0].provider.make_request.return_value = {'result': '0x1'}
+    endpoints[1].latency.latency = 10
+    provider = MultiEndpointProvider(endpoints)
+
+    # Selecting an ejected node does not consume its trial call unless it is tried
+    endpoints[1].breaker.record_failure()
+    endpoints[1].breaker.recovery_timeout = 60
+    endpoints[1].breaker.opened_at = time.monotonic() - 60
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x1'
+    assert not endpoints[1].provider.make_request.called
+    assert endpoints[1].breaker.ready()
+
+    endpoints[0].provider.make_request.side_effect = ConnectionError()
+    endpoints[1].provider.make_request.return_value = {'result': '0x2'}
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x2'
+    assert not endpoints[1].breaker.is_open
+
+
+def test_multi_endpoint_provider_non_idempotent():
+    endpoints = [Endpoint(MagicMock(), breaker=CircuitBreaker(failure_threshold=10)) for _ in range(2)]
+    provider = MultiEndpointProvider(endpoints)
+    endpoints[1].provider.make_request.return_value = {'result': '0x1'}
+
+    # Non idempotent calls are not retried when they may have been sent
+    endpoints[0].provider.make_request.side_effect = requests.ReadTimeout()
+    with pytest.raises(requests.ReadTimeout):
+        provider.make_request('eth_sendTransaction', [{}])
+    endpoints[1].provider.make_request.assert_not_called()
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x1'
+
+    # Non idempotent calls are retried when connection could not be established
+    endpoints[1].provider.make_request.reset_mock()
+    endpoints[0].provider.make_request.side_effect = requests.ConnectTimeout()
+    assert provider.make_request('eth_sendTransaction', [{}])['result'] == '0x1'
+    endpoints[0].provider.make_request.side_effect = ConnectionRefusedError()
+    assert provider.make_request('eth_sendRawTransaction', ['0x']) == {'result': '0x1'}
+    assert endpoints[0].provider.make_request.call_count == 4
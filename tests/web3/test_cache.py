@@ -0,0 +1,197 @@
+"""
+    tests.web3.test_cache
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test JSON-RPC response cache
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from consensys_utils.web3 import create_provider
+from consensys_utils.web3.cache import MemoryCacheStore, ResponseCache, SQLiteCacheStore, create_response_cache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmpdir):
+    if request.param == 'memory':
+        yield MemoryCacheStore(max_size=2)
+    else:
+        yield SQLiteCacheStore(os.path.join(str(tmpdir), 'cache.db'), max_size=2)
+
+
+def test_cache_store(store):
+    assert store.get('a') is None
+
+    store.set('a', {'result': 'a'})
+    store.set('b', {'result': 'b'})
+    assert store.get('a') == {'result': 'a'}
+
+    # Store is bounded
+    store.set('c', {'result': 'c'})
+    assert store.get('c') == {'result': 'c'}
+    assert len([key for key in 'abc' if store.get(key) is not None]) == 2
+
+    # Responses expire
+    store.set('d', {'result': 'd'}, ttl=0)
+    assert store.get('d') is None
+
+
+def test_memory_cache_store_lru():
+    store = MemoryCacheStore(max_size=2)
+    store.set('a', {'result': 'a'})
+    store.set('b', {'result': 'b'})
+    store.get('a')
+    store.set('c', {'result': 'c'})
+
+    assert store.get('a') == {'result': 'a'}
+    assert store.get('b') is None
+
+
+def test_sqlite_cache_store_shared(tmpdir):
+    path = os.path.join(str(tmpdir), 'cache.db')
+    SQLiteCacheStore(path).set('a', {'result': 'a'})
+    assert SQLiteCacheStore(path).get('a') == {'result': 'a'}
+
+
+def test_response_cache_key():
+    cache = ResponseCache(MemoryCacheStore())
+
+    assert cache.key('eth_chainId', []) is not None
+    assert cache.key('eth_chainId', None) == cache.key('eth_chainId', [])
+    assert cache.key('eth_getBlockByNumber', ['0x10', False]) is not None
+    assert cache.key('eth_getBlockByNumber', ['0x10', False]) != cache.key('eth_getBlockByNumber', ['0x10', True])
+    assert cache.key('eth_getBlockByNumber', ['earliest', False]) is not None
+    assert cache.key('eth_getBalance', ['0x%040x' % 1, 16]) is not None
+
+    # Calls on mutable blocks or not cacheable methods are not cached
+    assert cache.key('eth_getBlockByNumber', ['latest', False]) is None
+    assert cache.key('eth_getBalance', ['0x%040x' % 1, 'pending']) is None
+    assert cache.key('eth_call', [{'to': '0x%040x' % 1}]) is None
+    assert cache.key('eth_blockNumber', []) is None
+    assert cache.key('eth_getTransactionReceipt', [object()]) is None
+
+
+def test_response_cache_middleware():
+    store = MemoryCacheStore()
+    store.set = MagicMock(wraps=store.set)
+    cache = ResponseCache(store, ttl=60, head_refresh_interval=60)
+    cache.set_head('0x100')
+    make_request = MagicMock(side_effect=lambda method, params: {'jsonrpc': '2.0', 'id': 0, 'result': params})
+    middleware = cache.middleware(make_request, None)
+
+    # Responses of immutable calls are cached
+    assert middleware('eth_getBlockByHash', ['0x1', False]) == {'jsonrpc': '2.0', 'id': 0, 'result': ['0x1', False]}
+    assert middleware('eth_getBlockByHash', ['0x1', False]) == {'jsonrpc': '2.0', 'id': 0, 'result': ['0x1', False]}
+    assert make_request.call_count == 1
+    assert store.set.call_args[0][2] is None
+
+    # Responses depending on block number expire
+    middleware('eth_getBlockByNumber', ['0x1', False])
+    assert store.set.call_args[0][2] == 60
+
+    # Calls on latest block are not cached
+    middleware('eth_getBlockByNumber', ['latest', False])
+    middleware('eth_getBlockByNumber', ['latest', False])
+    assert make_request.call_count == 4
+
+    # Errors, null results and pending transactions are not cached
+    make_request.side_effect = [
+        {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': 'error'}},
+        {'jsonrpc': '2.0', 'id': 0, 'result': None},
+        {'jsonrpc': '2.0', 'id': 0, 'result': {'hash': '0x2', 'blockNumber': None}},
+        {'jsonrpc': '2.0', 'id': 0, 'result': {'hash': '0x2', 'blockNumber': '0x1'}},
+    ]
+    middleware('eth_getTransactionReceipt', ['0x2'])
+    middleware('eth_getTransactionReceipt', ['0x2'])
+    middleware('eth_getTransactionByHash', ['0x2'])
+    middleware('eth_getTransactionByHash', ['0x2'])
+    middleware('eth_getTransactionByHash', ['0x2'])
+    assert make_request.call_count == 8
+    assert len(store.entries) == 3
+
+    assert cache.to_dict() == {
+        'hits': 2,
+        'misses': 6,
+        'methods': {
+            'eth_getBlockByHash': {'hits': 1, 'misses': 1},
+            'eth_getBlockByNumber': {'hits': 0, 'misses': 1},
+            'eth_getTransactionReceipt': {'hits': 0, 'misses': 2},
+            'eth_getTransactionByHash': {'hits': 1, 'misses': 2},
+        },
+    }
+
+
+def test_response_cache_confirmations():
+    store = MemoryCacheStore()
+    cache = ResponseCache(store, confirmations=12, head_refresh_interval=60)
+    head = {'number': 0x100}
+
+    def make_request(method, params):
+        if method == 'eth_blockNumber':
+            return {'jsonrpc': '2.0', 'id': 0, 'result': hex(head['number'])}
+        if method == 'eth_getTransactionReceipt':
+            return {'jsonrpc': '2.0', 'id': 0, 'result': {'blockNumber': params[0]}}
+        return {'jsonrpc': '2.0', 'id': 0, 'result': {'number': params[0]}}
+
+    make_request = MagicMock(side_effect=make_request)
+    middleware = cache.middleware(make_request, None)
+
+    # Chain head is requested once to check confirmations
+    middleware('eth_getBlockByNumber', ['0xf4', False])
+    assert make_request.call_args_list[-1][0] == ('eth_blockNumber', [])
+    assert cache.head == 0x100
+    middleware('eth_getBlockByNumber', ['0xf4', False])
+    assert make_request.call_count == 2
+
+    # Responses of recent blocks and transactions are not cached
+    for _ in range(2):
+        middleware('eth_getBlockByNumber', ['0xff', False])
+        middleware('eth_getTransactionReceipt', ['0xf5'])
+    assert make_request.call_count == 6
+    assert len(store.entries) == 1
+
+    # Chain head is updated from eth_blockNumber responses
+    head['number'] = 0x10b
+    middleware('eth_blockNumber', [])
+    middleware('eth_getBlockByNumber', ['0xff', False])
+    middleware('eth_getBlockByNumber', ['0xff', False])
+    assert make_request.call_count == 8
+    assert len(store.entries) == 2
+
+
+def test_create_response_cache(tmpdir, rpc_server):
+    assert create_response_cache({}) is None
+    assert isinstance(create_response_cache({'ETHEREUM_CACHE_STORE': 'memory'}).store, MemoryCacheStore)
+
+    cache = create_response_cache({
+        'ETHEREUM_CACHE_STORE': 'sqlite',
+        'ETHEREUM_CACHE_PATH': os.path.join(str(tmpdir), 'cache.db'),
+        'ETHEREUM_CACHE_TTL': 10,
+        'ETHEREUM_CACHE_CONFIRMATIONS': 6,
+    })
+    assert isinstance(cache.store, SQLiteCacheStore)
+    assert (cache.ttl, cache.confirmations) == (10, 6)
+
+    with pytest.raises(RuntimeError):
+        create_response_cache({'ETHEREUM_CACHE_STORE': 'unknown'})
+
+    # Cache is set as provider middleware
+    rpc_server.results['eth_chainId'] = '0x1'
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'http',
+        'ETHEREUM_ENDPOINT_URI': rpc_server.endpoint_uri,
+        'ETHEREUM_CACHE_STORE': 'memory',
+    })
+    request = provider.request_func(MagicMock(), [])
+    assert request('eth_chainId', [])['result'] == '0x1'
+    assert request('eth_chainId', [])['result'] == '0x1'
+    assert len(rpc_server.requests) == 1
+    assert provider.cache.to_dict()['hits'] == 1
+
+    provider.session.close()
@@ -0,0 +1,39 @@
+"""
+    tests.web3.test_compat
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Test access to web3.py provider internals
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from types import SimpleNamespace
+
+from web3 import HTTPProvider
+
+from consensys_utils.web3.compat import get_request_kwargs, is_connected, next_rpc_id
+
+
+def test_is_connected():
+    assert is_connected(SimpleNamespace(isConnected=lambda: True))
+    assert not is_connected(SimpleNamespace(is_connected=lambda: False, isConnected=lambda: True))
+
+
+def test_next_rpc_id():
+    provider = HTTPProvider('http://localhost:8545')
+    assert [next_rpc_id(provider), next_rpc_id(provider)] == [0, 1]
+
+    # Counter is created if provider has none
+    provider = SimpleNamespace()
+    assert [next_rpc_id(provider), next_rpc_id(provider)] == [0, 1]
+
+
+def test_get_request_kwargs():
+    provider = HTTPProvider('http://localhost:8545', request_kwargs={'timeout': 5})
+    kwargs = get_request_kwargs(provider)
+    assert kwargs['timeout'] == 5
+    assert kwargs['headers']['Content-Type'] == 'application/json'
+
+    # Providers without get_request_kwargs fall back on their request kwargs
+    assert get_request_kwargs(SimpleNamespace(_request_kwargs={'timeout': 5})) == {'timeout': 5}
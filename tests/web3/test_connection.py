@@ -0,0 +1,148 @@
+"""
+    tests.web3.test_connection
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test persistent connection providers
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
+
+import websockets
+
+from consensys_utils.web3 import create_provider
+from consensys_utils.web3.aio import event_loop_thread
+from consensys_utils.web3.connection import ConnectionManager, PersistentIPCProvider, PersistentWebsocketProvider
+
+
+def test_connection_manager():
+    manager = ConnectionManager()
+    connection = manager.get(('ipc', '/path/to/ipc'), object)
+    assert manager.get(('ipc', '/path/to/ipc'), object) is connection
+    assert manager.get(('ipc', '/path/to/other.ipc'), object) is not connection
+
+
+def test_persistent_websocket_provider():
+    connections = []
+
+    async def handler(websocket, path):
+        connections.append(websocket)
+
+        async def respond(request):
+            # Every request is answered after a delay so responses come out of order
+            await asyncio.sleep(0.1 if request['params'][0] % 2 else 0.05)
+            await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': request['params']}))
+
+        while True:
+            asyncio.ensure_future(respond(json.loads(await websocket.recv())))
+
+    async def serve():
+        return await websockets.serve(handler, '127.0.0.1', 0)
+
+    server = event_loop_thread.run(serve())
+    provider = create_provider({
+        'ETHEREUM_PROVIDER': 'ws',
+        'ETHEREUM_ENDPOINT_URI': 'ws://127.0.0.1:%s' % server.sockets[0].getsockname()[1],
+        'ETHEREUM_REQUEST_ID_PREFIX': True,
+    }, get_request_id=lambda: threading.current_thread().name)
+    assert isinstance(provider, PersistentWebsocketProvider)
+
+    try:
+        # Requests of concurrent threads are multiplexed on a single connection
+        results = {}
+
+        def make_request(i):
+            results[i] = provider.make_request('eth_getBalance', [i])
+
+        threads = [threading.Thread(target=make_request, args=(i,), name='thread-%s' % i) for i in range(10)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert time.perf_counter() - start < 0.5
+        assert len(connections) == 1
+        for i in range(10):
+            assert results[i]['result'] == [i]
+            assert results[i]['id'].startswith('thread-%s-' % i)
+    finally:
+        event_loop_thread.run(provider.connection.close())
+        server.close()
+        event_loop_thread.run(server.wait_closed())
+
+
+def test_persistent_ipc_provider_reconnect(tmpdir):
+    ipc_path = str(tmpdir.join('geth.ipc'))
+    connections = []
+
+    async def handler(reader, writer):
+        connections.append(writer)
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            request = json.loads(data.decode())
+            writer.write(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0x10'}).encode())
+        writer.close()
+
+    async def serve():
+        return await asyncio.start_unix_server(handler, ipc_path)
+
+    server = event_loop_thread.run(serve())
+    provider = PersistentIPCProvider(ipc_path, timeout=1, reconnect_delay=0.01)
+
+    try:
+        assert provider.make_request('eth_blockNumber', [])['result'] == '0x10'
+
+        # Providers connected to the same node share the connection (and its JSON-RPC ids)
+        other_provider = PersistentIPCProvider(ipc_path)
+        assert other_provider.connection is provider.connection
+        assert other_provider.next_rpc_id() != provider.next_rpc_id()
+
+        # Lost connection is opened again in the background
+        event_loop_thread.loop.call_soon_threadsafe(connections[0].close)
+        for _ in range(100):
+            if len(connections) == 2:
+                break
+            time.sleep(0.01)
+        assert len(connections) == 2
+        assert provider.connection.connection is not None
+        assert provider.make_request('eth_blockNumber', [])['result'] == '0x10'
+        assert len(connections) == 2
+    finally:
+        event_loop_thread.run(provider.connection.close())
+        server.close()
+        event_loop_thread.run(server.wait_closed())
+
+
+def test_persistent_ipc_provider_default_path(tmpdir):
+    ipc_path = str(tmpdir.join('geth.ipc'))
+
+    async def handler(reader, writer):
+        request = json.loads((await reader.read(1024)).decode())
+        writer.write(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0x10'}).encode())
+        writer.close()
+
+    async def serve():
+        return await asyncio.start_unix_server(handler, ipc_path)
+
+    server = event_loop_thread.run(serve())
+
+    # Node default IPC path is used when no path is configured
+    with mock.patch('consensys_utils.web3.connection.get_default_ipc_path', return_value=ipc_path):
+        provider = create_provider({'ETHEREUM_PROVIDER': 'ipc'})
+    assert provider.ipc_path == ipc_path
+
+    try:
+        assert provider.make_request('eth_blockNumber', [])['result'] == '0x10'
+    finally:
+        event_loop_thread.run(provider.connection.close())
+        server.close()
+        event_loop_thread.run(server.wait_closed())
@@ -0,0 +1,136 @@
+"""
+    tests.web3.test_subscription
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test subscription iterator
+
+    :copyright: Copyright 2017 by ConsenSys France.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import websockets
+from flask import Flask
+
+from consensys_utils.exceptions import PauseIteration
+from consensys_utils.flask.extensions.iterable import FlaskIterable
+from consensys_utils.web3.aio import event_loop_thread
+from consensys_utils.web3.subscription import SubscriptionIterator
+
+
+@pytest.fixture(scope='function')
+def ws_server():
+    class Server:
+        def __init__(self):
+            self.websockets = []
+            self.requests = []
+
+        async def handler(self, websocket, path):
+            self.websockets.append(websocket)
+            while True:
+                request = json.loads(await websocket.recv())
+                self.requests.append(request)
+                result = '0xsub%s' % len(self.requests) if request['method'] == 'eth_subscribe' else True
+                await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': result}))
+
+        def notify(self, subscription_id, *results):
+            async def send():
+                for result in results:
+                    await self.websockets[-1].send(json.dumps({
+                        'jsonrpc': '2.0',
+                        'method': 'eth_subscription',
+                        'params': {'subscription': subscription_id, 'result': result},
+                    }))
+            event_loop_thread.run(send())
+
+    server = Server()
+
+    async def serve():
+        return await websockets.serve(server.handler, '127.0.0.1', 0)
+
+    ws = event_loop_thread.run(serve())
+    server.endpoint_uri = 'ws://127.0.0.1:%s' % ws.sockets[0].getsockname()[1]
+
+    yield server
+
+    ws.close()
+    event_loop_thread.run(ws.wait_closed())
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_subscription_iterator(ws_server):
+    app = Flask(__name__)
+    app.config['web3'] = {'ETHEREUM_PROVIDER': 'ws', 'ETHEREUM_ENDPOINT_URI': ws_server.endpoint_uri}
+
+    iterable = FlaskIterable()
+    iterable.add_iterator('heads', SubscriptionIterator(max_size=2, max_pause=5))
+    iterable.init_app(app)
+    waker = MagicMock()
+    app.set_waker(waker)
+    iterator = app.iterators['heads']
+
+    try:
+        # Subscription is opened on first step and iteration pauses until an event arrives
+        with pytest.raises(PauseIteration) as e:
+            next(app)
+        assert ws_server.requests[0]['method'] == 'eth_subscribe'
+        assert ws_server.requests[0]['params'] == ['newHeads']
+        assert not e.value.condition()
+        assert e.value.timeout > 1
+
+        # Events wake iteration up
+        ws_server.notify('0xsub1', {'number': '0x1'}, {'number': '0x2'})
+        assert wait_for(lambda: waker.call_count == 2)
+        assert e.value.condition()
+        assert next(app) == {'number': '0x1'}
+        assert next(app) == {'number': '0x2'}
+        with pytest.raises(PauseIteration):
+            next(app)
+
+        # Oldest events are dropped when queue is full
+        ws_server.notify('0xsub1', {'number': '0x3'}, {'number': '0x4'}, {'number': '0x5'})
+        assert wait_for(lambda: waker.call_count == 5)
+        assert iterator.dropped == 1
+        assert [next(app), next(app)] == [{'number': '0x4'}, {'number': '0x5'}]
+
+        # Subscription is opened again when connection is lost
+        event_loop_thread.run(ws_server.websockets[0].close())
+        assert wait_for(lambda: not iterator.is_subscribed)
+        with pytest.raises(PauseIteration):
+            next(app)
+        assert len(ws_server.websockets) == 2
+        assert ws_server.requests[-1]['method'] == 'eth_subscribe'
+        assert iterator.subscription_id == '0xsub2'
+
+        iterator.unsubscribe()
+        assert ws_server.requests[-1] == {'jsonrpc': '2.0', 'id': ws_server.requests[-1]['id'],
+                                          'method': 'eth_unsubscribe', 'params': ['0xsub2']}
+    finally:
+        event_loop_thread.run(iterator.provider.connection.close())
+
+
+def test_subscription_iterator_logs(ws_server):
+    iterator = SubscriptionIterator('logs', {'address': '0x1234'})
+    iterator.set_config({'web3': {'ETHEREUM_PROVIDER': 'ws', 'ETHEREUM_ENDPOINT_URI': ws_server.endpoint_uri}})
+
+    try:
+        with pytest.raises(PauseIteration):
+            next(iterator)
+        assert ws_server.requests[0]['params'] == ['logs', {'address': '0x1234'}]
+    finally:
+        event_loop_thread.run(iterator.provider.connection.close())
+
+    iterator = SubscriptionIterator()
+    iterator.set_config({'web3': {'ETHEREUM_PROVIDER': 'test'}})
+    with pytest.raises(RuntimeError):
+        iterator.subscribe()